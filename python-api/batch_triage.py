@@ -0,0 +1,141 @@
+"""
+VİSİ AI - Toplu Triyaj
+Geçmiş mesajları Gemini çağırmadan parça parça ve çok çekirdekte sınıflandırır
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from config import BATCH_CHUNK_SIZE, BATCH_PARALLEL_THRESHOLD, BATCH_WORKERS
+from message_analysis import analyze_message, select_active_mod
+from models import StudentContext
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _worker_count() -> int:
+    return BATCH_WORKERS or os.cpu_count() or 1
+
+
+def _mp_context():
+    # fork, iş parçacıklı (event loop, to_thread havuzu, gRPC) süreci kopyalar
+    # ve kilitli bir mutex'le kilitlenebilir; işçiler temiz süreçten başlatılır
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # Sunucu yalnızca bu modülü yükler, uygulamanın kendisini (main) değil
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Süreç havuzu (start_executor ile açılır, sonra yeniden kullanılır)"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=_worker_count(), mp_context=_mp_context())
+    return _executor
+
+
+def start_executor() -> None:
+    """Uygulama açılırken süreç havuzunu hazırla"""
+    get_executor()
+
+
+def shutdown_executor() -> None:
+    """Uygulama kapanırken süreç havuzunu kapat"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def triage_one(message: str, context: Optional[StudentContext] = None) -> Dict:
+    """Tek mesaj için /api/chat ile aynı mod/duygu/güvenlik kararı"""
+    analysis = analyze_message(message, context)
+    active_mod = select_active_mod(analysis)
+    return {
+        'mod': active_mod,
+        'mod_reason': analysis.triage.reason,
+        'emotional_load': analysis.emotional_state['emotional_load'],
+        'dominant_emotion': analysis.emotional_state['dominant_emotion'],
+        'academic_ready': analysis.triage.academic_ready,
+        'safety_status': analysis.safety.get('risk_level', 'safe'),
+    }
+
+
+def _triage_chunk(messages: Sequence[str], contexts: Sequence[Optional[dict]]) -> List[Dict]:
+    """Bir parçayı işle; aynı (mesaj, bağlam) çiftleri bir kez hesaplanır"""
+    seen: Dict[tuple, Dict] = {}
+    results = []
+    for message, context in zip(messages, contexts):
+        key = (message, tuple(sorted(context.items())) if context else None)
+        result = seen.get(key)
+        if result is None:
+            ctx = StudentContext(**context) if context else None
+            result = triage_one(message, ctx)
+            seen[key] = result
+        results.append(dict(result))
+    return results
+
+
+def _context_dicts(
+    count: int,
+    contexts: Optional[Sequence[Optional[StudentContext]]]
+) -> List[Optional[dict]]:
+    # İşçi süreçlere basit sözlük olarak gönder; listeler hashlenebilsin diye tuple'a çevrilir
+    if contexts is None:
+        return [None] * count
+    if len(contexts) != count:
+        raise ValueError("contexts uzunluğu messages ile aynı olmalı")
+    dicts = []
+    for ctx in contexts:
+        if ctx is None:
+            dicts.append(None)
+            continue
+        data = ctx.model_dump(exclude_none=True)
+        if 'goals' in data:
+            data['goals'] = tuple(data['goals'])
+        dicts.append(data)
+    return dicts
+
+
+def triage_batch(
+    messages: Sequence[str],
+    contexts: Optional[Sequence[Optional[StudentContext]]] = None,
+    chunk_size: int = BATCH_CHUNK_SIZE,
+    parallel_threshold: int = BATCH_PARALLEL_THRESHOLD
+) -> Dict:
+    """Mesaj listesini sınıflandır; büyük listeler çekirdeklere dağıtılır"""
+    started = time.perf_counter()
+    context_dicts = _context_dicts(len(messages), contexts)
+    chunk_size = max(1, chunk_size)
+
+    chunks = [
+        (messages[i:i + chunk_size], context_dicts[i:i + chunk_size])
+        for i in range(0, len(messages), chunk_size)
+    ]
+
+    workers = 1
+    if len(messages) >= parallel_threshold and len(chunks) > 1:
+        workers = _worker_count()
+        executor = get_executor()
+        chunk_results = executor.map(_triage_chunk, *zip(*chunks))
+    else:
+        chunk_results = (_triage_chunk(m, c) for m, c in chunks)
+
+    results: List[Dict] = []
+    for chunk in chunk_results:
+        results.extend(chunk)
+
+    elapsed = time.perf_counter() - started
+    return {
+        'results': results,
+        'count': len(results),
+        'chunks': len(chunks),
+        'workers': workers,
+        'elapsed_ms': round(elapsed * 1000, 2),
+        'messages_per_second': round(len(results) / elapsed, 1) if elapsed > 0 else None,
+    }
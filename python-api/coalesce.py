@@ -0,0 +1,84 @@
+"""
+VİSİ AI - İstek Birleştirme (Single-Flight)
+Aynı anda gelen birebir aynı Gemini istekleri tek çağrıyı paylaşır
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+def prompt_key(active_mod: str, system_instruction: str, history: List[dict], message_parts: list) -> str:
+    """Tam olarak derlenmiş prompt'un anahtarı (görseller içerik hash'iyle temsil edilir)"""
+    parts = []
+    for part in message_parts:
+        if isinstance(part, str):
+            parts.append(part)
+        else:
+            parts.append({
+                'mime_type': part.get('mime_type'),
+                'sha256': hashlib.sha256(part.get('data') or b'').hexdigest(),
+            })
+    payload = json.dumps(
+        [active_mod, system_instruction, history, parts],
+        ensure_ascii=False, separators=(',', ':'), default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SingleFlight:
+    """Anahtar başına tek uçuştaki çağrı; eşzamanlı kopyalar onun sonucunu bekler
+
+    Çağrı ayrı bir görevde çalışır: ilk isteği gönderen istemci bağlantıyı
+    kapatsa bile bekleyen diğer istekler sonucu alır.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+        self._waiters: Dict[str, int] = {}
+
+    async def do(self, key: Optional[str], fn: Callable[[], Awaitable[T]]) -> T:
+        """Aynı anahtarla süren çağrı varsa ona katıl, yoksa fn'i başlat"""
+        if key is None:
+            return await fn()
+
+        task = self._in_flight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            self._waiters[key] = 1
+            task.add_done_callback(lambda _: self._forget(key))
+        else:
+            self.coalesced += 1
+            self._waiters[key] += 1
+            self.max_waiters = max(self.max_waiters, self._waiters[key])
+
+        # shield: bekleyen bir isteğin iptali ortak çağrıyı iptal etmez
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str) -> None:
+        task = self._in_flight.pop(key, None)
+        self._waiters.pop(key, None)
+        if task is not None and not task.cancelled():
+            # Bekleyen kalmadıysa "exception never retrieved" uyarısını önle
+            task.exception()
+
+    def stats(self) -> Dict:
+        total = self.leaders + self.coalesced
+        return {
+            'in_flight': len(self._in_flight),
+            'upstream_calls': self.leaders,
+            'coalesced': self.coalesced,
+            'max_waiters': self.max_waiters,
+            'coalesced_ratio': round(self.coalesced / total, 3) if total else 0.0,
+        }
+
+
+llm_single_flight = SingleFlight()
@@ -0,0 +1,194 @@
+"""
+VİSİ AI - Sınıf/Okul Analitiği
+Çok sayıda öğrenci profilini sütunsal NumPy dizilerine yükleyip tek geçişte analiz eder
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+from config import COHORT_MAX_SUBJECTS
+from models import StudentProfile
+
+# NumPy yoksa kohort analitiği kapalı (endpoint 503 döner)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PRIORITIES = ['critical', 'high', 'medium', 'low']
+TRENDS = ['improving', 'stable', 'declining']
+# get_priority sınırları: <40 critical, <60 high, <80 medium, diğerleri low
+_PRIORITY_BINS = [40, 60, 80]
+_IMPROVING, _STABLE, _DECLINING = 0, 1, 2
+
+
+def numpy_available() -> bool:
+    return np is not None
+
+
+class CohortTooLargeError(Exception):
+    """Kohort sınırları aşıldı (ders sayısı)"""
+
+
+@dataclass
+class CohortColumns:
+    """Kohortun sütunsal hali (satır = bir ders sonucu / bir deneme)"""
+    student_count: int
+    subjects: List[str]
+    # Ders sonuçları (recent_exams sırasıyla: en yeni deneme önce)
+    result_student: "np.ndarray"
+    result_subject: "np.ndarray"
+    result_net: "np.ndarray"
+    result_success: "np.ndarray"
+    # Deneme toplam netleri (0 olanlar analyze_student_performance gibi atlanır)
+    exam_student: "np.ndarray"
+    exam_total_net: "np.ndarray"
+    exam_count: int
+
+
+def load_columns(profiles: Sequence[StudentProfile], max_subjects: int = COHORT_MAX_SUBJECTS) -> CohortColumns:
+    """Profilleri tek döngüde sütunlara dök"""
+    subject_index: Dict[str, int] = {}
+    result_student, result_subject, result_net, result_success = [], [], [], []
+    exam_student, exam_total_net = [], []
+    exam_count = 0
+
+    for s, profile in enumerate(profiles):
+        for exam in profile.recent_exams:
+            exam_count += 1
+            if exam.total_net:
+                exam_student.append(s)
+                exam_total_net.append(exam.total_net)
+            for result in exam.subject_results:
+                idx = subject_index.get(result.subject)
+                if idx is None:
+                    if len(subject_index) >= max_subjects:
+                        raise CohortTooLargeError(f"En fazla {max_subjects} farklı ders analiz edilebilir")
+                    idx = subject_index[result.subject] = len(subject_index)
+                result_student.append(s)
+                result_subject.append(idx)
+                result_net.append(result.net)
+                result_success.append(result.success_rate)
+
+    return CohortColumns(
+        student_count=len(profiles),
+        subjects=list(subject_index),
+        result_student=np.array(result_student, dtype=np.int64),
+        result_subject=np.array(result_subject, dtype=np.int64),
+        result_net=np.array(result_net, dtype=np.float64),
+        result_success=np.array(result_success, dtype=np.float64),
+        exam_student=np.array(exam_student, dtype=np.int64),
+        exam_total_net=np.array(exam_total_net, dtype=np.float64),
+        exam_count=exam_count,
+    )
+
+
+def _group_mean_and_trend(groups: "np.ndarray", values: "np.ndarray", n_groups: int):
+    """Grup başına ortalama ve calculate_trend sonucu
+
+    Satırlar grup içinde en yeniden eskiye sıralı olmalıdır (load_columns sırası);
+    kararlı sıralama bu sırayı korur.
+    """
+    counts = np.bincount(groups, minlength=n_groups)
+    totals = np.bincount(groups, weights=values, minlength=n_groups)
+
+    order = np.argsort(groups, kind='stable')
+    sorted_groups = groups[order]
+    starts = np.cumsum(counts) - counts
+    rank = np.arange(len(sorted_groups)) - starts[sorted_groups]
+
+    half = counts // 2
+    in_recent = rank < half[sorted_groups]
+    recent_totals = np.bincount(
+        sorted_groups, weights=values[order] * in_recent, minlength=n_groups
+    )
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = totals / counts
+        diff = recent_totals / half - (totals - recent_totals) / (counts - half)
+
+    trend = np.full(n_groups, _STABLE, dtype=np.int64)
+    enough = counts >= 2
+    trend[enough & (diff > 2)] = _IMPROVING
+    trend[enough & (diff < -2)] = _DECLINING
+    return counts, means, trend
+
+
+def _round1(values: "np.ndarray") -> "np.ndarray":
+    """Python round(x, 1) ile birebir aynı yuvarlama
+
+    np.round ölçekleyip yuvarladığından 0.15 gibi sınır değerlerde round'dan
+    farklı sonuç verir; bu da öğrencinin öncelik kovasını değiştirebilir.
+    """
+    return np.fromiter((round(v, 1) for v in values.tolist()), dtype=np.float64, count=len(values))
+
+
+def _distribution(codes: "np.ndarray", labels: List[str]) -> Dict[str, int]:
+    counts = np.bincount(codes, minlength=len(labels))
+    return {label: int(counts[i]) for i, label in enumerate(labels)}
+
+
+def analyze_cohort(profiles: Sequence[StudentProfile]) -> Dict:
+    """analyze_student_performance metriklerini tüm kohort için vektörel hesapla"""
+    started = time.perf_counter()
+    columns = load_columns(profiles)
+    n_students = columns.student_count
+    n_subjects = len(columns.subjects)
+
+    # Öğrenci başına toplam net ortalaması ve trendi
+    exam_counts, student_avg_net, net_trend = _group_mean_and_trend(
+        columns.exam_student, columns.exam_total_net, n_students
+    )
+    has_exams = exam_counts > 0
+
+    subjects = []
+    overall_priority = np.zeros(len(PRIORITIES), dtype=np.int64)
+    if n_subjects:
+        # Yalnızca gözlenen (öğrenci, ders) çiftleri gruplanır: öğrenci × ders
+        # boyutunda dizi açılmaz, bellek sonuç satırı sayısıyla sınırlı kalır
+        pair_keys = columns.result_student * n_subjects + columns.result_subject
+        pairs, groups = np.unique(pair_keys, return_inverse=True)
+        groups = groups.reshape(-1)
+        pair_subject = pairs % n_subjects
+        counts, avg_net, subject_trend = _group_mean_and_trend(groups, columns.result_net, len(pairs))
+        _, avg_success, _ = _group_mean_and_trend(groups, columns.result_success, len(pairs))
+
+        avg_net = _round1(avg_net)
+        avg_success = _round1(avg_success)
+        priority = np.digitize(avg_success, _PRIORITY_BINS)
+
+        for j, name in enumerate(columns.subjects):
+            mask = pair_subject == j
+            taken = int(mask.sum())
+            success = avg_success[mask]
+            priority_codes = priority[mask]
+            overall_priority += np.bincount(priority_codes, minlength=len(PRIORITIES))
+            subjects.append({
+                'subject': name,
+                'student_count': taken,
+                'average_net': round(float(avg_net[mask].mean()), 1),
+                'average_success_rate': round(float(success.mean()), 1),
+                'weak_students': int((success < 50).sum()),
+                'strong_students': int((success >= 70).sum()),
+                'priority_distribution': _distribution(priority_codes, PRIORITIES),
+                'trend_distribution': _distribution(subject_trend[mask], TRENDS),
+            })
+
+        # En zayıf dersler önce (analyze_student_performance ile aynı sıralama)
+        subjects.sort(key=lambda x: x['average_success_rate'])
+
+    student_nets = _round1(student_avg_net[has_exams])
+    elapsed = time.perf_counter() - started
+    return {
+        'student_count': n_students,
+        'students_with_exams': int(has_exams.sum()),
+        'exam_count': columns.exam_count,
+        'average_net': round(float(student_nets.mean()), 1) if student_nets.size else None,
+        'net_trend_distribution': _distribution(net_trend[has_exams], TRENDS),
+        'priority_distribution': {
+            label: int(overall_priority[i]) for i, label in enumerate(PRIORITIES)
+        },
+        'subjects': subjects,
+        'elapsed_ms': round(elapsed * 1000, 2),
+    }
@@ -0,0 +1,233 @@
+"""
+VİSİ AI - Yapılandırma
+.env yükleme ve ortam değişkeni tabanlı ayarlar
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# .env dosyasını yükle (Robust Yöntem)
+env_path = Path(__file__).parent / '.env'
+try:
+    load_dotenv(dotenv_path=env_path)
+except Exception as e:
+    print(f".env yükleme hatası (yoksayılıyor): {e}")
+
+# Fallback: Eğer key yoksa root'taki .env.local'e bak
+if not os.getenv("GEMINI_API_KEY"):
+    root_env = Path(__file__).parent.parent / '.env.local'
+    if root_env.exists():
+        print(f"Root .env.local bulundu: {root_env}")
+        try:
+            load_dotenv(dotenv_path=root_env)
+        except Exception as e:
+            print(f".env.local yükleme hatası (yoksayılıyor): {e}")
+
+# Eğer load_dotenv çalışmazsa manuel oku (Limitli destek)
+if not os.getenv("GEMINI_API_KEY") and env_path.exists():
+    try:
+        with open(env_path, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                if line.startswith('GEMINI_API_KEY='):
+                    key = line.strip().split('=', 1)[1]
+                    os.environ["GEMINI_API_KEY"] = key.strip()
+                    break
+    except Exception as e:
+        print(f"Manuel .env okuma hatası: {e}")
+
+
+def _env_int(name: str, default: int) -> int:
+    """Tam sayı ortam değişkeni oku (hatalı değerde varsayılana dön)"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"{name} geçersiz ({value!r}), varsayılan kullanılıyor: {default}")
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Ondalıklı ortam değişkeni oku (hatalı değerde varsayılana dön)"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"{name} geçersiz ({value!r}), varsayılan kullanılıyor: {default}")
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Evet/hayır ortam değişkeni oku ('1', 'true', 'yes', 'on' → True)"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# ============================================================================
+# GEMINI
+# ============================================================================
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-2.0-flash")
+
+# Aynı anda Gemini'ye gidebilecek en fazla istek sayısı
+LLM_MAX_CONCURRENCY = max(1, _env_int("LLM_MAX_CONCURRENCY", 32))
+
+# Süreç genelinde yeniden kullanılan model/bağlantı sayısı
+LLM_POOL_SIZE = max(1, _env_int("LLM_POOL_SIZE", 4))
+
+# Gemini kotası (0 → sınırsız); kota dolunca istekler öncelik sırasıyla kuyrukta bekler
+LLM_RPM_LIMIT = max(0, _env_int("LLM_RPM_LIMIT", 2000))
+LLM_TPM_LIMIT = max(0, _env_int("LLM_TPM_LIMIT", 4000000))
+LLM_QUEUE_TIMEOUT_SECONDS = max(0, _env_int("LLM_QUEUE_TIMEOUT_SECONDS", 60))  # 0 → sınırsız bekle
+LLM_QUOTA_COOLDOWN_SECONDS = max(0, _env_int("LLM_QUOTA_COOLDOWN_SECONDS", 10))
+# TPM hesabında yanıt için ayrılan tahmini token (gerçek kullanım yanıt gelince düzeltilir)
+LLM_EXPECTED_OUTPUT_TOKENS = max(0, _env_int("LLM_EXPECTED_OUTPUT_TOKENS", 800))
+
+# Dayanıklılık: çağrı başına süre sınırı, geçici hatalarda yeniden deneme, devre kesici
+LLM_CALL_TIMEOUT_SECONDS = max(0, _env_int("LLM_CALL_TIMEOUT_SECONDS", 30))  # 0 → sınırsız
+LLM_MAX_RETRIES = max(0, _env_int("LLM_MAX_RETRIES", 2))
+LLM_RETRY_BASE_MS = max(1, _env_int("LLM_RETRY_BASE_MS", 250))
+LLM_RETRY_MAX_MS = max(1, _env_int("LLM_RETRY_MAX_MS", 4000))
+# Art arda bu kadar geçici hatada devre açılır (0 → kapalı), süre sonunda tek istekle yoklanır
+LLM_BREAKER_FAILURE_THRESHOLD = max(0, _env_int("LLM_BREAKER_FAILURE_THRESHOLD", 5))
+LLM_BREAKER_RESET_SECONDS = max(1, _env_int("LLM_BREAKER_RESET_SECONDS", 30))
+
+# Aynı anda gelen birebir aynı istekler (mod + sistem prefix'i + geçmiş + mesaj + görsel) tek Gemini çağrısını paylaşır
+LLM_SINGLE_FLIGHT = _env_bool("LLM_SINGLE_FLIGHT", True)
+
+# ============================================================================
+# GÖZLEMLENEBİLİRLİK
+# ============================================================================
+
+# /metrics (Prometheus metin formatı) ve istek/aşama ölçümleri
+METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
+
+# İstek izleri: her chat isteğine iz kimliği + aşama süreleri (Server-Timing başlığı)
+TRACE_ENABLED = _env_bool("TRACE_ENABLED", True)
+# İz uygulanan yol önekleri (virgülle ayrılmış)
+TRACE_PATHS = [p.strip() for p in os.getenv("TRACE_PATHS", "/api/chat,/api/sessions").split(",") if p.strip()]
+# Boşsa izler diske yazılmaz; doluysa JSON satırları olarak dönen (rotating) dosyaya
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "")
+TRACE_LOG_MAX_BYTES = max(1024, _env_int("TRACE_LOG_MAX_BYTES", 50 * 1024 * 1024))
+TRACE_LOG_BACKUPS = max(0, _env_int("TRACE_LOG_BACKUPS", 5))
+# Diske yazılacak izlerin oranı (0.0-1.0); yavaş ve 5xx istekler her zaman yazılır
+TRACE_SAMPLE_RATE = min(1.0, max(0.0, _env_float("TRACE_SAMPLE_RATE", 0.01)))
+TRACE_SLOW_MS = max(0, _env_int("TRACE_SLOW_MS", 5000))  # 0 → yavaşlık kuralı kapalı
+
+# Yönetici uçları (/api/admin/...) için X-Admin-Token; boşsa bu uçlar kapalı
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Örneklemeli profil çıkarıcı
+PROFILER_INTERVAL_MS = max(1, _env_int("PROFILER_INTERVAL_MS", 10))
+PROFILER_MAX_SECONDS = max(1, _env_int("PROFILER_MAX_SECONDS", 60))
+# Her N'inci /api/chat isteğini profille ve PROFILE_DUMP_DIR'e yaz (0 → kapalı)
+PROFILE_EVERY_N_CHAT = max(0, _env_int("PROFILE_EVERY_N_CHAT", 0))
+# Geçici teşhis çıktısı: varsayılan sistem geçici klasörü (kaynak ağacına yazılmaz)
+PROFILE_DUMP_DIR = os.getenv("PROFILE_DUMP_DIR") or str(Path(tempfile.gettempdir()) / "visi-ai-cpu-profiles")
+
+# ============================================================================
+# PROMPT ÖNBELLEĞİ
+# ============================================================================
+
+# Sistem/mod prompt LRU önbelleğinin en fazla kayıt sayısı
+PROMPT_CACHE_SIZE = max(1, _env_int("PROMPT_CACHE_SIZE", 1024))
+
+# ============================================================================
+# BAĞLAM ÖNBELLEĞİ (SABİT SİSTEM PREFIX'İ)
+# ============================================================================
+
+# 'auto' (SDK destekliyorsa gemini, yoksa local), 'gemini', 'local' veya 'off'
+CONTEXT_CACHE_BACKEND = os.getenv("CONTEXT_CACHE_BACKEND", "auto")
+CONTEXT_CACHE_TTL_SECONDS = max(60, _env_int("CONTEXT_CACHE_TTL_SECONDS", 3600))
+CONTEXT_CACHE_MAX_ENTRIES = max(1, _env_int("CONTEXT_CACHE_MAX_ENTRIES", 256))
+
+# ============================================================================
+# SOHBET OTURUMLARI
+# ============================================================================
+
+SESSION_TTL_SECONDS = max(60, _env_int("SESSION_TTL_SECONDS", 7200))
+SESSION_MAX_ENTRIES = max(1, _env_int("SESSION_MAX_ENTRIES", 10000))
+# Boşsa oturumlar yalnızca bellekte tutulur
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "")
+
+# ============================================================================
+# GEÇMİŞ PENCERESİ
+# ============================================================================
+
+# Gemini'ye aynen gönderilecek geçmişin token bütçesi; fazlası özete katlanır
+HISTORY_TOKEN_BUDGET = max(1, _env_int("HISTORY_TOKEN_BUDGET", 3000))
+HISTORY_SUMMARY_MAX_TOKENS = max(1, _env_int("HISTORY_SUMMARY_MAX_TOKENS", 400))
+# Özetteki her mesaj satırının en fazla karakter sayısı
+HISTORY_SUMMARY_LINE_CHARS = max(20, _env_int("HISTORY_SUMMARY_LINE_CHARS", 160))
+HISTORY_SUMMARY_CACHE_SIZE = max(1, _env_int("HISTORY_SUMMARY_CACHE_SIZE", 10000))
+
+# ============================================================================
+# TOPLU TRİYAJ
+# ============================================================================
+
+BATCH_CHUNK_SIZE = max(1, _env_int("BATCH_CHUNK_SIZE", 2000))
+# Bu sayının üstündeki toplu işler süreç havuzuna dağıtılır
+BATCH_PARALLEL_THRESHOLD = max(1, _env_int("BATCH_PARALLEL_THRESHOLD", 5000))
+# 0 → CPU çekirdek sayısı
+BATCH_WORKERS = max(0, _env_int("BATCH_WORKERS", 0))
+BATCH_MAX_MESSAGES = max(1, _env_int("BATCH_MAX_MESSAGES", 20000))
+BATCH_MAX_BODY_BYTES = max(1024, _env_int("BATCH_MAX_BODY_BYTES", 8 * 1024 * 1024))
+
+# ============================================================================
+# YANIT ÖNBELLEĞİ
+# ============================================================================
+
+RESPONSE_CACHE_ENABLED = _env_bool("RESPONSE_CACHE_ENABLED", True)
+RESPONSE_CACHE_SIZE = max(1, _env_int("RESPONSE_CACHE_SIZE", 2048))
+RESPONSE_CACHE_TTL_SECONDS = max(1, _env_int("RESPONSE_CACHE_TTL_SECONDS", 86400))
+
+# ============================================================================
+# GÖRSEL YÜKLEME
+# ============================================================================
+
+IMAGE_MAX_BYTES = max(1, _env_int("IMAGE_MAX_BYTES", 10 * 1024 * 1024))
+IMAGE_READ_CHUNK_BYTES = max(1024, _env_int("IMAGE_READ_CHUNK_BYTES", 64 * 1024))
+
+# Gemini'ye gitmeden önce küçültme / yeniden sıkıştırma
+IMAGE_MAX_DIMENSION = max(64, _env_int("IMAGE_MAX_DIMENSION", 1600))
+IMAGE_OUTPUT_FORMAT = os.getenv("IMAGE_OUTPUT_FORMAT", "webp").strip().lower()  # webp | jpeg
+IMAGE_OUTPUT_QUALITY = min(95, max(30, _env_int("IMAGE_OUTPUT_QUALITY", 80)))
+IMAGE_PROCESS_WORKERS = max(1, _env_int("IMAGE_PROCESS_WORKERS", 2))
+
+# Aynı soru fotoğrafı için çözümün yeniden kullanılması (algısal hash)
+IMAGE_CACHE_ENABLED = _env_bool("IMAGE_CACHE_ENABLED", True)
+IMAGE_CACHE_SIZE = max(1, _env_int("IMAGE_CACHE_SIZE", 4096))
+IMAGE_CACHE_TTL_SECONDS = max(1, _env_int("IMAGE_CACHE_TTL_SECONDS", 7 * 86400))
+IMAGE_HASH_THRESHOLD = max(0, _env_int("IMAGE_HASH_THRESHOLD", 6))  # 64 bitte farklı bit sayısı
+# Kenar piksel oranı bunun üstündeyse görsel yazı yoğun sayılır: 16x16 hash ile aranır
+IMAGE_TEXT_DENSE_RATIO = min(1.0, max(0.0, _env_float("IMAGE_TEXT_DENSE_RATIO", 0.02)))
+IMAGE_TEXT_HASH_THRESHOLD = max(0, _env_int("IMAGE_TEXT_HASH_THRESHOLD", 32))  # 256 bitte farklı bit sayısı
+
+# ============================================================================
+# ÖĞRENCİ PROFİLLERİ
+# ============================================================================
+
+# Varsayılan veri klasörü kaynak ağacının dışında: VISI_DATA_DIR, yoksa XDG_DATA_HOME/visi-ai
+DATA_DIR = os.getenv("VISI_DATA_DIR") or str(
+    Path(os.getenv("XDG_DATA_HOME") or Path.home() / ".local" / "share") / "visi-ai"
+)
+PROFILE_DB_PATH = os.getenv("PROFILE_DB_PATH") or str(Path(DATA_DIR) / "student_profiles.db")
+PROFILE_CACHE_SIZE = max(1, _env_int("PROFILE_CACHE_SIZE", 5000))
+STUDENT_PROMPT_CACHE_SIZE = max(1, _env_int("STUDENT_PROMPT_CACHE_SIZE", 2048))
+COHORT_MAX_STUDENTS = max(1, _env_int("COHORT_MAX_STUDENTS", 50000))
+# İstek gövdesinde doğrudan gönderilen profiller (doğrulaması pahalı) ve farklı ders sayısı
+COHORT_MAX_INLINE_PROFILES = max(1, _env_int("COHORT_MAX_INLINE_PROFILES", 1000))
+COHORT_MAX_SUBJECTS = max(1, _env_int("COHORT_MAX_SUBJECTS", 100))
+
+# Toplu haftalık program işi (weekly_programs.py)
+WEEKLY_PROGRAM_WORKERS = max(0, _env_int("WEEKLY_PROGRAM_WORKERS", 0))  # 0 → CPU sayısı
+WEEKLY_PROGRAM_CHUNK_SIZE = max(1, _env_int("WEEKLY_PROGRAM_CHUNK_SIZE", 200))
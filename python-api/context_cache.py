@@ -0,0 +1,256 @@
+"""
+VİSİ AI - Bağlam Önbelleği
+Sabit sistem prefix'ini (sistem + mod + sınav + öğrenci verisi) sağlayıcı
+tarafında bir kez kaydedip sonraki turlarda handle ile yeniden kullanır
+"""
+
+import asyncio
+import hashlib
+import inspect
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+import google.generativeai as genai
+
+from config import (
+    GEMINI_MODEL_NAME, CONTEXT_CACHE_BACKEND,
+    CONTEXT_CACHE_TTL_SECONDS, CONTEXT_CACHE_MAX_ENTRIES
+)
+from ttl_cache import TTLCache
+
+# ============================================================================
+# SDK YETENEKLERİ
+# ============================================================================
+
+def sdk_supports_system_instruction() -> bool:
+    """GenerativeModel system_instruction parametresini destekliyor mu"""
+    try:
+        return 'system_instruction' in inspect.signature(genai.GenerativeModel.__init__).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def sdk_supports_context_caching() -> bool:
+    """SDK sağlayıcı tarafı context caching API'sini sunuyor mu"""
+    return (
+        getattr(genai, "caching", None) is not None
+        and hasattr(genai.GenerativeModel, "from_cached_content")
+    )
+
+
+def fingerprint_prefix(system_instruction: str, model_name: str = GEMINI_MODEL_NAME) -> str:
+    """Prefix metninin kararlı parmak izi (mod/seviye/profil bu metnin içinde)"""
+    digest = hashlib.sha256()
+    digest.update(model_name.encode('utf-8'))
+    digest.update(b'\x00')
+    digest.update(system_instruction.encode('utf-8'))
+    return digest.hexdigest()
+
+
+# ============================================================================
+# ÖNBELLEK KAYDI VE BACKEND'LER
+# ============================================================================
+
+@dataclass
+class CachedContext:
+    """Kaydedilmiş bir prefix için handle"""
+    fingerprint: str
+    handle: str
+    backend: str
+    created_at: float
+    # Prefix'i taşıyan model; None ise SDK system instruction desteklemiyor demektir
+    model: Optional[genai.GenerativeModel] = None
+    provider_object: Any = None
+    uses: int = 0
+
+
+class LocalContextBackend:
+    """Çevrimdışı yedek: handle'ları bellekte tutar, ağ çağrısı yapmaz.
+
+    SDK destekliyorsa prefix, system_instruction olarak modele bağlanır;
+    desteklemiyorsa model None döner ve çağıran prefix'i geçmişe ekler.
+    """
+
+    name = 'local'
+
+    def __init__(self, model_name: str = GEMINI_MODEL_NAME):
+        self.model_name = model_name
+        self.created = 0
+        self.deleted = 0
+
+    def create(self, fingerprint: str, system_instruction: str, ttl_seconds: int) -> CachedContext:
+        model = None
+        if sdk_supports_system_instruction():
+            model = genai.GenerativeModel(self.model_name, system_instruction=system_instruction)
+        self.created += 1
+        return CachedContext(
+            fingerprint=fingerprint,
+            handle=f"local/{fingerprint[:16]}",
+            backend=self.name,
+            created_at=time.time(),
+            model=model
+        )
+
+    def delete(self, entry: CachedContext) -> None:
+        self.deleted += 1
+
+
+class GeminiContextBackend:
+    """Gemini CachedContent API'si ile sağlayıcı tarafı önbellek"""
+
+    name = 'gemini'
+
+    def __init__(self, model_name: str = GEMINI_MODEL_NAME):
+        self.model_name = model_name
+        self.created = 0
+        self.deleted = 0
+
+    def create(self, fingerprint: str, system_instruction: str, ttl_seconds: int) -> CachedContext:
+        cached = genai.caching.CachedContent.create(
+            model=self.model_name,
+            display_name=f"visi-{fingerprint[:12]}",
+            system_instruction=system_instruction,
+            ttl=timedelta(seconds=ttl_seconds)
+        )
+        self.created += 1
+        return CachedContext(
+            fingerprint=fingerprint,
+            handle=cached.name,
+            backend=self.name,
+            created_at=time.time(),
+            model=genai.GenerativeModel.from_cached_content(cached_content=cached),
+            provider_object=cached
+        )
+
+    def delete(self, entry: CachedContext) -> None:
+        try:
+            entry.provider_object.delete()
+            self.deleted += 1
+        except Exception as e:
+            # Sağlayıcı TTL'i zaten sildiyse sorun değil
+            print(f"Context cache silme hatası ({entry.handle}): {e}")
+
+
+def create_backend(kind: str = CONTEXT_CACHE_BACKEND):
+    """Ayara göre backend seç ('auto', 'gemini', 'local', 'off')"""
+    kind = (kind or 'auto').lower()
+    if kind == 'off':
+        return None
+    if kind == 'gemini' or (kind == 'auto' and sdk_supports_context_caching()):
+        if sdk_supports_context_caching():
+            return GeminiContextBackend()
+        print("⚠️ SDK context caching desteklemiyor, local backend kullanılıyor")
+    return LocalContextBackend()
+
+
+# ============================================================================
+# BAĞLAM ÖNBELLEĞİ
+# ============================================================================
+
+class ContextCache:
+    """Prefix parmak izi → handle eşlemesi (TTL + LRU + geçersiz kılma)"""
+
+    def __init__(self, backend, ttl_seconds: int, max_entries: int):
+        self.backend = backend
+        self.fallback = LocalContextBackend()
+        self.ttl_seconds = ttl_seconds
+        # Sağlayıcı TTL'inden biraz önce düşür ki süresi dolmuş handle kullanılmasın
+        local_ttl = max(1, ttl_seconds - min(60, ttl_seconds // 10))
+        self._entries = TTLCache(max_entries, ttl=local_ttl, on_evict=self._on_evict)
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.create_errors = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def _on_evict(self, fingerprint: str, entry: CachedContext) -> None:
+        backend = self.backend if entry.backend == getattr(self.backend, 'name', None) else self.fallback
+        if backend is self.fallback:
+            backend.delete(entry)
+            return
+        try:
+            asyncio.get_running_loop().run_in_executor(None, backend.delete, entry)
+        except RuntimeError:
+            backend.delete(entry)
+
+    def _create(self, fingerprint: str, system_instruction: str) -> CachedContext:
+        try:
+            return self.backend.create(fingerprint, system_instruction, self.ttl_seconds)
+        except Exception as e:
+            # Ör. prefix minimum token sınırının altında; yerel handle ile devam et
+            self.create_errors += 1
+            print(f"Context cache oluşturma hatası, local yedek kullanılıyor: {e}")
+            return self.fallback.create(fingerprint, system_instruction, self.ttl_seconds)
+
+    async def get_or_create(self, system_instruction: str) -> Optional[CachedContext]:
+        """Prefix için handle döndür, yoksa bir kez oluştur (eşzamanlı istekler bekler)"""
+        if not self.enabled:
+            return None
+
+        fingerprint = fingerprint_prefix(system_instruction)
+        entry = self._entries.get(fingerprint)
+        if entry is not None:
+            entry.uses += 1
+            return entry
+
+        pending = self._pending.get(fingerprint)
+        if pending is not None:
+            entry = await asyncio.shield(pending)
+            entry.uses += 1
+            return entry
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[fingerprint] = future
+        try:
+            entry = await asyncio.to_thread(self._create, fingerprint, system_instruction)
+            self._entries.set(fingerprint, entry)
+            entry.uses += 1
+            future.set_result(entry)
+            return entry
+        except BaseException as e:
+            future.set_exception(e)
+            # Bekleyen yoksa "exception never retrieved" uyarısını önle
+            future.exception()
+            raise
+        finally:
+            self._pending.pop(fingerprint, None)
+
+    def invalidate(self, system_instruction: Optional[str] = None, fingerprint: Optional[str] = None) -> bool:
+        """Tek bir prefix'i geçersiz kıl"""
+        if fingerprint is None and system_instruction is not None:
+            fingerprint = fingerprint_prefix(system_instruction)
+        if fingerprint is None:
+            return False
+        removed = self._entries.pop(fingerprint) is not None
+        if removed:
+            self.invalidations += 1
+        return removed
+
+    def invalidate_all(self) -> int:
+        """Tüm handle'ları geçersiz kıl"""
+        count = len(self._entries)
+        self._entries.clear()
+        self.invalidations += count
+        return count
+
+    def stats(self) -> Dict:
+        """Önbellek sayaçları"""
+        return {
+            'backend': getattr(self.backend, 'name', 'off'),
+            'system_instruction_supported': sdk_supports_system_instruction(),
+            **self._entries.stats(),
+            'created': getattr(self.backend, 'created', 0) + self.fallback.created,
+            'create_errors': self.create_errors,
+            'invalidations': self.invalidations,
+        }
+
+
+context_cache = ContextCache(
+    create_backend(),
+    ttl_seconds=CONTEXT_CACHE_TTL_SECONDS,
+    max_entries=CONTEXT_CACHE_MAX_ENTRIES
+)
@@ -133,11 +133,18 @@ def get_exam_strategy(exam_type: str) -> dict:
 
 
 def generate_exam_strategy_prompt(exam_type: str) -> str:
-    """Sınav stratejisi prompt'u oluştur"""
+    """Sınav stratejisi prompt'u döndür (import anında hazırlanmış)"""
+    prompt = EXAM_STRATEGY_PROMPTS.get(exam_type.upper())
+    if prompt is not None:
+        return prompt
     strategy = get_exam_strategy(exam_type)
     if not strategy:
         return ""
-    
+    return EXAM_STRATEGY_PROMPTS[strategy['exam_type']]
+
+
+def _render_exam_strategy_prompt(strategy: dict) -> str:
+    """Strateji sözlüğünden prompt metni üret"""
     subjects_table = "| Ders | Soru | Süre/Soru | Öncelik |\n|------|------|-----------|----------|\n"
     for subj in strategy['subjects']:
         priority_emoji = {'critical': '🔴', 'high': '🟠', 'medium': '🟡', 'low': '🟢'}
@@ -159,3 +166,10 @@ def generate_exam_strategy_prompt(exam_type: str) -> str:
 💡 MOTİVASYON:
 {chr(10).join('• ' + t for t in strategy['motivation_tips'])}
 """
+
+
+# Dört sınavın prompt'ları sabit; her istekte yeniden formatlamak yerine bir kez üret
+EXAM_STRATEGY_PROMPTS: Dict[str, str] = {
+    exam_type: _render_exam_strategy_prompt(strategy)
+    for exam_type, strategy in EXAM_STRATEGIES.items()
+}
@@ -0,0 +1,189 @@
+"""
+VİSİ AI - Geçmiş Yönetimi
+Token bütçeli geçmiş penceresi ve eski turlar için kayan özet
+"""
+
+import hashlib
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from config import (
+    HISTORY_TOKEN_BUDGET, HISTORY_SUMMARY_MAX_TOKENS,
+    HISTORY_SUMMARY_LINE_CHARS, HISTORY_SUMMARY_CACHE_SIZE
+)
+from ttl_cache import TTLCache
+
+# Türkçe metinde Gemini tokenizer'ı kabaca 4 karakter ≈ 1 token
+CHARS_PER_TOKEN = 4
+
+
+def count_tokens(text: str) -> int:
+    """Metnin yaklaşık token sayısı (ağ çağrısı yapmadan)
+
+    Önbelleğe alınmaz: hesap ucuzdur, önbellek ise öğrenci verisi içeren
+    prompt'ları bellekte tutardı.
+    """
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def message_tokens(message: Dict) -> int:
+    """Gemini formatındaki mesajın metin parçalarının token sayısı"""
+    return sum(count_tokens(p) for p in message.get('parts', []) if isinstance(p, str))
+
+
+def _message_text(message: Dict) -> str:
+    return " ".join(p for p in message.get('parts', []) if isinstance(p, str))
+
+
+def _summary_line(message: Dict, max_chars: int) -> str:
+    """Tek mesajı özet satırına indir (ilk N karakter)"""
+    text = " ".join(_message_text(message).split())
+    if len(text) > max_chars:
+        text = text[:max_chars].rsplit(" ", 1)[0] + "…"
+    speaker = "Öğrenci" if message.get('role') == 'user' else "Visi"
+    return f"• {speaker}: {text}"
+
+
+# ============================================================================
+# KAYAN ÖZET
+# ============================================================================
+
+@dataclass
+class _SummaryState:
+    """Bir konuşmanın katlanmış kısmının özeti"""
+    folded_count: int = 0
+    last_folded_digest: str = ""
+    lines: List[str] = field(default_factory=list)
+
+
+def _digest(message: Dict) -> str:
+    return hashlib.sha1(_message_text(message).encode('utf-8')).hexdigest()
+
+
+@dataclass
+class HistoryWindow:
+    """Gemini'ye gidecek geçmiş ve tasarruf bilgisi"""
+    history: List[Dict]
+    summary: str
+    kept_messages: int
+    folded_messages: int
+    tokens_before: int
+    tokens_after: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_before - self.tokens_after)
+
+
+class HistoryManager:
+    """Son turları bütçe içinde aynen tutar, eskileri kayan özete katlar"""
+
+    def __init__(
+        self,
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+        summary_max_tokens: int = HISTORY_SUMMARY_MAX_TOKENS,
+        line_chars: int = HISTORY_SUMMARY_LINE_CHARS,
+        cache_size: int = HISTORY_SUMMARY_CACHE_SIZE
+    ):
+        self.token_budget = token_budget
+        self.summary_max_tokens = summary_max_tokens
+        self.line_chars = line_chars
+        self._summaries = TTLCache(cache_size)
+        self.requests = 0
+        self.windowed_requests = 0
+        self.tokens_saved_total = 0
+        self.last_tokens_saved = 0
+
+    def _summarize(self, history: List[Dict], folded: int, key: Optional[str]) -> str:
+        """İlk `folded` mesajın özetini önbellekten devam ettirerek üret
+
+        Önbellek yalnızca sunucu tarafı oturumlarda kullanılır: oturumsuz
+        isteklerde geçmişi istemci gönderir, ilk mesajı aynı iki konuşma
+        birbirinin özetini alabilirdi. Özet satırları ucuz olduğundan orada
+        her seferinde baştan üretilir.
+        """
+        state = self._summaries.get(key) if key else None
+        valid = (
+            state is not None
+            and state.folded_count <= folded
+            and state.folded_count > 0
+            and state.last_folded_digest == _digest(history[state.folded_count - 1])
+        )
+        if not valid:
+            state = _SummaryState()
+
+        # Sadece yeni katlanan mesajlar işlenir (kayan özet)
+        for message in history[state.folded_count:folded]:
+            state.lines.append(_summary_line(message, self.line_chars))
+        if folded > state.folded_count:
+            state.folded_count = folded
+            state.last_folded_digest = _digest(history[folded - 1])
+
+        # Özet bütçesini aşan en eski satırları düşür
+        total = sum(count_tokens(line) for line in state.lines)
+        while len(state.lines) > 1 and total > self.summary_max_tokens:
+            total -= count_tokens(state.lines.pop(0))
+
+        if key:
+            self._summaries.set(key, state)
+        return "\n".join(state.lines)
+
+    def window(self, history: List[Dict], conversation_key: Optional[str] = None) -> HistoryWindow:
+        """Geçmişi token bütçesine sığdır"""
+        self.requests += 1
+        tokens = [message_tokens(m) for m in history]
+        tokens_before = sum(tokens)
+
+        if tokens_before <= self.token_budget:
+            self.last_tokens_saved = 0
+            return HistoryWindow(history, "", len(history), 0, tokens_before, tokens_before)
+
+        # Sondan başa bütçe dolana kadar tut (en az son mesaj)
+        used = 0
+        start = len(history)
+        for i in range(len(history) - 1, -1, -1):
+            if used + tokens[i] > self.token_budget and start < len(history):
+                break
+            used += tokens[i]
+            start = i
+
+        # Pencere öğrenci mesajıyla başlamalı (özet turu user/model çiftidir)
+        while start < len(history) and history[start].get('role') != 'user':
+            used -= tokens[start]
+            start += 1
+
+        summary = self._summarize(history, start, conversation_key)
+        summary_turns = [
+            {"role": "user", "parts": [f"[ÖNCEKİ KONUŞMA ÖZETİ]\n{summary}"]},
+            {"role": "model", "parts": ["Anlaşıldı, önceki konuşmayı dikkate alıyorum."]},
+        ]
+        windowed = summary_turns + history[start:]
+        tokens_after = used + sum(message_tokens(m) for m in summary_turns)
+
+        result = HistoryWindow(windowed, summary, len(history) - start, start, tokens_before, tokens_after)
+        self.windowed_requests += 1
+        self.last_tokens_saved = result.tokens_saved
+        self.tokens_saved_total += result.tokens_saved
+        return result
+
+    def forget(self, conversation_key: str) -> None:
+        """Oturum kapanınca özetini bırak"""
+        self._summaries.pop(conversation_key)
+
+    def stats(self) -> Dict:
+        """Pencereleme ve token tasarrufu sayaçları"""
+        return {
+            'token_budget': self.token_budget,
+            'requests': self.requests,
+            'windowed_requests': self.windowed_requests,
+            'tokens_saved_total': self.tokens_saved_total,
+            'tokens_saved_last': self.last_tokens_saved,
+            'avg_tokens_saved': round(self.tokens_saved_total / self.requests, 1) if self.requests else 0.0,
+            'summary_cache': self._summaries.stats(),
+        }
+
+
+history_manager = HistoryManager()
@@ -0,0 +1,215 @@
+"""
+VİSİ AI - Görsel Soru Önbelleği
+Aynı soru fotoğrafını (farklı kadraj/ışık) algısal hash ile tanıyıp çözümü yeniden kullanır
+"""
+
+import hashlib
+import io
+from typing import Dict, Optional, Set, Tuple
+
+from config import (
+    IMAGE_CACHE_ENABLED, IMAGE_CACHE_SIZE, IMAGE_CACHE_TTL_SECONDS, IMAGE_HASH_THRESHOLD,
+    IMAGE_TEXT_DENSE_RATIO, IMAGE_TEXT_HASH_THRESHOLD
+)
+from models import ChatRequest, StudentContext
+from prompts import is_lgs_or_below
+from response_cache import CACHEABLE_MODS, normalize_question
+from ttl_cache import TTLCache
+
+try:
+    from PIL import Image, ImageFilter, ImageOps
+except ImportError:
+    Image = None
+    ImageFilter = None
+    ImageOps = None
+
+HASH_BITS = 64
+# Yazı yoğun görsellerde 16x16 dHash
+TEXT_HASH_BITS = 256
+# Yazı yoğunluğu ölçülürken görselin indirildiği en uzun kenar
+DENSITY_SIZE = 512
+DENSITY_EDGE_LEVEL = 48
+
+# (hash bit sayısı, hash): farklı boydaki hash'ler birbiriyle karşılaştırılmaz
+Fingerprint = Tuple[int, int]
+
+
+def _dhash(gray, size: int = 8) -> int:
+    """size*size bitlik dHash: komşu piksellerin parlaklık farkı
+
+    Kontrast normalize edildiği için ışık farkına, küçük boyuta indirildiği
+    için küçük kırpma/ölçek farkına dayanıklıdır.
+    """
+    small = gray.resize((size + 1, size), Image.LANCZOS)
+    pixels = list(small.getdata())
+
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def text_hash(gray) -> int:
+    """Yazı yoğun görselin 256 bitlik dHash'i, yazılı alana kırpılarak
+
+    9x8'de satır satır yazı dolu sayfalar birbirine benzer; 16x16 satır
+    yapısını ayırt eder. Önce yazının sınır kutusuna kırpıldığı için farklı
+    kadrajla çekilen aynı sayfa aynı ızgaraya oturur.
+    """
+    box = gray.point(lambda p: 255 if p < 128 else 0).getbbox()
+    if box:
+        gray = gray.crop(box)
+    return _dhash(gray, 16)
+
+
+def edge_ratio(gray) -> float:
+    """İkilileştirilmiş küçük görselde kenar piksellerinin oranı (yazı yoğunluğu ölçüsü)
+
+    Her harf kendi kenarını getirdiğinden çok satırlı sayfalarda oran,
+    tek soruluk ya da şekilli görsellere göre belirgin yüksektir.
+    """
+    small = gray.copy()
+    small.thumbnail((DENSITY_SIZE, DENSITY_SIZE), Image.LANCZOS)
+    binary = small.point(lambda p: 255 if p > 128 else 0)
+    width, height = binary.size
+    # Filtre kenar piksellerini olduğu gibi bırakır; çerçeveyi sayma
+    edges = binary.filter(ImageFilter.FIND_EDGES).crop((1, 1, width - 1, height - 1))
+    counts = edges.histogram()
+    return sum(counts[DENSITY_EDGE_LEVEL + 1:]) / max(1, (width - 2) * (height - 2))
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class ImageAnswerCache:
+    """(mesaj, mod, seviye, hedef sınav, LGS) kapsamında parmak izi → çözüm metni
+
+    Aramada önce birebir hash, sonra eşik içindeki en yakın hash denenir.
+    Yazı yoğun görseller (çok soruluk sayfalar) 9x8'de birbirine benzediği
+    için 16x16 hash'le ve kendi eşiğiyle aranır. Kapsam başına kayıt
+    sayısı önbellek boyutuyla sınırlı olduğundan doğrusal tarama yeterince
+    ucuzdur.
+    """
+
+    def __init__(self, enabled: bool, maxsize: int, ttl_seconds: int, threshold: int,
+                 text_dense_ratio: float = IMAGE_TEXT_DENSE_RATIO,
+                 text_threshold: int = IMAGE_TEXT_HASH_THRESHOLD):
+        self.enabled = enabled and Image is not None
+        self.threshold = max(0, min(threshold, HASH_BITS))
+        self.text_threshold = max(0, min(text_threshold, TEXT_HASH_BITS))
+        self.text_dense_ratio = text_dense_ratio
+        self._cache = TTLCache(maxsize, ttl=ttl_seconds, on_evict=self._on_evict)
+        # (kapsam, hash boyu) → o kapsamdaki hash'ler (yakın arama için)
+        self._index: Dict[Tuple[str, int], Set[int]] = {}
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.text_dense = 0
+        self.hash_failures = 0
+
+    def _on_evict(self, key: Tuple[str, Fingerprint], _value) -> None:
+        scope, (bits, value) = key
+        hashes = self._index.get((scope, bits))
+        if hashes is not None:
+            hashes.discard(value)
+            if not hashes:
+                del self._index[(scope, bits)]
+
+    def fingerprint(self, data: bytes) -> Optional[Fingerprint]:
+        """Görselin algısal hash'i; yazı yoğunsa 256 bitlik hash (çözülemezse None)"""
+        if not self.enabled:
+            return None
+        try:
+            with Image.open(io.BytesIO(data)) as source:
+                gray = ImageOps.autocontrast(source.convert('L'))
+            if edge_ratio(gray) >= self.text_dense_ratio:
+                self.text_dense += 1
+                return TEXT_HASH_BITS, text_hash(gray)
+            return HASH_BITS, _dhash(gray)
+        except Exception as e:
+            print(f"Görsel hash hatası: {e}")
+            self.hash_failures += 1
+            return None
+
+    def accepts(self, request: ChatRequest, history_len: int) -> bool:
+        """Triyajdan önce bilinen koşullar: hash ancak bunlar sağlanırsa hesaplanır"""
+        return (
+            self.enabled
+            and request.use_cache
+            and not request.student_data
+            and history_len == 0
+        )
+
+    def is_cacheable(self, request: ChatRequest, active_mod: str, safety: dict, history_len: int) -> bool:
+        """Geçmişsiz, öğrenci verisiz ve güvenli görsel sorular paylaşılabilir"""
+        return (
+            self.accepts(request, history_len)
+            and active_mod in CACHEABLE_MODS
+            and safety.get('risk_level', 'safe') == 'safe'
+        )
+
+    def scope(self, message: str, active_mod: str, context: Optional[StudentContext]) -> str:
+        """Aynı fotoğraftaki farklı soru ve seviyeler ayrı çözülsün diye kapsam"""
+        level = (context.level or "") if context else ""
+        target_exam = (context.target_exam or "") if context else ""
+        lgs = 'lgs' if is_lgs_or_below(context) else ''
+        digest = hashlib.sha256(normalize_question(message).encode('utf-8')).hexdigest()
+        return f"{active_mod}|{level}|{target_exam}|{lgs}|{digest}"
+
+    def get(self, phash: Fingerprint, scope: str) -> Optional[str]:
+        """Birebir ya da eşik içindeki en yakın fotoğrafın çözümü"""
+        text = self._cache.get((scope, phash), count=False)
+        if text is not None:
+            self.exact_hits += 1
+            self._cache.hits += 1
+            return text
+
+        bits, value = phash
+        threshold = self.text_threshold if bits == TEXT_HASH_BITS else self.threshold
+        best, best_distance = None, threshold + 1
+        for candidate in self._index.get((scope, bits), ()):
+            distance = hamming(value, candidate)
+            if distance < best_distance:
+                best, best_distance = candidate, distance
+        if best is not None:
+            text = self._cache.get((scope, (bits, best)), count=False)
+            if text is not None:
+                self.near_hits += 1
+                self._cache.hits += 1
+                return text
+
+        self._cache.misses += 1
+        return None
+
+    def set(self, phash: Fingerprint, scope: str, text: str) -> None:
+        if not text:
+            return
+        key = (scope, phash)
+        self._cache.pop(key)
+        self._cache.set(key, text)
+        bits, value = phash
+        self._index.setdefault((scope, bits), set()).add(value)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict:
+        """Birebir / yakın isabet ve tahliye sayaçları"""
+        return {
+            'enabled': self.enabled,
+            'threshold_bits': self.threshold,
+            'text_threshold_bits': self.text_threshold,
+            'text_dense_ratio': self.text_dense_ratio,
+            **self._cache.stats(),
+            'exact_hits': self.exact_hits,
+            'near_hits': self.near_hits,
+            'text_dense': self.text_dense,
+            'hash_failures': self.hash_failures,
+        }
+
+
+image_answer_cache = ImageAnswerCache(
+    IMAGE_CACHE_ENABLED, IMAGE_CACHE_SIZE, IMAGE_CACHE_TTL_SECONDS, IMAGE_HASH_THRESHOLD
+)
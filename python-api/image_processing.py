@@ -0,0 +1,160 @@
+"""
+VİSİ AI - Görsel Ön İşleme
+Soru fotoğraflarını Gemini'ye göndermeden önce küçültür ve yeniden sıkıştırır
+"""
+
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from config import (
+    IMAGE_MAX_DIMENSION, IMAGE_OUTPUT_FORMAT, IMAGE_OUTPUT_QUALITY, IMAGE_PROCESS_WORKERS
+)
+from images import ImageInput
+
+# Pillow yoksa görseller olduğu gibi gönderilir
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+    ImageOps = None
+    print("⚠️ Pillow yüklü değil, görsel ön işleme kapalı")
+
+_OUTPUT_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+
+def pillow_available() -> bool:
+    return Image is not None
+
+
+def _to_rgb(image: "Image.Image") -> "Image.Image":
+    """Saydamlığı beyaz zemine bindir (kağıt fotoğrafı için doğal arka plan)"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def shrink_image(
+    image: ImageInput,
+    max_dimension: int = IMAGE_MAX_DIMENSION,
+    output_format: str = IMAGE_OUTPUT_FORMAT,
+    quality: int = IMAGE_OUTPUT_QUALITY
+) -> ImageInput:
+    """Yönü düzelt, en uzun kenarı sınırla, meta veriyi at ve yeniden kodla
+
+    Sonuç orijinalden büyükse orijinal döner.
+    """
+    pil_format, mime_type = _OUTPUT_FORMATS[output_format]
+    with Image.open(io.BytesIO(image.data)) as source:
+        # EXIF yönü piksellere uygulanır; EXIF'in kendisi kaydedilmez
+        picture = ImageOps.exif_transpose(source)
+        picture = _to_rgb(picture)
+        resized = max(picture.size) > max_dimension
+        if resized:
+            picture.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        out = io.BytesIO()
+        picture.save(out, format=pil_format, quality=quality, optimize=True)
+        data = out.getvalue()
+
+    if not resized and len(data) >= len(image.data):
+        return image
+    return ImageInput(data=data, mime_type=mime_type)
+
+
+class ImageProcessor:
+    """Ön işlemeyi iş parçacığı havuzunda çalıştırır, bayt/süre sayaçlarını tutar"""
+
+    def __init__(
+        self,
+        workers: int = IMAGE_PROCESS_WORKERS,
+        max_dimension: int = IMAGE_MAX_DIMENSION,
+        output_format: str = IMAGE_OUTPUT_FORMAT,
+        quality: int = IMAGE_OUTPUT_QUALITY
+    ):
+        self.workers = max(1, workers)
+        self.max_dimension = max_dimension
+        self.output_format = output_format if output_format in _OUTPUT_FORMATS else 'webp'
+        self.quality = quality
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.processed = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Pillow kod çözme/yeniden boyutlandırmada GIL'i bırakır; iş parçacığı yeterli
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="image-process"
+            )
+        return self._executor
+
+    def _process_sync(self, image: ImageInput) -> ImageInput:
+        return shrink_image(image, self.max_dimension, self.output_format, self.quality)
+
+    async def process(self, image: ImageInput) -> ImageInput:
+        """Görseli küçült; hata olursa orijinali döndür (sohbet asla bloklanmaz)"""
+        if not pillow_available():
+            return image
+
+        started = time.perf_counter()
+        try:
+            result = await self.run(self._process_sync, image)
+        except Exception as e:
+            print(f"Görsel ön işleme hatası: {e}")
+            self.failed += 1
+            return image
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.processed += 1
+        if result is image:
+            self.unchanged += 1
+        self.bytes_in += len(image.data)
+        self.bytes_out += len(result.data)
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        return result
+
+    async def run(self, fn, *args):
+        """Görsel üzerinde CPU ağırlıklı başka bir işi aynı havuzda çalıştır"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), fn, *args)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> Dict:
+        """İşlenen görsel, kazanılan bayt ve süre sayaçları"""
+        return {
+            'enabled': pillow_available(),
+            'max_dimension': self.max_dimension,
+            'output_format': self.output_format,
+            'processed': self.processed,
+            'unchanged': self.unchanged,
+            'failed': self.failed,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'bytes_saved': self.bytes_in - self.bytes_out,
+            'saved_ratio': round(1 - self.bytes_out / self.bytes_in, 4) if self.bytes_in else 0.0,
+            'avg_ms': round(self.total_ms / self.processed, 2) if self.processed else 0.0,
+            'max_ms': round(self.max_ms, 2),
+        }
+
+
+image_processor = ImageProcessor()
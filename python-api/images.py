@@ -0,0 +1,93 @@
+"""
+VİSİ AI - Görsel Girişi
+Yüklenen soru fotoğraflarını sınırlı tampona okur, gerçek MIME tipini doğrular
+"""
+
+import base64
+import binascii
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from fastapi import UploadFile
+
+from config import IMAGE_MAX_BYTES, IMAGE_READ_CHUNK_BYTES
+
+# Gemini'nin kabul ettiği görsel tipleri
+ALLOWED_IMAGE_TYPES = {'image/jpeg', 'image/png', 'image/webp', 'image/heic', 'image/heif'}
+
+
+class ImageError(Exception):
+    """Geçersiz / çok büyük görsel (HTTP durum kodu ile)"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class ImageInput:
+    """Doğrulanmış görsel: ham baytlar ve tespit edilen MIME tipi"""
+    data: bytes
+    mime_type: str
+    # Görsel soru önbelleği parmak izi: (hash bit sayısı, algısal hash) (hesaplandıysa)
+    phash: Optional[Tuple[int, int]] = None
+
+
+def sniff_image_mime(data: bytes) -> Optional[str]:
+    """Dosya başlığındaki imzadan (magic bytes) görsel tipini bul"""
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[4:8] == b'ftyp':
+        brand = data[8:12]
+        if brand in (b'heic', b'heix', b'hevc', b'hevx'):
+            return 'image/heic'
+        if brand in (b'mif1', b'msf1'):
+            return 'image/heif'
+    return None
+
+
+def validate_image(data: bytes, max_bytes: int = IMAGE_MAX_BYTES) -> ImageInput:
+    """Boyut sınırı ve içerik tipine göre doğrula"""
+    if not data:
+        raise ImageError(400, "Görsel boş")
+    if len(data) > max_bytes:
+        raise ImageError(413, f"Görsel en fazla {max_bytes // (1024 * 1024)} MB olabilir")
+    mime_type = sniff_image_mime(data)
+    if mime_type not in ALLOWED_IMAGE_TYPES:
+        raise ImageError(415, "Desteklenmeyen görsel formatı (JPEG, PNG, WEBP veya HEIC)")
+    return ImageInput(data=data, mime_type=mime_type)
+
+
+def decode_base64_image(image: str, max_bytes: int = IMAGE_MAX_BYTES) -> ImageInput:
+    """JSON'daki base64 / data URL görseli çöz (eski istemciler için)"""
+    image_data = image.split(",", 1)[1] if "," in image else image
+    # Çözmeden önce kabaca boyut kontrolü (base64 ~4/3 büyür)
+    if len(image_data) * 3 // 4 > max_bytes + 3:
+        raise ImageError(413, f"Görsel en fazla {max_bytes // (1024 * 1024)} MB olabilir")
+    try:
+        data = base64.b64decode(image_data)
+    except (binascii.Error, ValueError):
+        raise ImageError(400, "Görsel base64 olarak çözülemedi")
+    return validate_image(data, max_bytes)
+
+
+async def read_upload(
+    upload: UploadFile,
+    max_bytes: int = IMAGE_MAX_BYTES,
+    chunk_size: int = IMAGE_READ_CHUNK_BYTES
+) -> ImageInput:
+    """Multipart dosyayı parça parça oku; sınır aşılınca okumayı hemen bırak"""
+    buffer = bytearray()
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        if len(buffer) > max_bytes:
+            raise ImageError(413, f"Görsel en fazla {max_bytes // (1024 * 1024)} MB olabilir")
+    return validate_image(bytes(buffer), max_bytes)
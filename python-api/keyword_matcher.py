@@ -0,0 +1,141 @@
+"""
+VİSİ AI - Çoklu Anahtar Kelime Eşleştirici
+Aho-Corasick otomatı: metni tek geçişte tarar, maliyet kelime sayısından bağımsız
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class KeywordHits:
+    """Tek taramanın sonucu: kategori bazında eşleşen terimler"""
+
+    def __init__(self, matcher: "KeywordMatcher", pattern_ids: Set[int]):
+        self._matcher = matcher
+        self._pattern_ids = pattern_ids
+        self._counts: Optional[Dict[str, int]] = None
+        self._by_category: Optional[Dict[str, Set[str]]] = None
+
+    @property
+    def by_category(self) -> Dict[str, Set[str]]:
+        """Kategori → eşleşen terimler"""
+        if self._by_category is None:
+            by_category: Dict[str, Set[str]] = {c: set() for c in self._matcher.categories}
+            for pid in self._pattern_ids:
+                term = self._matcher.patterns[pid]
+                for category, _ in self._matcher.pattern_weights[pid]:
+                    by_category[category].add(term)
+            self._by_category = by_category
+        return self._by_category
+
+    def counts(self) -> Dict[str, int]:
+        """Tüm kategorilerin sayıları (tek döngüde hesaplanır)"""
+        if self._counts is None:
+            counts = dict.fromkeys(self._matcher.categories, 0)
+            for pid in self._pattern_ids:
+                for category, weight in self._matcher.pattern_weights[pid]:
+                    counts[category] += weight
+            self._counts = counts
+        return self._counts
+
+    def count(self, category: str) -> int:
+        """Kategorideki listede metinde geçen kelime sayısı (`k in text` sayımıyla aynı)"""
+        return self.counts()[category]
+
+    def terms(self, category: str) -> List[str]:
+        """Eşleşen terimler, kategori listesindeki sırayla"""
+        if not self._pattern_ids:
+            return []
+        order = self._matcher.category_order[category]
+        return sorted(self.by_category[category], key=order.__getitem__)
+
+    def first(self, category: str) -> Optional[str]:
+        """Listede ilk sırada olan eşleşen terim"""
+        if not self.count(category):
+            return None
+        return self.terms(category)[0]
+
+
+class KeywordMatcher:
+    """Kategorili kelime listelerinden bir kez derlenen Aho-Corasick otomatı.
+
+    Eşleşme alt dize eşleşmesidir (çakışan eşleşmeler dahil); metin
+    büyük/küçük harf dönüşümü yapılmadan taranır, normalizasyon çağıranın işidir.
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        self.categories: List[str] = list(categories)
+        self.patterns: List[str] = []
+        # Kelime → ((kategori, listedeki tekrar sayısı), ...)
+        # Listede aynı kelime iki kez varsa eski `k in text` sayımı iki kez sayardı
+        self.pattern_weights: List[Tuple[Tuple[str, int], ...]] = []
+        self.category_order: Dict[str, Dict[str, int]] = {}
+
+        pattern_index: Dict[str, int] = {}
+        pattern_weights: List[Dict[str, int]] = []
+        for category, words in categories.items():
+            order: Dict[str, int] = {}
+            for i, word in enumerate(words):
+                order.setdefault(word, i)
+                if word not in pattern_index:
+                    pattern_index[word] = len(self.patterns)
+                    self.patterns.append(word)
+                    pattern_weights.append({})
+                weights = pattern_weights[pattern_index[word]]
+                weights[category] = weights.get(category, 0) + 1
+            self.category_order[category] = order
+        self.pattern_weights = [tuple(w.items()) for w in pattern_weights]
+
+        self._build()
+
+    def _build(self) -> None:
+        """Trie + başarısızlık bağlantıları → geçiş tablosu"""
+        goto: List[Dict[str, int]] = [{}]
+        output: List[List[int]] = [[]]
+
+        for pid, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    output.append([])
+                state = nxt
+            output[state].append(pid)
+
+        fail = [0] * len(goto)
+        # Tam DFA: her durum, başarısızlık zincirindeki geçişleri de içerir;
+        # tarama sırasında fail zinciri yürümeye gerek kalmaz
+        delta: List[Dict[str, int]] = [dict() for _ in goto]
+        delta[0] = dict(goto[0])
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                fail[nxt] = delta[fail[state]].get(ch, 0)
+                output[nxt].extend(output[fail[nxt]])
+            merged = dict(delta[fail[state]])
+            merged.update(goto[state])
+            delta[state] = merged
+
+        self._delta = delta
+        self._output = [tuple(o) for o in output]
+
+    def scan(self, text: str) -> KeywordHits:
+        """Metni tek geçişte tara"""
+        delta = self._delta
+        output = self._output
+        found: Set[int] = set()
+
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if output[state]:
+                found.update(output[state])
+
+        return KeywordHits(self, found)
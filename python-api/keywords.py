@@ -0,0 +1,124 @@
+"""
+VİSİ AI - Anahtar Kelime Listeleri
+Triyaj, güvenlik ve duygu analizi kelimeleri + tek seferde derlenen eşleştirici
+"""
+
+from keyword_matcher import KeywordMatcher, KeywordHits
+
+def turkish_lower(text: str) -> str:
+    """Türkçe kurallarıyla küçük harfe çevir ('KAYGI' → 'kaygı')
+    
+    str.lower() 'I' → 'i' ve 'İ' → 'i̇' (birleşik nokta) üretir.
+    """
+    return text.replace('I', 'ı').replace('İ', 'i').lower()
+
+# ============================================================================
+# TRİYAJ VE GÜVENLİK KELİMELERİ (prompts.py)
+# ============================================================================
+
+ANXIETY_KEYWORDS = [
+    'stres', 'kaygı', 'endişe', 'korku', 'panik', 'bunaltı',
+    'odaklanamıyorum', 'odaklanamiyorum', 'dikkatim dağılıyor',
+    'kilitlendi', 'kilitleniyorum', 'sıkıştım', 'tıkandım',
+    'nefes alamıyorum', 'boğuluyorum', 'daralıyorum',
+    'uykusuzluk', 'uyuyamıyorum', 'kabuslar',
+    'çok zor', 'başa çıkamıyorum', 'altından kalkamıyorum',
+    'ağlıyorum', 'ağlamak istiyorum', 'gözyaşı',
+    'sinir', 'sinirli', 'gergin', 'gerginlik',
+    'tedirgin', 'huzursuz', 'rahatsız',
+    'sınav stresi', 'deneme stresi', 'sınav kaygısı'
+]
+
+MOTIVATION_KEYWORDS = [
+    'motivasyon', 'içimden gelmiyor', 'istemiyorum', 'yapmak istemiyorum',
+    'bırakmak', 'vazgeçmek', 'pes etmek',
+    'yoruldum', 'tükendim', 'bitkinim', 'yorgun',
+    'ne anlamı var', 'anlamsız', 'boşuna',
+    'erteliyorum', 'erteleme', 'başlayamıyorum',
+    'devam edemiyorum', 'sürdüremiyorum',
+    'heves', 'ilgi', 'istek', 'azim',
+    'tembellik', 'tembelim', 'üşeniyorum',
+    'çalışmak istemiyorum', 'ders istemiyorum'
+]
+
+CAREER_KEYWORDS = [
+    'meslek', 'kariyer', 'gelecek', 'ne olacağım',
+    'hangi bölüm', 'hangi alan', 'hangi fakülte',
+    'neye yatkınım', 'ne yapmalıyım', 'ne seçmeliyim',
+    'yeteneklerim', 'güçlü yanlarım', 'zayıf yanlarım',
+    'kendimi tanımak', 'keşfetmek',
+    'mühendis', 'doktor', 'avukat', 'öğretmen',
+    'üniversite', 'tercih', 'sıralama'
+]
+
+ACADEMIC_KEYWORDS = [
+    'program', 'çalışma planı', 'plan', 'planlama',
+    'deneme', 'sınav', 'test', 'quiz',
+    'net', 'netler', 'puan', 'sıralama',
+    'konu', 'ders', 'matematik', 'fizik', 'kimya', 'biyoloji',
+    'türkçe', 'edebiyat', 'tarih', 'coğrafya',
+    'çalış', 'çalışayım', 'ne çalışmalıyım',
+    'tekrar', 'tekrar etmeliyim',
+    'soru', 'soru çöz', 'çözüm',
+    'TYT', 'AYT', 'LGS', 'YKS'
+]
+
+SAFETY_KEYWORDS = [
+    'intihar', 'ölmek', 'kendime zarar',
+    'yaşamak istemiyorum', 'hayatıma son',
+    'acı çekiyorum', 'dayanamıyorum'
+]
+
+# ============================================================================
+# DUYGU GÖSTERGELERİ (psychological.py)
+# ============================================================================
+
+STRESS_INDICATORS = [
+    'stres', 'kaygı', 'gergin', 'bunaldım', 'sıkıldım',
+    'nefes alamıyorum', 'boğuluyorum', 'daralıyorum'
+]
+
+SADNESS_INDICATORS = [
+    'üzgün', 'mutsuz', 'ağlıyorum', 'kötü hissediyorum',
+    'moralim bozuk', 'keyifsiz', 'depresif'
+]
+
+ANGER_INDICATORS = [
+    'sinirli', 'kızgın', 'öfkeli', 'çıldırıyorum',
+    'bıktım', 'yeter artık', 'patladım'
+]
+
+EXHAUSTION_INDICATORS = [
+    'yoruldum', 'tükendim', 'bitkin', 'enerjim yok',
+    'uyuyamıyorum', 'uykum yok', 'dermansız'
+]
+
+HOPE_INDICATORS = [
+    'umutlu', 'iyimser', 'heyecanlı', 'motiveyim',
+    'yapabilirim', 'başaracağım', 'güçlüyüm'
+]
+
+# ============================================================================
+# DERLENMİŞ EŞLEŞTİRİCİ
+# ============================================================================
+
+KEYWORD_CATEGORIES = {
+    'anxiety': ANXIETY_KEYWORDS,
+    'motivation': MOTIVATION_KEYWORDS,
+    'career': CAREER_KEYWORDS,
+    'academic': ACADEMIC_KEYWORDS,
+    'safety': SAFETY_KEYWORDS,
+    'stress': STRESS_INDICATORS,
+    'sadness': SADNESS_INDICATORS,
+    'anger': ANGER_INDICATORS,
+    'exhaustion': EXHAUSTION_INDICATORS,
+    'hope': HOPE_INDICATORS,
+}
+
+# Import anında bir kez derlenir
+KEYWORD_MATCHER = KeywordMatcher(KEYWORD_CATEGORIES)
+
+
+def scan_keywords(text: str) -> KeywordHits:
+    """Normalize edilmiş (turkish_lower) metni tüm kategoriler için tek geçişte tara"""
+    return KEYWORD_MATCHER.scan(text)
@@ -0,0 +1,272 @@
+"""
+VİSİ AI - LLM Katmanı
+Gemini çağrılarını event loop'u bloklamadan yürütür
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+
+from config import (
+    GEMINI_MODEL_NAME, LLM_MAX_CONCURRENCY, LLM_POOL_SIZE, LLM_EXPECTED_OUTPUT_TOKENS
+)
+from context_cache import context_cache
+from history import count_tokens, message_tokens
+from resilience import llm_resilience
+from scheduler import Admission, llm_scheduler, LANE_STANDARD
+
+# ============================================================================
+# MODEL / BAĞLANTI HAVUZU
+# ============================================================================
+
+class ModelPool:
+    """Süreç genelinde paylaşılan GenerativeModel havuzu.
+
+    Her üye kendi async gRPC istemcisine (kalıcı kanal) sahiptir; istekler
+    üyeler arasında sırayla dağıtılır, böylece bağlantılar istekler arasında
+    yeniden kullanılır.
+    """
+
+    def __init__(self, model_name: str, size: int):
+        self.model_name = model_name
+        self.size = max(1, size)
+        self._models: List[genai.GenerativeModel] = []
+        self._next = 0
+        self.created = 0
+        self.reused = 0
+
+    def _create_model(self) -> genai.GenerativeModel:
+        model = genai.GenerativeModel(self.model_name)
+        # Her üyeye ayrı kanal; SDK bu iç API'yi sunmuyorsa varsayılan paylaşımlı istemci kullanılır
+        manager = getattr(genai_client, "_client_manager", None)
+        if manager is not None and hasattr(manager, "make_client"):
+            model._async_client = manager.make_client("generative_async")
+        self.created += 1
+        return model
+
+    def start(self) -> None:
+        """Havuzu başlangıçta doldur (startup event'inde çağrılır)"""
+        while len(self._models) < self.size:
+            self._models.append(self._create_model())
+
+    def get(self) -> genai.GenerativeModel:
+        """Sıradaki model üyesini döndür (havuz boşsa tembel doldurur)"""
+        if len(self._models) < self.size:
+            model = self._create_model()
+            self._models.append(model)
+            return model
+
+        model = self._models[self._next % len(self._models)]
+        self._next += 1
+        self.reused += 1
+        return model
+
+    def stats(self) -> Dict:
+        """Havuz sayaçları (yeni bağlantı vs. yeniden kullanım)"""
+        return {
+            'model_name': self.model_name,
+            'pool_size': self.size,
+            'models_ready': len(self._models),
+            'created': self.created,
+            'reused': self.reused,
+        }
+
+
+model_pool = ModelPool(GEMINI_MODEL_NAME, LLM_POOL_SIZE)
+
+# ============================================================================
+# EŞZAMANLILIK VE KOTA KONTROLÜ
+# ============================================================================
+
+# Gemini görsel başına sabit token sayar
+IMAGE_TOKENS = 258
+
+_stats = {
+    'in_flight': 0,
+    'waiting': 0,
+    'completed': 0,
+    'failed': 0,
+}
+
+
+def estimate_prompt_tokens(
+    history: List[Dict],
+    message_parts: list,
+    system_instruction: Optional[str] = None
+) -> int:
+    """Gemini'ye gidecek prompt'un (prefix + geçmiş + mesaj) token tahmini"""
+    tokens = count_tokens(system_instruction or "")
+    tokens += sum(message_tokens(m) for m in history)
+    for part in message_parts:
+        tokens += count_tokens(part) if isinstance(part, str) else IMAGE_TOKENS
+    return tokens
+
+
+def estimate_request_tokens(
+    history: List[Dict],
+    message_parts: list,
+    system_instruction: Optional[str] = None
+) -> int:
+    """Kota hesabı için istek + beklenen yanıt token tahmini"""
+    return estimate_prompt_tokens(history, message_parts, system_instruction) + LLM_EXPECTED_OUTPUT_TOKENS
+
+
+@asynccontextmanager
+async def _llm_slot(admission: Admission):
+    """Zamanlayıcıdan (kota + eşzamanlılık) yer al, çağrı bitene kadar tut
+
+    Çağıran, yield edilen sözlüğe 'output_tokens' yazarsa TPM kaydı gerçek
+    kullanımla düzeltilir. Sağlayıcı 429 dönerse aynı admission ile
+    yeniden girilir (llm_scheduler.requeue).
+    """
+    _stats['waiting'] += 1
+    try:
+        ticket = await llm_scheduler.acquire(admission.lane, admission.tokens, admission)
+    finally:
+        _stats['waiting'] -= 1
+
+    _stats['in_flight'] += 1
+    usage = {'output_tokens': None}
+    error = None
+    try:
+        yield usage
+    except BaseException as e:
+        error = e
+        _stats['failed'] += 1
+        raise
+    else:
+        _stats['completed'] += 1
+    finally:
+        _stats['in_flight'] -= 1
+        llm_scheduler.release(ticket, usage['output_tokens'], error)
+
+
+# ============================================================================
+# YANIT ÜRETİMİ
+# ============================================================================
+
+def priming_turns(system_instruction: str) -> List[Dict]:
+    """System instruction desteklenmiyorsa prefix'i ilk tura göm (eski yöntem)"""
+    return [
+        {"role": "user", "parts": [system_instruction]},
+        {"role": "model", "parts": ["Anlaşıldı. Visi AI göreve hazır."]},
+    ]
+
+
+async def _resolve_model(
+    history: List[Dict],
+    system_instruction: Optional[str]
+) -> Tuple[genai.GenerativeModel, List[Dict]]:
+    """Prefix'i taşıyan modeli (önbellekten) ve gönderilecek geçmişi seç"""
+    if not system_instruction:
+        return model_pool.get(), history
+
+    entry = await context_cache.get_or_create(system_instruction)
+    if entry is not None and entry.model is not None:
+        # Prefix sağlayıcıda; yalnızca konuşma turları gönderilir
+        return entry.model, history
+
+    return model_pool.get(), priming_turns(system_instruction) + history
+
+
+async def generate_reply(
+    history: List[Dict],
+    message_parts: list,
+    system_instruction: Optional[str] = None,
+    lane: int = LANE_STANDARD
+) -> str:
+    """Sohbet geçmişi + mesajla Gemini yanıtı üret (asenkron)"""
+    admission = Admission(lane, estimate_request_tokens(history, message_parts, system_instruction))
+    model, history = await _resolve_model(history, system_instruction)
+
+    async def attempt() -> str:
+        while True:
+            try:
+                async with _llm_slot(admission) as usage:
+                    ai_chat = model.start_chat(history=history)
+                    response = await llm_resilience.timed(ai_chat.send_message_async(message_parts))
+                    text = response.text
+                    usage['output_tokens'] = count_tokens(text)
+                    return text
+            except Exception as e:
+                # Kota 429'u: soğuma bitince aynı şerit ve sırayla tekrar kuyruğa gir
+                if not llm_scheduler.requeue(admission, e):
+                    raise
+
+    return await llm_resilience.call(attempt)
+
+
+async def stream_reply(
+    history: List[Dict],
+    message_parts: list,
+    system_instruction: Optional[str] = None,
+    lane: int = LANE_STANDARD
+) -> AsyncIterator[str]:
+    """Gemini yanıtını parça parça üret (SSE için)"""
+    admission = Admission(lane, estimate_request_tokens(history, message_parts, system_instruction))
+    model, history = await _resolve_model(history, system_instruction)
+
+    attempt = 0
+    while True:
+        attempt += 1
+        llm_resilience.before_call(attempt)
+        emitted = False
+        try:
+            while True:
+                try:
+                    async with _llm_slot(admission) as usage:
+                        usage['output_tokens'] = 0
+                        ai_chat = model.start_chat(history=history)
+                        response = await llm_resilience.timed(
+                            ai_chat.send_message_async(message_parts, stream=True)
+                        )
+                        chunks = response.__aiter__()
+                        while True:
+                            # Süre sınırı her parça arası beklemeye uygulanır
+                            try:
+                                chunk = await llm_resilience.timed(chunks.__anext__())
+                            except StopAsyncIteration:
+                                break
+                            try:
+                                text = chunk.text
+                            except ValueError:
+                                # Metin içermeyen parça (ör. sadece finish_reason)
+                                continue
+                            if text:
+                                usage['output_tokens'] += count_tokens(text)
+                                emitted = True
+                                yield text
+                    break
+                except Exception as e:
+                    # Parça gitmeden gelen kota 429'u: soğuma sonrası aynı sırayla tekrar kuyruğa gir
+                    if emitted or not llm_scheduler.requeue(admission, e):
+                        raise
+        except Exception as e:
+            # İstemciye parça gittiyse yeniden deneme yanıtı ikiler
+            delay = llm_resilience.on_failure(e, attempt, can_retry=not emitted)
+            if delay is None:
+                raise
+            print(f"Gemini stream hatası, {delay * 1000:.0f} ms sonra tekrar deneniyor: {e}")
+            await asyncio.sleep(delay)
+        except BaseException:
+            # İptal / istemci bağlantıyı kapattı
+            llm_resilience.breaker.release_probe()
+            raise
+        else:
+            llm_resilience.record_success()
+            return
+
+
+def get_llm_stats() -> Dict:
+    """LLM katmanı sayaçlarını döndür"""
+    return {
+        'max_concurrency': LLM_MAX_CONCURRENCY,
+        **_stats,
+        'scheduler': llm_scheduler.stats(),
+        'resilience': llm_resilience.stats(),
+        'pool': model_pool.stats(),
+        'context_cache': context_cache.stats(),
+    }
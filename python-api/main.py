@@ -3,62 +3,67 @@ VİSİ AI - Ana FastAPI Uygulaması
 Türkiye'nin en gelişmiş AI eğitim koçu
 """
 
-import os
-import base64
+import asyncio
+import json
+import math
+import secrets
+import time
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, List
-from pathlib import Path
+from typing import Optional, List, Tuple
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Form, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-from dotenv import load_dotenv
+from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse, Response, PlainTextResponse
+from pydantic import ValidationError
 
 import google.generativeai as genai
 
+from config import (
+    GEMINI_API_KEY, BATCH_MAX_MESSAGES, BATCH_MAX_BODY_BYTES, IMAGE_MAX_BYTES, COHORT_MAX_STUDENTS,
+    COHORT_MAX_INLINE_PROFILES, LLM_SINGLE_FLIGHT, METRICS_ENABLED, TRACE_ENABLED, ADMIN_TOKEN,
+    PROFILER_INTERVAL_MS, PROFILER_MAX_SECONDS, PROFILE_EVERY_N_CHAT
+)
 from models import (
     ChatRequest, ChatResponse, HealthResponse,
-    StudentContext, ChatMessage
+    StudentContext, ChatMessage, TriageResult,
+    SessionCreateRequest, SessionCreateResponse, SessionMessageRequest,
+    SessionMessageResponse, SessionInfoResponse,
+    BatchTriageRequest, BatchTriageResponse,
+    StudentProfile, ExamResult, TopicPerformance,
+    StudentProfileUpdate, ProfileSummaryResponse,
+    CohortAnalyticsRequest, CohortAnalyticsResponse
 )
 from prompts import (
-    get_system_prompt, get_mod_specific_prompt, perform_triage,
-    check_safety, MOD_NAMES, MOD_ICONS, MOD_TRANSITION_MESSAGES
+    get_system_prompt, get_mod_specific_prompt,
+    get_prompt_cache_stats, MOD_NAMES, MOD_ICONS, MOD_TRANSITION_MESSAGES
 )
-from student_data import generate_student_data_prompt
-from psychological import analyze_emotional_state, get_motivation_message
+from student_data import generate_student_data_prompt, get_student_prompt_cache_stats
+from psychological import get_motivation_message
+from message_analysis import analyze_message, select_active_mod, get_analysis_stats
 from exam_strategies import generate_exam_strategy_prompt
-
-# .env dosyasını yükle (Robust Yöntem)
-env_path = Path(__file__).parent / '.env'
-try:
-    load_dotenv(dotenv_path=env_path)
-except Exception as e:
-    print(f".env yükleme hatası (yoksayılıyor): {e}")
-
-# Fallback: Eğer key yoksa root'taki .env.local'e bak
-if not os.getenv("GEMINI_API_KEY"):
-    root_env = Path(__file__).parent.parent / '.env.local'
-    if root_env.exists():
-        print(f"Root .env.local bulundu: {root_env}")
-        try:
-            load_dotenv(dotenv_path=root_env)
-        except Exception as e:
-            print(f".env.local yükleme hatası (yoksayılıyor): {e}")
-
-# Eğer load_dotenv çalışmazsa manuel oku (Limitli destek)
-if not os.getenv("GEMINI_API_KEY") and env_path.exists():
-    try:
-        with open(env_path, 'r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                if line.startswith('GEMINI_API_KEY='):
-                    key = line.strip().split('=', 1)[1]
-                    os.environ["GEMINI_API_KEY"] = key.strip()
-                    break
-    except Exception as e:
-        print(f"Manuel .env okuma hatası: {e}")
+from llm import generate_reply, stream_reply, model_pool, get_llm_stats, estimate_prompt_tokens
+from scheduler import lane_for, is_quota_error, QueueTimeoutError
+from resilience import CircuitOpenError, LLMTimeoutError
+from coalesce import llm_single_flight, prompt_key
+from context_cache import context_cache
+from sessions import ConversationSession, session_store
+from history import history_manager
+from batch_triage import triage_batch, start_executor, shutdown_executor
+from response_cache import response_cache
+from images import ImageInput, ImageError, decode_base64_image, read_upload
+from image_processing import image_processor
+from image_cache import image_answer_cache
+from profiles import get_profile_store, close_profile_store
+from cohort import CohortTooLargeError, analyze_cohort, numpy_available
+from metrics import (
+    registry, CONTENT_TYPE, MetricsMiddleware, stage, observe_stage, current_timer,
+    CHAT_IN_FLIGHT, CHAT_ERRORS, QUOTA_ERRORS, CACHE_HITS, PROMPT_CHARS, PROMPT_TOKENS
+)
+from tracing import TraceMiddleware, trace_log
+from profiler import profile_for, ProfilerBusyError, RequestProfilerMiddleware, get_profiler_stats
 
 # Gemini API yapılandırma
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 print(f"API Key durumu: {'YÜKLENDİ ✅' if GEMINI_API_KEY else 'EKSİK ❌'}")
 
 if GEMINI_API_KEY:
@@ -78,9 +83,62 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id", "Server-Timing"],
 )
 
 
+# Multipart gövdesi ayrıştırılmadan önce açıkça büyük yüklemeleri reddet
+UPLOAD_BODY_OVERHEAD_BYTES = 256 * 1024
+
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    if request.url.path == "/api/chat/upload":
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and \
+                int(content_length) > IMAGE_MAX_BYTES + UPLOAD_BODY_OVERHEAD_BYTES:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"Görsel en fazla {IMAGE_MAX_BYTES // (1024 * 1024)} MB olabilir"}
+            )
+    return await call_next(request)
+
+
+# add_middleware son ekleneni en dışa koyar; dıştan içe sıra:
+# TraceMiddleware → MetricsMiddleware → RequestProfilerMiddleware → limit_upload_size → CORS
+
+# Her N'inci chat isteğinin CPU profili (iz kimliğini okuyabilmesi için izlerin içinde)
+if PROFILE_EVERY_N_CHAT:
+    app.add_middleware(RequestProfilerMiddleware)
+
+# İstek / aşama metrikleri (izlerin hemen içinde; stream'lerde son parçaya kadar ölçer)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Chat isteklerine iz kimliği + Server-Timing (aşama süreleri); en dıştaki katman
+if TRACE_ENABLED:
+    app.add_middleware(TraceMiddleware)
+
+
+@app.on_event("startup")
+async def startup():
+    """Model havuzunu, kalıcı bağlantıları ve toplu triyaj süreç havuzunu hazırla"""
+    if GEMINI_API_KEY:
+        model_pool.start()
+    start_executor()
+    get_profile_store()
+    trace_log.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Toplu triyaj süreç havuzunu, görsel iş parçacıklarını ve profil deposunu kapat"""
+    shutdown_executor()
+    image_processor.shutdown()
+    close_profile_store()
+    trace_log.stop()
+
+
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
@@ -127,161 +185,826 @@ async def health_check():
     )
 
 
-@app.post("/api/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    """Ana chat endpoint - AI ile sohbet"""
+# ============================================================================
+# CHAT PIPELINE
+# ============================================================================
+
+@dataclass
+class PreparedChat:
+    """Gemini çağrısından önce hazırlanan sohbet durumu"""
+    active_mod: str
+    triage: TriageResult
+    emotional_state: dict
+    safety: dict
+    system_instruction: str = ""
+    history: List[dict] = field(default_factory=list)
+    message_parts: list = field(default_factory=list)
+    # None → yanıt önbelleğe alınmaz
+    cache_key: Optional[str] = None
+    # (algısal hash, kapsam) → görsel soru önbelleği
+    image_lookup: Optional[Tuple[int, str]] = None
+
+    @property
+    def lane(self) -> int:
+        """Gemini kuyruğundaki öncelik şeridi"""
+        return lane_for(self.active_mod, self.safety.get('risk_level', 'safe'))
+
+    def flight_key(self) -> Optional[str]:
+        """Eşzamanlı aynı istekleri tek Gemini çağrısında birleştirme anahtarı"""
+        if not LLM_SINGLE_FLIGHT:
+            return None
+        return prompt_key(self.active_mod, self.system_instruction, self.history, self.message_parts)
+
+    def prompt_size(self) -> Tuple[int, int]:
+        """Gemini'ye gidecek prompt'un karakter ve tahmini token sayısı"""
+        chars = len(self.system_instruction)
+        chars += sum(len(p) for m in self.history for p in m.get('parts', []) if isinstance(p, str))
+        chars += sum(len(p) for p in self.message_parts if isinstance(p, str))
+        tokens = estimate_prompt_tokens(self.history, self.message_parts, self.system_instruction)
+        return chars, tokens
+
+    def response_meta(self) -> dict:
+        """Yanıttan bağımsız triyaj sonucu (stream'de ilk olay)"""
+        return {
+            'mod': self.active_mod,
+            'mod_reason': self.triage.reason,
+            'emotional_load': self.emotional_state['emotional_load'],
+            'academic_ready': self.triage.academic_ready,
+            'safety_status': self.safety.get('risk_level', 'safe'),
+        }
+
+
+def prepare_chat(
+    request: ChatRequest,
+    session: Optional[ConversationSession] = None,
+    image: Optional[ImageInput] = None
+) -> PreparedChat:
+    """Güvenlik, duygu, triyaj ve prompt adımlarını çalıştır
     
-    if not GEMINI_API_KEY:
-        raise HTTPException(status_code=500, detail="Gemini API Key yapılandırılmamış (Sunucu tarafı)")
+    session verilirse geçmiş istekten değil sunucu tarafı oturumdan okunur.
+    image, load_image ile çözülüp küçültülmüş görseldir.
+    """
     
-    try:
-        # Model oluştur
-        model = genai.GenerativeModel("gemini-2.0-flash")
-        
-        # 1. Güvenlik kontrolü
-        safety = check_safety(request.message)
-        
-        # 2. Duygu Analizi
-        emotional_state = analyze_emotional_state(request.message, request.student_context)
-        
-        # 3. Triyaj - Mod Seçimi
+    # 1-3. Güvenlik, Duygu Analizi, Triyaj - mesaj bir kez normalize edilip taranır
+    if session is not None:
+        history_dicts = session.triage_history()
+    else:
         history_dicts = [{"content": m.content, "role": m.role} for m in request.history] if request.history else []
-        triage = perform_triage(request.message, request.student_context, history_dicts)
-        
-        # Eğer zorlanmış mod varsa, triyajı ez
-        if request.forced_mod:
-            active_mod = request.forced_mod
-            triage.reason = f"Kullanıcı tarafından zorlandı: {active_mod}"
-        else:
-            # Duygusal duruma göre mod override edilebilir
-            active_mod = triage.selected_mod
-            if emotional_state['needs_support'] and active_mod == 'academic':
-                # Eğer öğrenci çok stresliyse akademik yerine odak moduna geç
-                if emotional_state['dominant_emotion'] in ['stress', 'exhaustion']:
-                    active_mod = 'focus-anxiety'
-                    triage.reason = "Yüksek duygusal yük tespit edildi."
-                elif emotional_state['dominant_emotion'] in ['sadness', 'anger']:
-                    active_mod = 'safe-support'
-                    triage.reason = "Duygusal destek ihtiyacı tespit edildi."
-
-        # 4. Prompt Hazırlığı
-        system_prompt = get_system_prompt(request.student_context)
-        mod_prompt = get_mod_specific_prompt(active_mod, request.student_context)
-        
-        # Sınav Stratejisi Ekle (Eğer mesajda sınav adı geçiyorsa)
-        exam_strategy_prompt = ""
-        for exam in ['TYT', 'AYT', 'LGS', 'KPSS']:
-            if exam in request.message.upper():
-                exam_strategy_prompt = generate_exam_strategy_prompt(exam)
-                break
-        
-        # Öğrenci Verisi Ekle
-        student_data_prompt = ""
-        if request.student_data:
+    analysis_started = time.perf_counter()
+    analysis = analyze_message(request.message, request.student_context, history_dicts)
+    record_analysis_stages(analysis.timings, analysis_started)
+    safety = analysis.safety
+    emotional_state = analysis.emotional_state
+    triage = analysis.triage
+    
+    # Zorlanmış mod / duygusal duruma göre son mod
+    active_mod = select_active_mod(analysis, request.forced_mod)
+    assembly_started = time.perf_counter()
+
+    # Genel akademik sorularda yanıt / görsel önbelleği; kişisel alanlar (isim, anlık
+    # durum) yalnızca anahtardan çıkarılır, ıskada prompt tam bağlamla üretilir
+    cache_key = None
+    image_lookup = None
+    if response_cache.is_cacheable(request, active_mod, safety, len(history_dicts), image is not None):
+        cache_key = response_cache.make_key(
+            request.message, active_mod, request.student_context,
+            emotional_state, triage.academic_ready
+        )
+    elif image is not None and image.phash is not None and \
+            image_answer_cache.is_cacheable(request, active_mod, safety, len(history_dicts)):
+        image_lookup = (
+            image.phash, image_answer_cache.scope(request.message, active_mod, request.student_context)
+        )
+
+    # 4. Prompt Hazırlığı
+    system_prompt = get_system_prompt(request.student_context)
+    mod_prompt = get_mod_specific_prompt(active_mod, request.student_context)
+    
+    # Sınav Stratejisi Ekle (Eğer mesajda sınav adı geçiyorsa)
+    exam_strategy_prompt = ""
+    if analysis.primary_exam:
+        exam_strategy_prompt = generate_exam_strategy_prompt(analysis.primary_exam)
+    
+    # Öğrenci Verisi Ekle
+    student_data_prompt = ""
+    if request.student_data:
+        with stage('student_data_prompt'):
             student_data_prompt = generate_student_data_prompt(request.student_data)
-        
-        # 5. Chat History Oluştur
+    
+    # 5. Sabit sistem prefix'i (sistem + mod + sınav + öğrenci verisi)
+    # Bu kısım turdan tura değişmediği için sağlayıcıda önbelleğe alınır
+    system_instruction = f"{system_prompt}\n\n{mod_prompt}"
+    if exam_strategy_prompt:
+        system_instruction += f"\n\n{exam_strategy_prompt}"
+    if student_data_prompt:
+        system_instruction += f"\n\n{student_data_prompt}"
+    
+    # Geçmiş mesajları ekle (oturumda zaten Gemini formatında tutuluyor)
+    if session is not None:
+        chat_history = list(session.gemini_history)
+    else:
         chat_history = []
-        
-        # Tüm sistem talimatlarını birleştir
-        full_system = f"{system_prompt}\n\n{mod_prompt}"
-        if exam_strategy_prompt:
-            full_system += f"\n\n{exam_strategy_prompt}"
-        if student_data_prompt:
-            full_system += f"\n\n{student_data_prompt}"
-            
-        # Duygusal durum bilgisini sisteme ekle
-        full_system += f"\n\n[SİSTEM NOTU: Öğrenci Duygu Durumu: {emotional_state['dominant_emotion'].upper()}, Yük: {emotional_state['emotional_load']}]"
-        
-        # Motivasyon mesajı ekle (Eğer mod motivasyon ise)
-        if active_mod == 'motivation-discipline':
-            motiv_msg = get_motivation_message('effort_acknowledgment')
-            full_system += f"\n[İPUCU: Şu motivasyon cümlesini kullanabilirsin: '{motiv_msg}']"
-
-        chat_history.append({
-            "role": "user",
-            "parts": [full_system]
-        })
-        chat_history.append({
-            "role": "model",
-            "parts": ["Anlaşıldı. Visi AI göreve hazır."]
-        })
-        
-        # Geçmiş mesajları ekle
         for msg in request.history:
             chat_history.append({
                 "role": "user" if msg.role == "user" else "model",
                 "parts": [msg.content]
             })
-        
-        # Mevcut mesajı hazırla
-        current_message = f"""[AKTİF MOD: {active_mod.upper()}]
+    
+    # Token bütçesini aşan eski turlar kayan özete katlanır
+    chat_history = history_manager.window(
+        chat_history, session.session_id if session is not None else None
+    ).history
+    
+    # Tura özel notlar (duygu durumu, motivasyon ipucu) mevcut mesaja eklenir
+    turn_notes = f"[SİSTEM NOTU: Öğrenci Duygu Durumu: {emotional_state['dominant_emotion'].upper()}, Yük: {emotional_state['emotional_load']}]"
+    
+    # Motivasyon mesajı ekle (Eğer mod motivasyon ise)
+    if active_mod == 'motivation-discipline':
+        motiv_msg = get_motivation_message('effort_acknowledgment')
+        turn_notes += f"\n[İPUCU: Şu motivasyon cümlesini kullanabilirsin: '{motiv_msg}']"
+    
+    # Mevcut mesajı hazırla
+    current_message = f"""{turn_notes}
+[AKTİF MOD: {active_mod.upper()}]
 [DUYGU: {emotional_state['dominant_emotion'].upper()}]
 [AKADEMİK HAZIRLIK: {'EVET' if triage.academic_ready else 'HAYIR'}]
 
 ÖĞRENCİ: {request.message}"""
-        
-        # 6. Görsel İşleme
-        message_parts = [current_message]
-        if request.image:
-            try:
-                if "," in request.image:
-                    image_data = request.image.split(",")[1]
-                else:
-                    image_data = request.image
-                
-                image_prompt = """
+    
+    # 6. Görsel İşleme
+    message_parts = [current_message]
+    if image is not None:
+        image_prompt = """
 📸 GÖRSEL SORU ÇÖZÜM MODU
 1. Soru tipi ve konuyu belirle
 2. Çözüm stratejisini açıkla
 3. Adım adım çözümü göster
 4. Doğru cevabı net bir şekilde belirt
 """
-                message_parts = [image_prompt + "\n\n" + current_message]
-                
-                import io
-                image_bytes = base64.b64decode(image_data)
-                message_parts.append({
-                    "mime_type": "image/jpeg",
-                    "data": image_bytes
-                })
-            except Exception as e:
-                print(f"Görsel hatası: {e}")
+        message_parts = [
+            image_prompt + "\n\n" + current_message,
+            {"mime_type": image.mime_type, "data": image.data}
+        ]
+    
+    # Prompt derleme (öğrenci verisi aşaması dahil)
+    observe_stage('prompt_assembly', time.perf_counter() - assembly_started, assembly_started)
+    
+    return PreparedChat(
+        active_mod=active_mod,
+        triage=triage,
+        emotional_state=emotional_state,
+        safety=safety,
+        system_instruction=system_instruction,
+        history=chat_history,
+        message_parts=message_parts,
+        cache_key=cache_key,
+        image_lookup=image_lookup
+    )
+
+
+async def resolve_student_data(request: ChatRequest) -> ChatRequest:
+    """student_id verilmişse profili depodan alıp isteğe ekle"""
+    if not request.student_id or request.student_data is not None:
+        return request
+    with stage('profile_load'):
+        profile = await get_profile_store().get(request.student_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Öğrenci profili bulunamadı")
+    return request.model_copy(update={'student_data': profile})
+
+
+async def load_image(
+    request: ChatRequest,
+    image: Optional[ImageInput] = None,
+    history_len: int = 0
+) -> Optional[ImageInput]:
+    """Görseli çöz (JSON base64 ise) ve Gemini'ye gitmeden önce küçült"""
+    if image is None and request.image:
+        try:
+            with stage('image_decode'):
+                image = decode_base64_image(request.image)
+        except ImageError as e:
+            print(f"Görsel hatası: {e.detail}")
+            return None
+    if image is None:
+        return None
+    with stage('image_process'):
+        image = await image_processor.process(image)
+    # Küçültülmüş görselin hash'i (aynı fotoğrafın tekrarlarını tanımak için);
+    # geçmişli / öğrenci verili istekler önbellekten hiç yanıtlanmayacağı için hash'lenmez
+    if image_answer_cache.accepts(request, history_len):
+        with stage('image_hash'):
+            image.phash = await image_processor.run(image_answer_cache.fingerprint, image.data)
+    return image
+
+
+def cached_reply(prepared: PreparedChat) -> Optional[str]:
+    """Yanıt ya da görsel soru önbelleğindeki hazır yanıt"""
+    text = None
+    with stage('cache_lookup'):
+        if prepared.cache_key:
+            text = response_cache.get(prepared.cache_key)
+            cache = 'response'
+        elif prepared.image_lookup:
+            text = image_answer_cache.get(*prepared.image_lookup)
+            cache = 'image'
+    if text is not None:
+        CACHE_HITS.inc(cache)
+    return text
+
+
+def remember_reply(prepared: PreparedChat, text: str) -> None:
+    """Önbelleğe uygun isteğin yanıtını sakla"""
+    if prepared.cache_key:
+        response_cache.set(prepared.cache_key, text)
+    elif prepared.image_lookup:
+        image_answer_cache.set(*prepared.image_lookup, text)
+
+
+QUOTA_FALLBACK_TEXT = (
+    "⚠️ **Sistem Notu:** Gemini API kotası doldu. Testlere devam edebilmeniz için bu **OTOMATİK MOCK YANITTIR**.\n\n"
+    "Harika bir soru! Normalde buna VİSİ AI zekasıyla cevap verirdim ama şu an Google amca bana 'biraz dinlen' dedi. "
+    "Lütfen API kotası yenilenene kadar arayüzü ve diğer özellikleri test etmeye devam et. "
+    "Şu an 'Focus' modunda ilerlemeni öneririm!"
+)
+
+
+def quota_fallback_response(prepared: Optional[PreparedChat]) -> ChatResponse:
+    """Kota kuyruğu zaman aşımı / yeniden kuyruktan sonra da süren 429 için mock yanıt
+
+    Alanlar triyaj sonucundan gelir (emotional_load metin etiketidir).
+    """
+    meta = prepared.response_meta() if prepared else {
+        'mod': 'academic', 'emotional_load': 'medium', 'academic_ready': True, 'safety_status': 'safe'
+    }
+    meta['mod_reason'] = "API Kotası Doldu (Fallback Modu)"
+    return ChatResponse(text=QUOTA_FALLBACK_TEXT, fallback=True, **meta)
+
+
+def trace_suffix() -> str:
+    """Log satırlarını iz kaydıyla eşleştirmek için ' [iz-kimliği]'"""
+    timer = current_timer()
+    return f" [{timer.trace_id}]" if timer is not None and timer.trace_id else ""
+
+
+def record_analysis_stages(timings: dict, started: float) -> None:
+    """analyze_message'ın kendi ölçtüğü aşamaları (güvenlik, duygu, triyaj, ...) metriklere aktar"""
+    offset = started
+    for name, ms in timings.items():
+        if name == 'total':
+            continue
+        observe_stage(name, ms / 1000, offset)
+        offset += ms / 1000
+
+
+def record_prepared(prepared: PreparedChat) -> None:
+    """Aktif modu isteğin metriklerine işle (mod bazlı süre histogramı için)"""
+    timer = current_timer()
+    if timer is not None:
+        timer.mod = prepared.active_mod
+
+
+def record_prompt(prepared: PreparedChat) -> None:
+    """Gemini'ye gidecek prompt'un boyutunu kaydet"""
+    chars, tokens = prepared.prompt_size()
+    PROMPT_CHARS.observe(chars, prepared.active_mod)
+    PROMPT_TOKENS.observe(tokens, prepared.active_mod)
+
+
+def record_chat_error(e: Exception) -> None:
+    """Hata türünü say; kota kaynaklı olanlar ayrıca 429 sayacına"""
+    if isinstance(e, QueueTimeoutError):
+        kind = 'queue_timeout'
+        QUOTA_ERRORS.inc('queue')
+    elif is_quota_error(e):
+        kind = 'quota'
+        QUOTA_ERRORS.inc('provider')
+    elif isinstance(e, CircuitOpenError):
+        kind = 'circuit_open'
+    elif isinstance(e, LLMTimeoutError):
+        kind = 'timeout'
+    else:
+        kind = 'provider'
+    CHAT_ERRORS.inc(kind)
+
+
+def provider_error(e: Exception) -> HTTPException:
+    """Gemini hatasını HTTP hatasına çevir (devre açık → 503, zaman aşımı → 504)"""
+    if isinstance(e, CircuitOpenError):
+        return HTTPException(
+            status_code=503,
+            detail="Yapay zeka servisi şu an yanıt vermiyor, lütfen biraz sonra tekrar dene",
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    if isinstance(e, LLMTimeoutError):
+        return HTTPException(status_code=504, detail=str(e))
+    # Hata detayını döndür ki debug edebilelim
+    return HTTPException(status_code=500, detail=str(e))
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Server-Sent Events formatında tek olay"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def run_chat(
+    request: ChatRequest,
+    session: Optional[ConversationSession] = None,
+    image: Optional[ImageInput] = None
+) -> ChatResponse:
+    """Pipeline + Gemini çağrısı; kota aşımında mock yanıt"""
+    
+    if not GEMINI_API_KEY:
+        raise HTTPException(status_code=500, detail="Gemini API Key yapılandırılmamış (Sunucu tarafı)")
+    
+    request = await resolve_student_data(request)
+    
+    prepared = None
+    CHAT_IN_FLIGHT.inc()
+    try:
+        history_len = len(session.messages) if session is not None else len(request.history)
+        image = await load_image(request, image, history_len)
+        prepared = prepare_chat(request, session, image)
+        record_prepared(prepared)
         
-        # 7. Yanıt Üret
-        ai_chat = model.start_chat(history=chat_history)
-        response = ai_chat.send_message(message_parts)
+        # Aynı genel soru / fotoğraf daha önce yanıtlandıysa Gemini'ye gitme
+        cached_text = cached_reply(prepared)
+        if cached_text is not None:
+            return ChatResponse(text=cached_text, **prepared.response_meta())
         
-        return ChatResponse(
-            text=response.text,
-            mod=active_mod,
-            mod_reason=triage.reason,
-            emotional_load=emotional_state['emotional_load'],
-            academic_ready=triage.academic_ready,
-            safety_status=safety.get('risk_level', 'safe')
-        )
+        # 7. Yanıt Üret (event loop'u bloklamadan); aynı anda gelen kopyalar tek çağrıyı paylaşır
+        record_prompt(prepared)
+        with stage('llm'):
+            response_text = await llm_single_flight.do(
+                prepared.flight_key(),
+                lambda: generate_reply(
+                    prepared.history, prepared.message_parts, prepared.system_instruction, prepared.lane
+                )
+            )
+        remember_reply(prepared, response_text)
+        
+        return ChatResponse(text=response_text, **prepared.response_meta())
         
     except Exception as e:
         error_msg = str(e)
-        print(f"Chat hatası: {error_msg}")
+        print(f"Chat hatası{trace_suffix()}: {error_msg}")
+        record_chat_error(e)
         
-        # Kota aşımı kontrolü (429 Resource Exhausted)
-        if "429" in error_msg or "Resource has been exhausted" in error_msg or "Quota" in error_msg:
-             print("⚠️ KOTA AŞIMI AKTİF - MOCK YANIT DÖNÜLÜYOR")
-             return ChatResponse(
-                text="⚠️ **Sistem Notu:** Gemini API kotası doldu. Testlere devam edebilmeniz için bu **OTOMATİK MOCK YANITTIR**.\n\n"
-                     "Harika bir soru! Normalde buna VİSİ AI zekasıyla cevap verirdim ama şu an Google amca bana 'biraz dinlen' dedi. "
-                     "Lütfen API kotası yenilenene kadar arayüzü ve diğer özellikleri test etmeye devam et. "
-                     "Şu an 'Focus' modunda ilerlemeni öneririm!",
-                mod=active_mod if 'active_mod' in locals() else 'academic',
-                mod_reason="API Kotası Doldu (Fallback Modu)",
-                emotional_load=5,
-                academic_ready=True,
-                safety_status='safe'
-            )
+        if isinstance(e, QueueTimeoutError) or is_quota_error(e):
+            print("⚠️ KOTA AŞIMI AKTİF - MOCK YANIT DÖNÜLÜYOR")
+            return quota_fallback_response(prepared)
+
+        raise provider_error(e)
+    finally:
+        CHAT_IN_FLIGHT.dec()
 
-        # Hata detayını döndür ki debug edebilelim
+
+@app.post("/api/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+    """Ana chat endpoint - AI ile sohbet"""
+    return await run_chat(request)
+
+
+@app.post("/api/chat/upload", response_model=ChatResponse)
+async def chat_upload(
+    message: str = Form(...),
+    image: UploadFile = File(...),
+    payload: Optional[str] = Form(None)
+):
+    """Görselli chat - fotoğraf base64 yerine multipart dosya olarak gelir
+    
+    payload: ChatRequest'in diğer alanları (history, student_context, ...) JSON olarak.
+    """
+    try:
+        extra = json.loads(payload) if payload else {}
+        if not isinstance(extra, dict):
+            raise ValueError("payload bir JSON nesnesi olmalı")
+        extra.pop('image', None)
+        request = ChatRequest.model_validate({**extra, 'message': message})
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(status_code=422, detail=f"Geçersiz payload: {e}")
+    
+    try:
+        image_input = await read_upload(image)
+    except ImageError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    finally:
+        await image.close()
+    
+    return await run_chat(request, image=image_input)
+
+
+async def _stream_events(prepared: PreparedChat):
+    """Stream chat'in SSE olayları"""
+    # Triyaj sonucu Gemini beklenmeden hemen gönderilir
+    yield format_sse("meta", prepared.response_meta())
+    
+    cached_text = cached_reply(prepared)
+    if cached_text is not None:
+        yield format_sse("chunk", {"text": cached_text})
+        yield format_sse("done", {"cached": True})
+        return
+    
+    record_prompt(prepared)
+    chunks = []
+    llm_started = time.perf_counter()
+    try:
+        async for chunk in stream_reply(
+            prepared.history, prepared.message_parts, prepared.system_instruction, prepared.lane
+        ):
+            if not chunks:
+                observe_stage('llm_first_chunk', time.perf_counter() - llm_started, llm_started)
+            chunks.append(chunk)
+            yield format_sse("chunk", {"text": chunk})
+        observe_stage('llm', time.perf_counter() - llm_started, llm_started)
+        remember_reply(prepared, "".join(chunks))
+    except Exception as e:
+        error_msg = str(e)
+        print(f"Chat stream hatası{trace_suffix()}: {error_msg}")
+        record_chat_error(e)
+        if isinstance(e, QueueTimeoutError) or is_quota_error(e):
+            print("⚠️ KOTA AŞIMI AKTİF - MOCK YANIT DÖNÜLÜYOR")
+            yield format_sse("chunk", {"text": QUOTA_FALLBACK_TEXT})
+        else:
+            error = provider_error(e)
+            yield format_sse("error", {"status": error.status_code, "detail": error.detail})
+            return
+    
+    yield format_sse("done", {})
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream chat endpoint - önce triyaj sonucu, sonra yanıt parçaları (SSE)"""
+    
+    if not GEMINI_API_KEY:
+        raise HTTPException(status_code=500, detail="Gemini API Key yapılandırılmamış (Sunucu tarafı)")
+    
+    request = await resolve_student_data(request)
+    
+    try:
+        image = await load_image(request, history_len=len(request.history))
+        prepared = prepare_chat(request, image=image)
+        record_prepared(prepared)
+    except Exception as e:
+        print(f"Chat hazırlık hatası: {e}")
+        CHAT_ERRORS.inc('internal')
         raise HTTPException(status_code=500, detail=str(e))
+    
+    async def event_stream():
+        CHAT_IN_FLIGHT.inc()
+        try:
+            async for event in _stream_events(prepared):
+                yield event
+        finally:
+            CHAT_IN_FLIGHT.dec()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ============================================================================
+# SOHBET OTURUMLARI
+# ============================================================================
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts).isoformat()
+
+
+async def _get_session_or_404(session_id: str) -> ConversationSession:
+    session = await session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Oturum bulunamadı veya süresi doldu")
+    return session
+
+
+@app.post("/api/sessions", response_model=SessionCreateResponse)
+async def create_session(request: SessionCreateRequest):
+    """Yeni sohbet oturumu aç (öğrenci bağlamı bir kez gönderilir)"""
+    session = await session_store.create(request.student_context, request.student_data, request.student_id)
+    return SessionCreateResponse(session_id=session.session_id, created_at=_iso(session.created_at))
+
+
+@app.get("/api/sessions/{session_id}", response_model=SessionInfoResponse)
+async def get_session(session_id: str):
+    """Oturum geçmişini getir"""
+    session = await _get_session_or_404(session_id)
+    return SessionInfoResponse(
+        session_id=session.session_id,
+        messages=session.messages,
+        created_at=_iso(session.created_at),
+        updated_at=_iso(session.updated_at)
+    )
+
+
+@app.delete("/api/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """Oturumu kapat"""
+    if not await session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Oturum bulunamadı")
+    history_manager.forget(session_id)
+    return {"deleted": True}
+
+
+@app.post("/api/sessions/{session_id}/messages", response_model=SessionMessageResponse)
+async def post_session_message(session_id: str, request: SessionMessageRequest):
+    """Oturuma yeni mesaj gönder - sadece yeni mesaj taşınır, geçmiş sunucuda
+    
+    Aynı oturuma eşzamanlı gelen mesajlar sırayla işlenir; aksi halde iki tur
+    aynı geçmişi okuyup birbirinin kaydını ezer.
+    """
+    async with session_store.lock(session_id):
+        session = await _get_session_or_404(session_id)
+        
+        chat_request = ChatRequest(
+            message=request.message,
+            image=request.image,
+            forced_mod=request.forced_mod,
+            student_context=session.student_context,
+            student_data=session.student_data,
+            student_id=session.student_id
+        )
+        response = await run_chat(chat_request, session)
+        
+        # Mock yanıt gerçek bir model turu değil; geçmişe girerse sonraki turları bozar
+        if not response.fallback:
+            session.append("user", request.message)
+            session.append("model", response.text)
+            await session_store.save(session)
+    
+    return SessionMessageResponse(
+        **response.model_dump(),
+        session_id=session.session_id,
+        turn_count=len(session.messages) // 2
+    )
+
+
+# ============================================================================
+# ÖĞRENCİ PROFİLLERİ
+# ============================================================================
+
+def _profile_summary(profile: StudentProfile) -> ProfileSummaryResponse:
+    return ProfileSummaryResponse(
+        student_id=profile.student_id,
+        exam_count=len(profile.recent_exams),
+        topic_count=len(profile.topic_performance),
+        latest_exam_date=profile.recent_exams[0].date if profile.recent_exams else None
+    )
+
+
+async def _get_profile_or_404(student_id: str) -> StudentProfile:
+    profile = await get_profile_store().get(student_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Öğrenci profili bulunamadı")
+    return profile
+
+
+@app.put("/api/students/{student_id}", response_model=ProfileSummaryResponse)
+async def put_student_profile(student_id: str, profile: StudentProfile):
+    """Profili tamamen kaydet (ilk kayıt / içe aktarma)"""
+    if profile.student_id != student_id:
+        raise HTTPException(status_code=400, detail="student_id yol ile aynı olmalı")
+    return _profile_summary(await get_profile_store().put(profile))
+
+
+@app.get("/api/students/{student_id}", response_model=StudentProfile)
+async def get_student_profile(student_id: str):
+    """Kayıtlı profili getir"""
+    return await _get_profile_or_404(student_id)
+
+
+@app.patch("/api/students/{student_id}", response_model=ProfileSummaryResponse)
+async def patch_student_profile(student_id: str, update: StudentProfileUpdate):
+    """Sadece gönderilen alanları güncelle (enerji, hedefler, çalışma istatistikleri...)"""
+    profile = await get_profile_store().update_fields(student_id, update.model_dump(exclude_unset=True))
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Öğrenci profili bulunamadı")
+    return _profile_summary(profile)
+
+
+@app.post("/api/students/{student_id}/exams", response_model=ProfileSummaryResponse)
+async def add_student_exam(student_id: str, exam: ExamResult):
+    """Tek deneme sonucu ekle"""
+    profile = await get_profile_store().add_exam(student_id, exam)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Öğrenci profili bulunamadı")
+    return _profile_summary(profile)
+
+
+@app.put("/api/students/{student_id}/topics", response_model=ProfileSummaryResponse)
+async def upsert_student_topic(student_id: str, topic: TopicPerformance):
+    """Tek konunun performansını ekle/güncelle"""
+    profile = await get_profile_store().upsert_topic(student_id, topic)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Öğrenci profili bulunamadı")
+    return _profile_summary(profile)
+
+
+@app.get("/api/students/{student_id}/weekly-program")
+async def get_student_weekly_program(student_id: str):
+    """Toplu işin (weekly_programs.py --to-store) ürettiği haftalık program"""
+    program = await get_profile_store().get_weekly_program(student_id)
+    if program is None:
+        raise HTTPException(status_code=404, detail="Bu öğrenci için haftalık program üretilmemiş")
+    return program
+
+
+@app.delete("/api/students/{student_id}")
+async def delete_student_profile(student_id: str):
+    """Profili ve tüm sınav/konu kayıtlarını sil"""
+    if not await get_profile_store().delete(student_id):
+        raise HTTPException(status_code=404, detail="Öğrenci profili bulunamadı")
+    return {"deleted": True}
+
+
+# ============================================================================
+# KOHORT ANALİTİĞİ
+# ============================================================================
+
+@app.post("/api/analytics/cohort", response_model=CohortAnalyticsResponse)
+async def cohort_analytics(request: CohortAnalyticsRequest):
+    """Sınıf/okul genelinde ders ortalamaları, öncelik ve trend dağılımları"""
+    if not numpy_available():
+        raise HTTPException(status_code=503, detail="Kohort analitiği için NumPy gerekli")
+    
+    if request.profiles and len(request.profiles) > COHORT_MAX_INLINE_PROFILES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"En fazla {COHORT_MAX_INLINE_PROFILES} profil doğrudan gönderilebilir; diğerleri için student_ids kullanın"
+        )
+    
+    profiles = list(request.profiles or [])
+    missing = []
+    if request.student_ids:
+        found = await get_profile_store().get_many(request.student_ids)
+        for student_id in request.student_ids:
+            if student_id in found:
+                profiles.append(found[student_id])
+            else:
+                missing.append(student_id)
+    
+    if len(profiles) > COHORT_MAX_STUDENTS:
+        raise HTTPException(status_code=413, detail=f"En fazla {COHORT_MAX_STUDENTS} öğrenci analiz edilebilir")
+    
+    # Vektörel hesap CPU'da çalışır; event loop'u bloklamasın
+    try:
+        result = await asyncio.to_thread(analyze_cohort, profiles)
+    except CohortTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return CohortAnalyticsResponse(**result, missing_student_ids=missing)
+
+
+# ============================================================================
+# TOPLU TRİYAJ
+# ============================================================================
+
+def run_batch_triage(body: bytes) -> str:
+    """Gövdeyi doğrula, sınıflandır ve yanıtı JSON'a çevir (iş parçacığında çalışır)"""
+    try:
+        request = BatchTriageRequest.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=f"Geçersiz payload: {e}")
+    if len(request.messages) > BATCH_MAX_MESSAGES:
+        raise HTTPException(status_code=413, detail=f"En fazla {BATCH_MAX_MESSAGES} mesaj gönderilebilir")
+    if request.contexts is not None and len(request.contexts) != len(request.messages):
+        raise HTTPException(status_code=400, detail="contexts uzunluğu messages ile aynı olmalı")
+    result = triage_batch(request.messages, request.contexts)
+    return BatchTriageResponse(**result).model_dump_json()
+
+
+@app.post(
+    "/api/triage/batch",
+    response_model=BatchTriageResponse,
+    openapi_extra={"requestBody": {"content": {"application/json": {
+        "schema": BatchTriageRequest.model_json_schema()
+    }}, "required": True}}
+)
+async def triage_batch_endpoint(http_request: Request):
+    """Çok sayıda mesajı Gemini çağırmadan sınıflandır (mod, duygusal yük, güvenlik)"""
+    body = bytearray()
+    async for chunk in http_request.stream():
+        body += chunk
+        if len(body) > BATCH_MAX_BODY_BYTES:
+            raise HTTPException(
+                status_code=413, detail=f"Gövde en fazla {BATCH_MAX_BODY_BYTES // (1024 * 1024)} MB olabilir"
+            )
+    
+    # Büyük gövdenin doğrulanması ve serileştirilmesi de CPU işi; event loop
+    # diğer sohbetlere hizmet etmeye devam etsin
+    content = await asyncio.to_thread(run_batch_triage, bytes(body))
+    return Response(content, media_type="application/json")
+
+
+# ============================================================================
+# METRİKLER (PROMETHEUS)
+# ============================================================================
+
+_CIRCUIT_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+# Diğer bileşenlerin sayaçları okuma anında stats()'tan alınır
+registry.callback(
+    "llm_in_flight", "Gemini'de süren çağrılar",
+    lambda: [((), get_llm_stats()['in_flight'])])
+registry.callback(
+    "llm_queue_depth", "Kota kuyruğunda bekleyen istekler (öncelik şeridi)",
+    lambda: [((lane,), n) for lane, n in get_llm_stats()['scheduler']['queue_depth'].items()], ("lane",))
+registry.callback(
+    "llm_requests_last_minute", "Son 60 sn'de Gemini'ye giden istekler (RPM)",
+    lambda: [((), get_llm_stats()['scheduler']['requests_last_minute'])])
+registry.callback(
+    "llm_tokens_last_minute", "Son 60 sn'de harcanan tahmini token (TPM)",
+    lambda: [((), get_llm_stats()['scheduler']['tokens_last_minute'])])
+registry.callback(
+    "llm_circuit_state", "Devre kesici durumu (0 kapalı, 1 yarı açık, 2 açık)",
+    lambda: [((), _CIRCUIT_STATES[get_llm_stats()['resilience']['circuit']['state']])])
+registry.callback(
+    "llm_retries_total", "Geçici hatalar nedeniyle yapılan yeniden denemeler",
+    lambda: [((), get_llm_stats()['resilience']['retries'])], kind="counter")
+registry.callback(
+    "llm_timeouts_total", "Süre sınırını aşan Gemini çağrıları",
+    lambda: [((), get_llm_stats()['resilience']['timeouts'])], kind="counter")
+registry.callback(
+    "llm_short_circuited_total", "Devre açıkken denenmeden reddedilen çağrılar",
+    lambda: [((), get_llm_stats()['resilience']['circuit']['short_circuited'])], kind="counter")
+registry.callback(
+    "llm_coalesced_total", "Süren aynı çağrıya katılan (Gemini'ye gitmeyen) istekler",
+    lambda: [((), llm_single_flight.coalesced)], kind="counter")
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metin formatında metrikler"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrikler kapalı")
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/api/stats")
+async def get_stats():
+    """Çalışma zamanı sayaçları"""
+    return {
+        "llm": get_llm_stats(),
+        "single_flight": llm_single_flight.stats(),
+        "prompt_cache": get_prompt_cache_stats(),
+        "student_prompt_cache": get_student_prompt_cache_stats(),
+        "sessions": session_store.stats(),
+        "history": history_manager.stats(),
+        "analysis": get_analysis_stats(),
+        "response_cache": response_cache.stats(),
+        "images": image_processor.stats(),
+        "image_cache": image_answer_cache.stats(),
+        "profiles": get_profile_store().stats(),
+        "tracing": trace_log.stats(),
+        "profiler": get_profiler_stats()
+    }
+
+
+# ============================================================================
+# YÖNETİCİ
+# ============================================================================
+
+def require_admin(token: Optional[str]) -> None:
+    """X-Admin-Token başlığını ADMIN_TOKEN ile karşılaştır"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Yönetici uçları kapalı (ADMIN_TOKEN yapılandırılmamış)")
+    if not token or not secrets.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Geçersiz yönetici anahtarı")
+
+
+@app.post("/api/admin/context-cache/invalidate")
+async def invalidate_context_cache(x_admin_token: Optional[str] = Header(None)):
+    """Sağlayıcı tarafı prefix önbelleğini boşalt (prompt değişikliği sonrası)"""
+    require_admin(x_admin_token)
+    return {"invalidated": context_cache.invalidate_all()}
+
+
+@app.post("/api/admin/profile", response_class=PlainTextResponse)
+async def profile_process(
+    seconds: float = Query(10, gt=0, le=PROFILER_MAX_SECONDS),
+    interval_ms: int = Query(PROFILER_INTERVAL_MS, ge=1, le=1000),
+    idle: bool = False,
+    x_admin_token: Optional[str] = Header(None)
+):
+    """Canlı süreci N saniye örnekle; flamegraph'a uygun katlanmış yığınlar döndür
+    
+    Çıktı: `iş parçacığı;çerçeve;...;çerçeve adet` satırları (flamegraph.pl, speedscope).
+    idle=true boşta bekleyen iş parçacıklarını da dahil eder.
+    """
+    require_admin(x_admin_token)
+    try:
+        profiler = await profile_for(seconds, interval_ms / 1000, include_idle=idle)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(
+        profiler.collapsed(),
+        headers={
+            "X-Profile-Samples": str(profiler.samples),
+            "X-Profile-Seconds": f"{profiler.elapsed:.2f}",
+        }
+    )
 
 
 @app.get("/api/mods")
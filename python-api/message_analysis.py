@@ -0,0 +1,126 @@
+"""
+VİSİ AI - Mesaj Analizi
+Mesajı bir kez normalize edip tarayan, sonraki tüm adımların okuduğu ortak analiz
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from keywords import KeywordHits, scan_keywords, turkish_lower
+from models import StudentContext, TriageResult
+from prompts import check_safety, perform_triage
+from psychological import analyze_emotional_state
+
+# Sınav stratejisi prompt'u için aranan sınavlar (öncelik sırasıyla)
+EXAM_TYPES = ['TYT', 'AYT', 'LGS', 'KPSS']
+
+
+@dataclass
+class MessageAnalysis:
+    """Tek bir öğrenci mesajının tüm analiz sonuçları"""
+    message: str
+    normalized: str
+    hits: KeywordHits
+    safety: dict
+    emotional_state: dict
+    triage: TriageResult
+    detected_exams: List[str] = field(default_factory=list)
+    # Aşama → milisaniye
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def primary_exam(self) -> Optional[str]:
+        return self.detected_exams[0] if self.detected_exams else None
+
+
+# Aşama bazında toplam süre / çağrı sayısı
+_timing_totals: Dict[str, float] = {}
+_analysis_count = 0
+
+
+def analyze_message(
+    message: str,
+    context: Optional[StudentContext] = None,
+    history: Optional[List[dict]] = None
+) -> MessageAnalysis:
+    """Normalize → tek tarama → güvenlik → duygu → triyaj → sınav tespiti"""
+    global _analysis_count
+    timings: Dict[str, float] = {}
+
+    def mark(stage: str, started: float) -> float:
+        now = time.perf_counter()
+        timings[stage] = (now - started) * 1000
+        return now
+
+    t = time.perf_counter()
+    normalized = turkish_lower(message)
+    t = mark('normalize', t)
+
+    hits = scan_keywords(normalized)
+    t = mark('keyword_scan', t)
+
+    safety = check_safety(message, hits)
+    t = mark('safety', t)
+
+    emotional_state = analyze_emotional_state(message, context, hits)
+    t = mark('emotion', t)
+
+    triage = perform_triage(message, context, history, safety=safety, message_hits=hits)
+    t = mark('triage', t)
+
+    detected_exams = [exam for exam in EXAM_TYPES if exam.lower() in normalized]
+    mark('exam_detection', t)
+
+    timings['total'] = sum(timings.values())
+    _analysis_count += 1
+    for stage, ms in timings.items():
+        _timing_totals[stage] = _timing_totals.get(stage, 0.0) + ms
+
+    return MessageAnalysis(
+        message=message,
+        normalized=normalized,
+        hits=hits,
+        safety=safety,
+        emotional_state=emotional_state,
+        triage=triage,
+        detected_exams=detected_exams,
+        timings=timings
+    )
+
+
+def select_active_mod(analysis: MessageAnalysis, forced_mod: Optional[str] = None) -> str:
+    """Triyaj sonucunu zorlanmış mod ve duygusal duruma göre kesinleştir
+    
+    analysis.triage.reason gerekirse güncellenir.
+    """
+    triage = analysis.triage
+    emotional_state = analysis.emotional_state
+    
+    # Eğer zorlanmış mod varsa, triyajı ez
+    if forced_mod:
+        triage.reason = f"Kullanıcı tarafından zorlandı: {forced_mod}"
+        return forced_mod
+    
+    # Duygusal duruma göre mod override edilebilir
+    active_mod = triage.selected_mod
+    if emotional_state['needs_support'] and active_mod == 'academic':
+        # Eğer öğrenci çok stresliyse akademik yerine odak moduna geç
+        if emotional_state['dominant_emotion'] in ['stress', 'exhaustion']:
+            active_mod = 'focus-anxiety'
+            triage.reason = "Yüksek duygusal yük tespit edildi."
+        elif emotional_state['dominant_emotion'] in ['sadness', 'anger']:
+            active_mod = 'safe-support'
+            triage.reason = "Duygusal destek ihtiyacı tespit edildi."
+    return active_mod
+
+
+def get_analysis_stats() -> Dict:
+    """Aşama bazında ortalama analiz süreleri (ms)"""
+    return {
+        'count': _analysis_count,
+        'avg_ms': {
+            stage: round(total / _analysis_count, 4)
+            for stage, total in _timing_totals.items()
+        } if _analysis_count else {},
+    }
@@ -0,0 +1,301 @@
+"""
+VİSİ AI - Metrikler
+Prometheus metin formatında sayaçlar, göstergeler ve gecikme histogramları (/metrics)
+"""
+
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+PREFIX = "visi"
+
+# Aşama süreleri mikro saniyeden (anahtar kelime taraması) saniyelere (Gemini) uzanır
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+REQUEST_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+PROMPT_CHAR_BUCKETS = (500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000)
+PROMPT_TOKEN_BUCKETS = (128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# ============================================================================
+# METRİK TİPLERİ
+# ============================================================================
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = f"{PREFIX}_{name}"
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = STAGE_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # etiketler → (kova sayıları, toplam, adet)
+        self._series: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        counts = series[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """Değeri okuma anında başka bileşenin stats()'ından alınan gösterge / sayaç"""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        fn: Callable[[], Iterable[Tuple[LabelValues, float]]],
+        labelnames: Sequence[str] = (),
+        kind: str = "gauge"
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.kind = kind
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        try:
+            samples = list(self.fn())
+        except Exception as e:
+            print(f"Metrik okunamadı ({self.name}): {e}")
+            return []
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in samples]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def callback(self, name: str, help_text: str, fn, labelnames: Sequence[str] = (), kind: str = "gauge") -> None:
+        self.register(CallbackMetric(name, help_text, fn, labelnames, kind))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            samples = metric.render()
+            if samples:
+                lines.extend(metric.header())
+                lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# ============================================================================
+# UYGULAMA METRİKLERİ
+# ============================================================================
+
+HTTP_REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTP istekleri (handler, durum kodu)", ("handler", "status")))
+HTTP_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP istek süresi (stream'lerde son parçaya kadar)", ("handler",), REQUEST_BUCKETS))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "İşlenmekte olan HTTP istekleri"))
+
+CHAT_DURATION = registry.register(Histogram(
+    "chat_duration_seconds", "Chat isteği süresi (handler, aktif mod)", ("handler", "mod"), REQUEST_BUCKETS))
+CHAT_IN_FLIGHT = registry.register(Gauge(
+    "chat_in_flight", "Pipeline'da olan chat istekleri"))
+CHAT_ERRORS = registry.register(Counter(
+    "chat_errors_total", "Chat hataları (tür)", ("kind",)))
+QUOTA_ERRORS = registry.register(Counter(
+    "llm_quota_exceeded_total", "Kota aşımı (429) nedeniyle mock yanıt dönen istekler", ("source",)))
+CACHE_HITS = registry.register(Counter(
+    "chat_cache_hits_total", "Gemini'ye gitmeden önbellekten yanıtlanan istekler", ("cache",)))
+
+STAGE_DURATION = registry.register(Histogram(
+    "stage_duration_seconds", "Pipeline aşama süreleri", ("stage",), STAGE_BUCKETS))
+PROMPT_CHARS = registry.register(Histogram(
+    "prompt_chars", "Gemini'ye giden prompt boyutu (karakter)", ("mod",), PROMPT_CHAR_BUCKETS))
+PROMPT_TOKENS = registry.register(Histogram(
+    "prompt_tokens", "Gemini'ye giden prompt boyutu (tahmini token)", ("mod",), PROMPT_TOKEN_BUCKETS))
+
+# ============================================================================
+# İSTEK BAĞLAMI VE AŞAMA ZAMANLAMASI
+# ============================================================================
+
+
+class RequestTimer:
+    """Tek HTTP isteğinin aşama süreleri ve chat meta verisi"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.mod: Optional[str] = None
+        # İz kimliği (tracing açıksa TraceMiddleware atar)
+        self.trace_id: Optional[str] = None
+        # (aşama, başlangıç ofseti sn, süre sn)
+        self.spans: List[Tuple[str, float, float]] = []
+
+    def add_span(self, name: str, start: float, duration: float) -> None:
+        self.spans.append((name, start - self.started, duration))
+
+
+_current_timer: ContextVar[Optional[RequestTimer]] = ContextVar("visi_request_timer", default=None)
+
+
+def current_timer() -> Optional[RequestTimer]:
+    return _current_timer.get()
+
+
+def bind_timer() -> Tuple[RequestTimer, Optional[Token]]:
+    """İsteğin zamanlayıcısını döndür; dış katman açmadıysa yenisini bağla
+
+    Metrik ve iz ara katmanları aynı zamanlayıcıyı paylaşır (sıraları önemsiz).
+    Dönen token None değilse iş bitince unbind_timer ile bırakılmalıdır.
+    """
+    timer = _current_timer.get()
+    if timer is not None:
+        return timer, None
+    timer = RequestTimer()
+    return timer, _current_timer.set(timer)
+
+
+def unbind_timer(token: Optional[Token]) -> None:
+    if token is not None:
+        _current_timer.reset(token)
+
+
+def observe_stage(name: str, seconds: float, start: Optional[float] = None) -> None:
+    """Başka yerde ölçülmüş aşama süresini kaydet"""
+    STAGE_DURATION.observe(seconds, name)
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add_span(name, start if start is not None else time.perf_counter() - seconds, seconds)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Bloğun süresini aşama histogramına (ve istek zamanlayıcısına) yaz"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started, started)
+
+
+class MetricsMiddleware:
+    """Saf ASGI ara katmanı: stream yanıtlarda da süre son parçaya kadar ölçülür"""
+
+    def __init__(self, app, skip_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        timer, token = bind_timer()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            unbind_timer(token)
+            # Router eşleşen endpoint'i scope'a yazar; yol parametreleri etiketi şişirmez
+            handler = getattr(scope.get("endpoint"), "__name__", "unmatched")
+            duration = time.perf_counter() - timer.started
+            HTTP_REQUESTS.inc(handler, str(status))
+            HTTP_DURATION.observe(duration, handler)
+            if timer.mod is not None:
+                CHAT_DURATION.observe(duration, handler, timer.mod)
@@ -3,8 +3,8 @@ VİSİ AI - Veri Modelleri
 Tüm Pydantic modelleri
 """
 
-from pydantic import BaseModel
-from typing import Optional, List, Literal
+from pydantic import BaseModel, PrivateAttr, field_validator
+from typing import Any, Optional, List, Literal
 from datetime import datetime
 
 
@@ -147,6 +147,8 @@ class StudentProfile(BaseModel):
     current_focus: Optional[FocusLevel] = None
     current_anxiety: Optional[AnxietyLevel] = None
     last_updated: Optional[str] = None
+    # Artımlı performans toplamları (student_data.PerformanceAggregates)
+    _aggregates: Optional[Any] = PrivateAttr(default=None)
 
 
 # ============================================================================
@@ -164,7 +166,9 @@ class ChatRequest(BaseModel):
     image: Optional[str] = None  # Base64 encoded image
     student_context: Optional[StudentContext] = None
     student_data: Optional[StudentProfile] = None
+    student_id: Optional[str] = None  # student_data yerine sunucudaki profil
     forced_mod: Optional[ModType] = None
+    use_cache: bool = True  # False → yanıt önbelleği atlanır
 
 
 class ChatResponse(BaseModel):
@@ -174,6 +178,8 @@ class ChatResponse(BaseModel):
     emotional_load: str
     academic_ready: bool
     safety_status: str = 'safe'
+    # Kota aşımında dönen mock yanıt; oturum geçmişine yazılmaz
+    fallback: bool = False
 
 
 class TriageResult(BaseModel):
@@ -184,6 +190,116 @@ class TriageResult(BaseModel):
     action_capacity: bool
 
 
+class SessionCreateRequest(BaseModel):
+    student_context: Optional[StudentContext] = None
+    student_data: Optional[StudentProfile] = None
+    student_id: Optional[str] = None
+
+
+class SessionCreateResponse(BaseModel):
+    session_id: str
+    created_at: str
+
+
+class SessionMessageRequest(BaseModel):
+    message: str
+    image: Optional[str] = None  # Base64 encoded image
+    forced_mod: Optional[ModType] = None
+
+
+class SessionMessageResponse(ChatResponse):
+    session_id: str
+    turn_count: int
+
+
+class SessionInfoResponse(BaseModel):
+    session_id: str
+    messages: List[ChatMessage] = []
+    created_at: str
+    updated_at: str
+
+
+class BatchTriageRequest(BaseModel):
+    messages: List[str]
+    contexts: Optional[List[Optional[StudentContext]]] = None  # messages ile aynı uzunlukta
+
+
+class BatchTriageItem(BaseModel):
+    mod: ModType
+    mod_reason: str
+    emotional_load: str
+    dominant_emotion: str
+    academic_ready: bool
+    safety_status: str = 'safe'
+
+
+class BatchTriageResponse(BaseModel):
+    results: List[BatchTriageItem]
+    count: int
+    chunks: int
+    workers: int
+    elapsed_ms: float
+    messages_per_second: Optional[float] = None
+
+
+class StudentProfileUpdate(BaseModel):
+    """Sınav/konu dışındaki alanlar; sadece gönderilenler güncellenir"""
+    name: Optional[str] = None
+    level: Optional[str] = None
+    grade: Optional[int] = None
+    target_exam: Optional[str] = None
+    study_stats: Optional[StudyStats] = None
+    goals: Optional[StudentGoals] = None
+    strength_weakness_analysis: Optional[StrengthWeaknessAnalysis] = None
+    current_energy: Optional[EnergyLevel] = None
+    current_focus: Optional[FocusLevel] = None
+    current_anxiety: Optional[AnxietyLevel] = None
+    last_updated: Optional[str] = None
+
+    @field_validator('name', 'level')
+    @classmethod
+    def _required_not_null(cls, value: Optional[str]) -> str:
+        # Gönderilmeyen alan dokunulmadan kalır; açıkça null gönderilemez (profilde zorunlu)
+        if value is None:
+            raise ValueError("Bu alan boş (null) olamaz")
+        return value
+
+
+class ProfileSummaryResponse(BaseModel):
+    student_id: str
+    exam_count: int
+    topic_count: int
+    latest_exam_date: Optional[str] = None
+
+
+class CohortAnalyticsRequest(BaseModel):
+    student_ids: Optional[List[str]] = None  # Profil deposundaki öğrenciler
+    profiles: Optional[List[StudentProfile]] = None  # ya da doğrudan profiller
+
+
+class CohortSubjectStats(BaseModel):
+    subject: str
+    student_count: int
+    average_net: float
+    average_success_rate: float
+    weak_students: int
+    strong_students: int
+    priority_distribution: dict
+    trend_distribution: dict
+
+
+class CohortAnalyticsResponse(BaseModel):
+    student_count: int
+    students_with_exams: int
+    exam_count: int
+    average_net: Optional[float] = None
+    net_trend_distribution: dict
+    priority_distribution: dict
+    subjects: List[CohortSubjectStats] = []
+    missing_student_ids: List[str] = []
+    elapsed_ms: float
+
+
 class HealthResponse(BaseModel):
     status: str
     version: str
@@ -0,0 +1,220 @@
+"""
+VİSİ AI - Örneklemeli Profil Çıkarıcı
+Çalışan süreçteki iş parçacıklarının yığınlarını düzenli aralıkla örnekler; flamegraph'a uygun katlanmış (collapsed) çıktı üretir
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, Optional, Set
+
+from config import (
+    PROFILER_INTERVAL_MS, PROFILER_MAX_SECONDS, PROFILE_EVERY_N_CHAT, PROFILE_DUMP_DIR
+)
+from metrics import current_timer
+
+# Bekleme noktaları (yaprak çerçeve): boşta iş parçacıkları profili boğmasın
+_IDLE_LEAVES = {
+    ('selectors.py', 'select'),
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+    ('handlers.py', 'dequeue'),
+}
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Arka plan iş parçacığıyla sys._current_frames() örnekleyicisi
+
+    Yalnızca örnekleme anında GIL'i kısa süre tutar; sys.setprofile gibi
+    her çağrıya kanca takmaz, canlı süreçte açık bırakılabilir.
+    """
+
+    def __init__(
+        self,
+        interval: float = PROFILER_INTERVAL_MS / 1000,
+        include_idle: bool = False,
+        thread_ids: Optional[Set[int]] = None
+    ):
+        self.interval = max(0.001, interval)
+        self.include_idle = include_idle
+        # None → tüm iş parçacıkları
+        self.thread_ids = thread_ids
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = 0.0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="visi-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.elapsed = time.perf_counter() - self.started_at
+        return self.stacks
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                code = frame.f_code
+                if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(thread_id, str(thread_id)))
+                labels.reverse()
+                self.stacks[";".join(labels)] += 1
+
+    def collapsed(self) -> str:
+        """flamegraph.pl / speedscope'un okuduğu 'çerçeve;çerçeve;... adet' satırları"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfilerBusyError(Exception):
+    """Aynı anda yalnızca bir profil çalışabilir"""
+
+
+_active: Optional[SamplingProfiler] = None
+
+_stats = {
+    'manual_runs': 0,
+    'requests_seen': 0,
+    'requests_profiled': 0,
+    'requests_skipped_busy': 0,
+    'dumps_written': 0,
+}
+
+
+def _claim(profiler: SamplingProfiler) -> None:
+    global _active
+    if _active is not None:
+        raise ProfilerBusyError("Başka bir profil çıkarma işlemi sürüyor")
+    _active = profiler
+    profiler.start()
+
+
+def _release(profiler: SamplingProfiler) -> Counter:
+    global _active
+    try:
+        return profiler.stop()
+    finally:
+        if _active is profiler:
+            _active = None
+
+
+async def profile_for(seconds: float, interval: float, include_idle: bool = False) -> SamplingProfiler:
+    """seconds boyunca tüm süreci örnekle (event loop bu sürede normal çalışır)"""
+    profiler = SamplingProfiler(interval, include_idle)
+    _claim(profiler)
+    _stats['manual_runs'] += 1
+    try:
+        await asyncio.sleep(min(seconds, PROFILER_MAX_SECONDS))
+    finally:
+        _release(profiler)
+    return profiler
+
+
+# ============================================================================
+# HER N'İNCİ CHAT İSTEĞİNİ PROFİLLE
+# ============================================================================
+
+class RequestProfilerMiddleware:
+    """Her N'inci isteği event loop iş parçacığında örnekleyip diske yaz
+
+    Örnekleme iş parçacığı bazındadır: aynı anda loop'ta çalışan diğer
+    isteklerin çerçeveleri de profile girer.
+    """
+
+    def __init__(
+        self,
+        app,
+        every: int = PROFILE_EVERY_N_CHAT,
+        dump_dir: str = PROFILE_DUMP_DIR,
+        paths: Iterable[str] = ("/api/chat",)
+    ):
+        self.app = app
+        self.every = every
+        self.dump_dir = dump_dir
+        self.paths = tuple(paths)
+        self._count = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.every or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        self._count += 1
+        _stats['requests_seen'] += 1
+        if self._count % self.every:
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler(thread_ids={threading.get_ident()})
+        try:
+            _claim(profiler)
+        except ProfilerBusyError:
+            # Elle başlatılmış profil sürüyor; bu isteği atla
+            _stats['requests_skipped_busy'] += 1
+            await self.app(scope, receive, send)
+            return
+        _stats['requests_profiled'] += 1
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _release(profiler)
+            await self._dump(scope, profiler)
+
+    async def _dump(self, scope, profiler: SamplingProfiler) -> None:
+        if not profiler.stacks:
+            return
+        timer = current_timer()
+        trace_id = timer.trace_id if timer is not None and timer.trace_id else str(self._count)
+        name = f"chat-{time.strftime('%Y%m%d-%H%M%S')}-{trace_id}.collapsed"
+        path = os.path.join(self.dump_dir, name)
+        text = profiler.collapsed()
+
+        def write() -> None:
+            os.makedirs(self.dump_dir, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+
+        try:
+            await asyncio.to_thread(write)
+            _stats['dumps_written'] += 1
+        except OSError as e:
+            print(f"Profil yazılamadı ({path}): {e}")
+
+
+def get_profiler_stats() -> Dict:
+    """Profil çıkarıcı sayaçları"""
+    return {
+        'active': _active is not None,
+        'every_n_chat': PROFILE_EVERY_N_CHAT,
+        'dump_dir': PROFILE_DUMP_DIR if PROFILE_EVERY_N_CHAT else None,
+        **_stats,
+    }
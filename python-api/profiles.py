@@ -0,0 +1,353 @@
+"""
+VİSİ AI - Öğrenci Profil Deposu
+Profil sunucuda (SQLite) tutulur; istemci sadece değişen veriyi gönderir
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import PROFILE_DB_PATH, PROFILE_CACHE_SIZE
+from models import ExamResult, StudentProfile, TopicPerformance
+from student_data import get_aggregates
+from ttl_cache import TTLCache
+
+# Profil tablosunda tek JSON olarak tutulan alanlar (sınavlar ve konular ayrı tablolarda)
+_LIST_FIELDS = {'recent_exams', 'topic_performance'}
+
+
+def _exam_sort_key(exam: ExamResult) -> str:
+    return exam.date
+
+
+def read_profile(conn: sqlite3.Connection, student_id: str) -> Optional[StudentProfile]:
+    """Profili üç tablodan birleştirerek oku (toplu işlerde işçi süreçler de kullanır)"""
+    row = conn.execute(
+        "SELECT data FROM student_profiles WHERE student_id = ?", (student_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    data = json.loads(row[0])
+    # Sınavlar en yeniden eskiye (recent_exams[0] en güncel sınav)
+    data['recent_exams'] = [
+        json.loads(r[0]) for r in conn.execute(
+            "SELECT data FROM student_exams WHERE student_id = ? ORDER BY date DESC", (student_id,)
+        )
+    ]
+    data['topic_performance'] = [
+        json.loads(r[0]) for r in conn.execute(
+            "SELECT data FROM student_topics WHERE student_id = ? ORDER BY subject, topic", (student_id,)
+        )
+    ]
+    return StudentProfile(**data)
+
+
+def iter_student_ids(conn: sqlite3.Connection, page_size: int = 1000) -> Iterator[List[str]]:
+    """Tüm öğrenci id'leri, sayfa sayfa (bellek sabit kalır)"""
+    last = ""
+    while True:
+        page = [r[0] for r in conn.execute(
+            "SELECT student_id FROM student_profiles WHERE student_id > ? ORDER BY student_id LIMIT ?",
+            (last, page_size)
+        )]
+        if not page:
+            return
+        yield page
+        last = page[-1]
+
+
+class ProfileStore:
+    """Profil + sınav + konu tabloları, önünde LRU sıcak katman
+
+    Sınav ve konu güncellemeleri tek satır yazar; bellekteki profil
+    yerinde güncellenir, yeniden okunmaz.
+    """
+
+    def __init__(self, db_path: str = PROFILE_DB_PATH, cache_size: int = PROFILE_CACHE_SIZE):
+        self.db_path = db_path
+        self._cache = TTLCache(cache_size)
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = asyncio.Lock()
+        self.exam_writes = 0
+        self.topic_writes = 0
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS student_profiles ("
+            " student_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS student_exams ("
+            " student_id TEXT NOT NULL,"
+            " exam_id TEXT NOT NULL,"
+            " date TEXT NOT NULL,"
+            " data TEXT NOT NULL,"
+            " PRIMARY KEY (student_id, exam_id));"
+            "CREATE INDEX IF NOT EXISTS idx_student_exams_student_date"
+            " ON student_exams(student_id, date DESC);"
+            "CREATE TABLE IF NOT EXISTS student_topics ("
+            " student_id TEXT NOT NULL,"
+            " subject TEXT NOT NULL,"
+            " topic TEXT NOT NULL,"
+            " data TEXT NOT NULL,"
+            " PRIMARY KEY (student_id, subject, topic));"
+            "CREATE INDEX IF NOT EXISTS idx_student_topics_student"
+            " ON student_topics(student_id);"
+            "CREATE TABLE IF NOT EXISTS weekly_programs ("
+            " student_id TEXT PRIMARY KEY,"
+            " week_start TEXT NOT NULL,"
+            " data TEXT NOT NULL,"
+            " generated_at REAL NOT NULL);"
+        )
+        self._conn.commit()
+        # stats() event loop'ta SQLite'a gitmesin diye kayıt sayısı bellekte izlenir
+        self.profile_count = self._count()
+
+    # ------------------------------------------------------------------
+    # SQLite (iş parçacığında çalışır)
+    # ------------------------------------------------------------------
+
+    def _write_profile_row(self, profile: StudentProfile) -> None:
+        data = profile.model_dump_json(exclude=_LIST_FIELDS)
+        self._conn.execute(
+            "INSERT INTO student_profiles (student_id, data, updated_at) VALUES (?, ?, ?)"
+            " ON CONFLICT(student_id) DO UPDATE SET data=excluded.data, updated_at=excluded.updated_at",
+            (profile.student_id, data, time.time())
+        )
+
+    def _write_full(self, profile: StudentProfile) -> bool:
+        """Profili yaz; yeni kayıt açıldıysa True"""
+        sid = profile.student_id
+        with self._conn:
+            created = self._conn.execute(
+                "SELECT 1 FROM student_profiles WHERE student_id = ?", (sid,)
+            ).fetchone() is None
+            self._write_profile_row(profile)
+            self._conn.execute("DELETE FROM student_exams WHERE student_id = ?", (sid,))
+            self._conn.execute("DELETE FROM student_topics WHERE student_id = ?", (sid,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO student_exams (student_id, exam_id, date, data) VALUES (?, ?, ?, ?)",
+                [(sid, e.exam_id, e.date, e.model_dump_json()) for e in profile.recent_exams]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO student_topics (student_id, subject, topic, data) VALUES (?, ?, ?, ?)",
+                [(sid, t.subject, t.topic, t.model_dump_json()) for t in profile.topic_performance]
+            )
+        return created
+
+    def _write_fields(self, profile: StudentProfile) -> None:
+        with self._conn:
+            self._write_profile_row(profile)
+
+    def _write_exam(self, profile: StudentProfile, exam: ExamResult) -> None:
+        with self._conn:
+            self._write_profile_row(profile)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO student_exams (student_id, exam_id, date, data) VALUES (?, ?, ?, ?)",
+                (profile.student_id, exam.exam_id, exam.date, exam.model_dump_json())
+            )
+
+    def _write_topic(self, profile: StudentProfile, topic: TopicPerformance) -> None:
+        with self._conn:
+            self._write_profile_row(profile)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO student_topics (student_id, subject, topic, data) VALUES (?, ?, ?, ?)",
+                (profile.student_id, topic.subject, topic.topic, topic.model_dump_json())
+            )
+
+    def _read(self, student_id: str) -> Optional[StudentProfile]:
+        return read_profile(self._conn, student_id)
+
+    def _remove(self, student_id: str) -> int:
+        with self._conn:
+            cursor = self._conn.execute("DELETE FROM student_profiles WHERE student_id = ?", (student_id,))
+            self._conn.execute("DELETE FROM student_exams WHERE student_id = ?", (student_id,))
+            self._conn.execute("DELETE FROM student_topics WHERE student_id = ?", (student_id,))
+            self._conn.execute("DELETE FROM weekly_programs WHERE student_id = ?", (student_id,))
+        return cursor.rowcount
+
+    def write_weekly_programs(self, week_start: str, rows: List[Tuple[str, str]]) -> None:
+        """(student_id, program JSON) satırlarını yaz - toplu program işi kullanır"""
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO weekly_programs (student_id, week_start, data, generated_at)"
+                " VALUES (?, ?, ?, ?)",
+                [(sid, week_start, data, now) for sid, data in rows]
+            )
+
+    def _read_weekly_program(self, student_id: str) -> Optional[Dict]:
+        row = self._conn.execute(
+            "SELECT week_start, data, generated_at FROM weekly_programs WHERE student_id = ?",
+            (student_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'week_start': row[0], **json.loads(row[1]), 'generated_at': row[2]}
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM student_profiles").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Async API
+    # ------------------------------------------------------------------
+
+    async def get(self, student_id: str) -> Optional[StudentProfile]:
+        profile = self._cache.get(student_id)
+        if profile is not None:
+            return profile
+
+        async with self._lock:
+            return await self._load(student_id)
+
+    async def _load(self, student_id: str) -> Optional[StudentProfile]:
+        """Önbellekten ya da SQLite'tan oku; self._lock tutulurken çağrılır
+
+        Güncellemeler profili kilit altında okur: araya giren başka bir
+        güncelleme önbellekteki nesneyi değiştirdiyse eskisi üzerine yazılmaz.
+        """
+        profile = self._cache.get(student_id)
+        if profile is None:
+            profile = await asyncio.to_thread(self._read, student_id)
+            if profile is not None:
+                self._cache.set(student_id, profile)
+        return profile
+
+    async def get_many(self, student_ids: List[str]) -> Dict[str, StudentProfile]:
+        """Çok sayıda profil; önbellekte olmayanlar tek iş parçacığı çağrısında okunur"""
+        found: Dict[str, StudentProfile] = {}
+        missing = []
+        for student_id in student_ids:
+            profile = self._cache.get(student_id)
+            if profile is not None:
+                found[student_id] = profile
+            else:
+                missing.append(student_id)
+
+        if missing:
+            async with self._lock:
+                loaded = await asyncio.to_thread(lambda: [self._read(sid) for sid in missing])
+            for student_id, profile in zip(missing, loaded):
+                if profile is not None:
+                    self._cache.set(student_id, profile)
+                    found[student_id] = profile
+        return found
+
+    async def put(self, profile: StudentProfile) -> StudentProfile:
+        """Profili tamamen yaz (ilk kayıt / toplu içe aktarma)"""
+        profile.recent_exams.sort(key=_exam_sort_key, reverse=True)
+        async with self._lock:
+            created = await asyncio.to_thread(self._write_full, profile)
+        if created:
+            self.profile_count += 1
+        self._cache.set(profile.student_id, profile)
+        return profile
+
+    async def update_fields(self, student_id: str, fields: Dict) -> Optional[StudentProfile]:
+        """Sınav/konu dışındaki alanları güncelle (enerji, hedefler, çalışma istatistikleri...)"""
+        fields = {k: v for k, v in fields.items() if k not in _LIST_FIELDS and k != 'student_id'}
+        async with self._lock:
+            profile = await self._load(student_id)
+            if profile is None:
+                return None
+            updated = StudentProfile(**{**profile.model_dump(exclude=_LIST_FIELDS), **fields})
+            # Listeler ve performans toplamları kopyalanmadan taşınır
+            updated.recent_exams = profile.recent_exams
+            updated.topic_performance = profile.topic_performance
+            updated._aggregates = profile._aggregates
+            await asyncio.to_thread(self._write_fields, updated)
+            self._cache.set(student_id, updated)
+        return updated
+
+    async def add_exam(self, student_id: str, exam: ExamResult) -> Optional[StudentProfile]:
+        """Tek sınav sonucu ekle (aynı exam_id varsa güncellenir)
+
+        Bellekteki profil ancak SQLite yazması başarılı olunca güncellenir;
+        hata durumunda önbellek veritabanından ileri gitmez.
+        """
+        async with self._lock:
+            profile = await self._load(student_id)
+            if profile is None:
+                return None
+            exams = [e for e in profile.recent_exams if e.exam_id != exam.exam_id]
+            replaced = len(exams) != len(profile.recent_exams)
+            # Tarihe göre yeniden eskiye sıralı listeye yerleştir
+            index = 0
+            while index < len(exams) and exams[index].date > exam.date:
+                index += 1
+            exams.insert(index, exam)
+            await asyncio.to_thread(self._write_exam, profile, exam)
+
+            # En yeni deneme ise toplamlara eklenir; geçmişe dönük ekleme/düzeltmede yeniden kurulur
+            if index == 0 and not replaced:
+                get_aggregates(profile).add_exam(exam)
+            else:
+                profile._aggregates = None
+            profile.recent_exams = exams
+        self.exam_writes += 1
+        return profile
+
+    async def upsert_topic(self, student_id: str, topic: TopicPerformance) -> Optional[StudentProfile]:
+        """Tek konunun performansını ekle/güncelle (önbellek yazmadan sonra güncellenir)"""
+        async with self._lock:
+            profile = await self._load(student_id)
+            if profile is None:
+                return None
+            await asyncio.to_thread(self._write_topic, profile, topic)
+            topics = profile.topic_performance
+            for i, existing in enumerate(topics):
+                if existing.subject == topic.subject and existing.topic == topic.topic:
+                    topics[i] = topic
+                    break
+            else:
+                topics.append(topic)
+        self.topic_writes += 1
+        return profile
+
+    async def get_weekly_program(self, student_id: str) -> Optional[Dict]:
+        """Toplu işin ürettiği son haftalık program"""
+        async with self._lock:
+            return await asyncio.to_thread(self._read_weekly_program, student_id)
+
+    async def delete(self, student_id: str) -> bool:
+        removed = self._cache.pop(student_id) is not None
+        async with self._lock:
+            rows = await asyncio.to_thread(self._remove, student_id)
+        self.profile_count -= rows
+        return removed or rows > 0
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def stats(self) -> Dict:
+        return {
+            'db_path': self.db_path,
+            'profiles': self.profile_count,
+            'exam_writes': self.exam_writes,
+            'topic_writes': self.topic_writes,
+            'cache': self._cache.stats(),
+        }
+
+
+_store: Optional[ProfileStore] = None
+
+
+def get_profile_store() -> ProfileStore:
+    """Paylaşılan profil deposu (uygulama açılışında açılır; import dosya oluşturmaz)"""
+    global _store
+    if _store is None:
+        _store = ProfileStore()
+    return _store
+
+
+def close_profile_store() -> None:
+    """Uygulama kapanırken SQLite bağlantısını kapat"""
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
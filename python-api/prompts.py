@@ -3,8 +3,15 @@ VİSİ AI - Prompt Sistemi
 Tüm sistem prompt'ları ve mod yönetimi
 """
 
-from typing import Optional, List
+from functools import lru_cache
+from typing import Optional, List, Dict
+from config import PROMPT_CACHE_SIZE
 from models import StudentContext, ModType, TriageResult
+# Kelime listeleri keywords.py'de; geriye dönük uyumluluk için buradan da erişilebilir
+from keywords import (
+    ANXIETY_KEYWORDS, MOTIVATION_KEYWORDS, CAREER_KEYWORDS,
+    ACADEMIC_KEYWORDS, SAFETY_KEYWORDS, KeywordHits, scan_keywords, turkish_lower
+)
 
 # ============================================================================
 # MOD İSİMLERİ VE İKONLARI
@@ -26,63 +33,6 @@ MOD_ICONS = {
     'safe-support': '💙'
 }
 
-# ============================================================================
-# ANAHTAR KELİME LİSTELERİ
-# ============================================================================
-
-ANXIETY_KEYWORDS = [
-    'stres', 'kaygı', 'endişe', 'korku', 'panik', 'bunaltı',
-    'odaklanamıyorum', 'odaklanamiyorum', 'dikkatim dağılıyor',
-    'kilitlendi', 'kilitleniyorum', 'sıkıştım', 'tıkandım',
-    'nefes alamıyorum', 'boğuluyorum', 'daralıyorum',
-    'uykusuzluk', 'uyuyamıyorum', 'kabuslar',
-    'çok zor', 'başa çıkamıyorum', 'altından kalkamıyorum',
-    'ağlıyorum', 'ağlamak istiyorum', 'gözyaşı',
-    'sinir', 'sinirli', 'gergin', 'gerginlik',
-    'tedirgin', 'huzursuz', 'rahatsız',
-    'sınav stresi', 'deneme stresi', 'sınav kaygısı'
-]
-
-MOTIVATION_KEYWORDS = [
-    'motivasyon', 'içimden gelmiyor', 'istemiyorum', 'yapmak istemiyorum',
-    'bırakmak', 'vazgeçmek', 'pes etmek',
-    'yoruldum', 'tükendim', 'bitkinim', 'yorgun',
-    'ne anlamı var', 'anlamsız', 'boşuna',
-    'erteliyorum', 'erteleme', 'başlayamıyorum',
-    'devam edemiyorum', 'sürdüremiyorum',
-    'heves', 'ilgi', 'istek', 'azim',
-    'tembellik', 'tembelim', 'üşeniyorum',
-    'çalışmak istemiyorum', 'ders istemiyorum'
-]
-
-CAREER_KEYWORDS = [
-    'meslek', 'kariyer', 'gelecek', 'ne olacağım',
-    'hangi bölüm', 'hangi alan', 'hangi fakülte',
-    'neye yatkınım', 'ne yapmalıyım', 'ne seçmeliyim',
-    'yeteneklerim', 'güçlü yanlarım', 'zayıf yanlarım',
-    'kendimi tanımak', 'keşfetmek',
-    'mühendis', 'doktor', 'avukat', 'öğretmen',
-    'üniversite', 'tercih', 'sıralama'
-]
-
-ACADEMIC_KEYWORDS = [
-    'program', 'çalışma planı', 'plan', 'planlama',
-    'deneme', 'sınav', 'test', 'quiz',
-    'net', 'netler', 'puan', 'sıralama',
-    'konu', 'ders', 'matematik', 'fizik', 'kimya', 'biyoloji',
-    'türkçe', 'edebiyat', 'tarih', 'coğrafya',
-    'çalış', 'çalışayım', 'ne çalışmalıyım',
-    'tekrar', 'tekrar etmeliyim',
-    'soru', 'soru çöz', 'çözüm',
-    'TYT', 'AYT', 'LGS', 'YKS'
-]
-
-SAFETY_KEYWORDS = [
-    'intihar', 'ölmek', 'kendime zarar',
-    'yaşamak istemiyorum', 'hayatıma son',
-    'acı çekiyorum', 'dayanamıyorum'
-]
-
 # ============================================================================
 # LGS KONTROLÜ
 # ============================================================================
@@ -111,17 +61,20 @@ def is_lgs_or_below(context: Optional[StudentContext]) -> bool:
 # GÜVENLİK KONTROLÜ
 # ============================================================================
 
-def check_safety(message: str) -> dict:
-    """Kritik güvenlik durumlarını kontrol et"""
-    lower_msg = message.lower()
+def check_safety(message: str, hits: Optional[KeywordHits] = None) -> dict:
+    """Kritik güvenlik durumlarını kontrol et
     
-    for keyword in SAFETY_KEYWORDS:
-        if keyword in lower_msg:
-            return {
-                'risk_level': 'critical',
-                'keyword': keyword,
-                'action': 'Profesyonel yardım yönlendirmesi gerekli'
-            }
+    hits: mesajın (geçmiş olmadan) hazır tarama sonucu; verilmezse taranır.
+    """
+    if hits is None:
+        hits = scan_keywords(turkish_lower(message))
+    keyword = hits.first('safety')
+    if keyword:
+        return {
+            'risk_level': 'critical',
+            'keyword': keyword,
+            'action': 'Profesyonel yardım yönlendirmesi gerekli'
+        }
     
     return {'risk_level': 'safe', 'keyword': None, 'action': None}
 
@@ -132,20 +85,21 @@ def check_safety(message: str) -> dict:
 def perform_triage(
     message: str,
     context: Optional[StudentContext] = None,
-    history: List[dict] = None
+    history: List[dict] = None,
+    safety: Optional[dict] = None,
+    message_hits: Optional[KeywordHits] = None
 ) -> TriageResult:
-    """Mesaj ve bağlama göre uygun modu seç"""
+    """Mesaj ve bağlama göre uygun modu seç
     
-    lower_message = message.lower()
+    safety / message_hits önceden hesaplandıysa (bkz. message_analysis) tekrar taranmaz.
+    """
     
-    # Son 3 mesajı da dahil et
-    recent_history = ""
-    if history:
-        recent_history = " ".join([m.get('content', '').lower() for m in history[-3:]])
-    combined_text = f"{lower_message} {recent_history}"
+    if message_hits is None:
+        message_hits = scan_keywords(turkish_lower(message))
     
     # Güvenlik kontrolü
-    safety = check_safety(message)
+    if safety is None:
+        safety = check_safety(message, message_hits)
     if safety['risk_level'] == 'critical':
         return TriageResult(
             selected_mod='safe-support',
@@ -155,11 +109,16 @@ def perform_triage(
             action_capacity=False
         )
     
-    # Anahtar kelime skorları
-    anxiety_score = sum(1 for k in ANXIETY_KEYWORDS if k in combined_text)
-    motivation_score = sum(1 for k in MOTIVATION_KEYWORDS if k in combined_text)
-    career_score = sum(1 for k in CAREER_KEYWORDS if k in combined_text)
-    academic_score = sum(1 for k in ACADEMIC_KEYWORDS if k in combined_text)
+    # Anahtar kelime skorları; son 3 mesaj varsa onlar da dahil edilir
+    if history:
+        recent_history = " ".join([turkish_lower(m.get('content', '')) for m in history[-3:]])
+        hits = scan_keywords(f"{turkish_lower(message)} {recent_history}")
+    else:
+        hits = message_hits
+    anxiety_score = hits.count('anxiety')
+    motivation_score = hits.count('motivation')
+    career_score = hits.count('career')
+    academic_score = hits.count('academic')
     
     # Duygusal yük hesapla
     emotional_load = 'low'
@@ -223,28 +182,48 @@ def perform_triage(
 # ============================================================================
 
 def get_system_prompt(context: Optional[StudentContext] = None) -> str:
-    """Ana sistem prompt'unu oluştur"""
+    """Ana sistem prompt'unu oluştur (önbellekli)"""
+    if not context:
+        return _render_system_prompt(None, None, None, None, None, None)
+    return _render_system_prompt(
+        context.name,
+        context.level,
+        context.target_exam,
+        context.current_energy,
+        context.current_focus,
+        context.current_anxiety
+    )
+
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def _render_system_prompt(
+    name: Optional[str],
+    level: Optional[str],
+    target_exam: Optional[str],
+    current_energy: Optional[str],
+    current_focus: Optional[str],
+    current_anxiety: Optional[str]
+) -> str:
+    """Sistem prompt'unu yalnızca kullandığı bağlam alanlarından üret"""
     
     # Bağlam bilgisi
-    context_block = ""
-    if context:
-        parts = []
-        if context.name:
-            parts.append(f"İsim: {context.name}")
-        if context.level:
-            parts.append(f"Seviye: {context.level}")
-        if context.target_exam:
-            parts.append(f"Hedef Sınav: {context.target_exam}")
-        if context.current_energy:
-            energy_map = {'high': 'Yüksek', 'medium': 'Orta', 'low': 'Düşük'}
-            parts.append(f"Enerji: {energy_map.get(context.current_energy, context.current_energy)}")
-        if context.current_focus:
-            focus_map = {'sharp': 'Keskin', 'scattered': 'Dağınık', 'blocked': 'Blokeli'}
-            parts.append(f"Odak: {focus_map.get(context.current_focus, context.current_focus)}")
-        if context.current_anxiety:
-            anxiety_map = {'calm': 'Sakin', 'mild': 'Hafif', 'high': 'Yüksek', 'critical': 'Kritik'}
-            parts.append(f"Kaygı: {anxiety_map.get(context.current_anxiety, context.current_anxiety)}")
-        context_block = "\n".join(parts)
+    parts = []
+    if name:
+        parts.append(f"İsim: {name}")
+    if level:
+        parts.append(f"Seviye: {level}")
+    if target_exam:
+        parts.append(f"Hedef Sınav: {target_exam}")
+    if current_energy:
+        energy_map = {'high': 'Yüksek', 'medium': 'Orta', 'low': 'Düşük'}
+        parts.append(f"Enerji: {energy_map.get(current_energy, current_energy)}")
+    if current_focus:
+        focus_map = {'sharp': 'Keskin', 'scattered': 'Dağınık', 'blocked': 'Blokeli'}
+        parts.append(f"Odak: {focus_map.get(current_focus, current_focus)}")
+    if current_anxiety:
+        anxiety_map = {'calm': 'Sakin', 'mild': 'Hafif', 'high': 'Yüksek', 'critical': 'Kritik'}
+        parts.append(f"Kaygı: {anxiety_map.get(current_anxiety, current_anxiety)}")
+    context_block = "\n".join(parts)
     
     return f"""VİSİ AI – SİSTEM TALİMATLARI (v2.0 Python)
 VISITEEN – Akademik • Psikolojik • Gelişim Odaklı AI Koç
@@ -334,11 +313,18 @@ MOD SIRASI (en yüksekten en düşüğe):
 # ============================================================================
 
 def get_mod_specific_prompt(mod: ModType, context: Optional[StudentContext] = None) -> str:
-    """Moda özel prompt'u döndür"""
+    """Moda özel prompt'u döndür (önbellekli)"""
     
     is_lgs = is_lgs_or_below(context)
     student_name = context.name if context and context.name else 'öğrenci'
     
+    return _render_mod_prompt(mod, student_name, is_lgs)
+
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def _render_mod_prompt(mod: str, student_name: str, is_lgs: bool) -> str:
+    """Mod prompt'unu (mod, isim, LGS) üçlüsünden üret"""
+    
     prompts = {
         'academic': f"""
 📚 AKADEMİK KOÇ MODU AKTİF
@@ -453,6 +439,19 @@ Ne yapma:
     
     return prompts.get(mod, prompts['academic'])
 
+def get_prompt_cache_stats() -> Dict:
+    """Prompt önbelleği isabet/ıska sayaçları"""
+    stats = {}
+    for name, fn in (('system', _render_system_prompt), ('mod', _render_mod_prompt)):
+        info = fn.cache_info()
+        stats[name] = {
+            'hits': info.hits,
+            'misses': info.misses,
+            'size': info.currsize,
+            'maxsize': info.maxsize
+        }
+    return stats
+
 # ============================================================================
 # MOD GEÇİŞ MESAJLARI
 # ============================================================================
@@ -5,6 +5,7 @@ Duygu analizi ve psikolojik destek sistemi
 
 from typing import Optional, Dict, List
 from models import StudentContext
+from keywords import KeywordHits, scan_keywords, turkish_lower
 
 # ============================================================================
 # DUYGU DURUMU ANALİZİ
@@ -12,44 +13,21 @@ from models import StudentContext
 
 def analyze_emotional_state(
     message: str,
-    context: Optional[StudentContext] = None
+    context: Optional[StudentContext] = None,
+    hits: Optional[KeywordHits] = None
 ) -> Dict:
     """Öğrencinin duygusal durumunu analiz et"""
     
-    lower_msg = message.lower()
-    
-    # Duygu göstergeleri
-    stress_indicators = [
-        'stres', 'kaygı', 'gergin', 'bunaldım', 'sıkıldım',
-        'nefes alamıyorum', 'boğuluyorum', 'daralıyorum'
-    ]
-    
-    sadness_indicators = [
-        'üzgün', 'mutsuz', 'ağlıyorum', 'kötü hissediyorum',
-        'moralim bozuk', 'keyifsiz', 'depresif'
-    ]
-    
-    anger_indicators = [
-        'sinirli', 'kızgın', 'öfkeli', 'çıldırıyorum',
-        'bıktım', 'yeter artık', 'patladım'
-    ]
-    
-    exhaustion_indicators = [
-        'yoruldum', 'tükendim', 'bitkin', 'enerjim yok',
-        'uyuyamıyorum', 'uykum yok', 'dermansız'
-    ]
-    
-    hope_indicators = [
-        'umutlu', 'iyimser', 'heyecanlı', 'motiveyim',
-        'yapabilirim', 'başaracağım', 'güçlüyüm'
-    ]
+    # Duygu göstergeleri tek taramada sayılır (keywords.py)
+    if hits is None:
+        hits = scan_keywords(turkish_lower(message))
     
     # Skorları hesapla
-    stress_score = sum(1 for i in stress_indicators if i in lower_msg)
-    sadness_score = sum(1 for i in sadness_indicators if i in lower_msg)
-    anger_score = sum(1 for i in anger_indicators if i in lower_msg)
-    exhaustion_score = sum(1 for i in exhaustion_indicators if i in lower_msg)
-    hope_score = sum(1 for i in hope_indicators if i in lower_msg)
+    stress_score = hits.count('stress')
+    sadness_score = hits.count('sadness')
+    anger_score = hits.count('anger')
+    exhaustion_score = hits.count('exhaustion')
+    hope_score = hits.count('hope')
     
     # Baskın duygu belirle
     emotions = {
@@ -0,0 +1,230 @@
+"""
+VİSİ AI - Gemini Dayanıklılık Katmanı
+Çağrı başına zaman aşımı, titreşimli üstel geri çekilmeli yeniden deneme ve devre kesici
+"""
+
+import asyncio
+import math
+import random
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from google.api_core import exceptions as google_exceptions
+
+from config import (
+    LLM_CALL_TIMEOUT_SECONDS, LLM_MAX_RETRIES, LLM_RETRY_BASE_MS, LLM_RETRY_MAX_MS,
+    LLM_BREAKER_FAILURE_THRESHOLD, LLM_BREAKER_RESET_SECONDS
+)
+
+T = TypeVar('T')
+
+# Geçici sayılan HTTP durumları (501 gibi kalıcı 5xx'ler hariç); 429 kota hatası
+# zamanlayıcının işidir, burada yeniden denenmez
+RETRYABLE_STATUS = {500, 502, 503, 504}
+# gRPC durum adları (grpc.StatusCode) için karşılıkları
+_RETRYABLE_GRPC = {'INTERNAL', 'UNAVAILABLE', 'DEADLINE_EXCEEDED'}
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+class LLMTimeoutError(Exception):
+    """Gemini çağrısı LLM_CALL_TIMEOUT_SECONDS içinde yanıt vermedi"""
+
+
+class CircuitOpenError(Exception):
+    """Devre açık: sağlayıcı sağlıksız, çağrı hiç denenmeden reddedildi"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Gemini geçici olarak devre dışı ({math.ceil(retry_after)} sn sonra tekrar denenecek)")
+        self.retry_after = retry_after
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """Sağlayıcı hatasının HTTP durum kodu (bilinmiyorsa None)
+
+    Mesaj metnine bakılmaz: "500 karakter" gibi içerikler 5xx sanılmasın.
+    """
+    # google.api_core GoogleAPICallError.code; HTTP istemcilerinde status_code
+    for attr in ('code', 'status_code'):
+        code = getattr(error, attr, None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Yeniden denemeye değer geçici hata mı? (tipe / durum koduna göre)"""
+    if isinstance(error, (LLMTimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, google_exceptions.DeadlineExceeded):
+        return True
+    # grpc.aio.AioRpcError: code() bir grpc.StatusCode döndürür
+    code = getattr(error, 'code', None)
+    if callable(code):
+        try:
+            return getattr(code(), 'name', None) in _RETRYABLE_GRPC
+        except Exception:
+            return False
+    return status_code(error) in RETRYABLE_STATUS
+
+
+class CircuitBreaker:
+    """Art arda hatada devreyi aç, bekleme sonrası tek deneme çağrısıyla yokla"""
+
+    def __init__(
+        self,
+        failure_threshold: int = LLM_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = LLM_BREAKER_RESET_SECONDS
+    ):
+        self.failure_threshold = failure_threshold  # 0 → devre kesici kapalı
+        self.reset_timeout = reset_timeout
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+        self.opened = 0
+        self.short_circuited = 0
+
+    def before_call(self) -> None:
+        """Çağrıya izin ver ya da CircuitOpenError fırlat"""
+        if self.state == STATE_CLOSED:
+            return
+        if self.state == STATE_OPEN:
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                self.short_circuited += 1
+                raise CircuitOpenError(remaining)
+            self.state = STATE_HALF_OPEN
+            self._probe_in_flight = False
+        # Yarı açık: yalnızca tek yoklama çağrısı geçer
+        if self._probe_in_flight:
+            self.short_circuited += 1
+            raise CircuitOpenError(self.reset_timeout)
+        self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        self.state = STATE_CLOSED
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == STATE_HALF_OPEN or (
+            self.failure_threshold and self.consecutive_failures >= self.failure_threshold
+        ):
+            if self.state != STATE_OPEN:
+                self.opened += 1
+            self.state = STATE_OPEN
+            self._opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """Yoklama sağlayıcı sağlığı hakkında bilgi vermeden bitti (ör. kota)"""
+        self._probe_in_flight = False
+
+    def stats(self) -> Dict:
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'opened': self.opened,
+            'short_circuited': self.short_circuited,
+        }
+
+
+class Resilience:
+    """Zaman aşımı + yeniden deneme + devre kesici; Gemini çağrılarını sarar"""
+
+    def __init__(
+        self,
+        call_timeout: float = LLM_CALL_TIMEOUT_SECONDS,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_base: float = LLM_RETRY_BASE_MS / 1000,
+        retry_max: float = LLM_RETRY_MAX_MS / 1000,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.call_timeout = call_timeout  # 0 → sınırsız
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.breaker = breaker or CircuitBreaker()
+
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    def before_call(self, attempt: int = 1) -> None:
+        """Deneme başlangıcı; devre açıksa CircuitOpenError"""
+        if attempt == 1:
+            self.calls += 1
+        self.breaker.before_call()
+        self.attempts += 1
+
+    async def timed(self, awaitable: Awaitable[T]) -> T:
+        """Tek sağlayıcı çağrısına süre sınırı uygula"""
+        if not self.call_timeout:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, self.call_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMTimeoutError(f"Gemini {self.call_timeout:g} sn içinde yanıt vermedi")
+
+    def record_success(self) -> None:
+        self.breaker.record_success()
+
+    def on_failure(self, error: BaseException, attempt: int, can_retry: bool = True) -> Optional[float]:
+        """Hatayı kaydet; yeniden denenecekse beklenecek süreyi döndür (yoksa None)"""
+        retryable = is_retryable(error)
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            # İstemci / kota hatası sağlayıcının sağlıksız olduğunu göstermez
+            self.breaker.release_probe()
+
+        if not (can_retry and retryable and attempt <= self.max_retries):
+            self.failures += 1
+            return None
+        self.retries += 1
+        # Tam titreşim: eşzamanlı istemciler aynı anda geri dönmesin
+        return random.uniform(0, min(self.retry_max, self.retry_base * (2 ** (attempt - 1))))
+
+    async def call(self, attempt_fn: Callable[[], Awaitable[T]]) -> T:
+        """attempt_fn'i gerektiğinde yeniden dene (attempt_fn zaman aşımını timed ile uygular)"""
+        attempt = 0
+        while True:
+            attempt += 1
+            self.before_call(attempt)
+            try:
+                result = await attempt_fn()
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                delay = self.on_failure(e, attempt)
+                if delay is None:
+                    raise
+                print(f"Gemini hatası, {delay * 1000:.0f} ms sonra tekrar deneniyor ({attempt}/{self.max_retries}): {e}")
+                await asyncio.sleep(delay)
+            else:
+                self.record_success()
+                return result
+
+    def stats(self) -> Dict:
+        return {
+            'call_timeout_seconds': self.call_timeout,
+            'max_retries': self.max_retries,
+            'calls': self.calls,
+            'attempts': self.attempts,
+            'retries': self.retries,
+            'timeouts': self.timeouts,
+            'failures': self.failures,
+            'circuit': self.breaker.stats(),
+        }
+
+
+llm_resilience = Resilience()
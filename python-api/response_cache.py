@@ -0,0 +1,109 @@
+"""
+VİSİ AI - Yanıt Önbelleği
+Sık sorulan genel akademik sorular için Gemini yanıtlarını yeniden kullanır
+"""
+
+import hashlib
+import re
+from typing import Dict, Optional
+
+from config import RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS
+from keywords import turkish_lower
+from models import ChatRequest, StudentContext
+from ttl_cache import TTLCache
+
+# Yalnızca genel akademik sorular paylaşılabilir; duygusal modlarda
+# hazır yanıt dönmek doğru olmaz
+CACHEABLE_MODS = {'academic'}
+
+_TRAILING_PUNCT = re.compile(r"[\s?!.,;:…]+$")
+
+
+def normalize_question(message: str) -> str:
+    """Önbellek anahtarı için soruyu normalize et (harf, boşluk, son noktalama)"""
+    text = " ".join(turkish_lower(message).split())
+    return _TRAILING_PUNCT.sub("", text)
+
+
+def cache_context(context: Optional[StudentContext]) -> Optional[StudentContext]:
+    """Bağlamın anahtara giren kısmı; kişisel alanlar (isim, anlık durum) çıkarılır
+
+    Iskada prompt yine tam bağlamla üretilir; bu alanlar yalnızca anahtarı
+    öğrenciye özgü kılmasın diye dışarıda kalır.
+    """
+    if not context:
+        return None
+    # Sınıf, LGS/YKS ayrımını (is_lgs_or_below) belirler; yanıt tonu ona göre değişir
+    return StudentContext(level=context.level, target_exam=context.target_exam, grade=context.grade)
+
+
+class ResponseCache:
+    """Normalize mesaj + mod + seviye/hedef sınav/sınıf → yanıt metni"""
+
+    def __init__(self, enabled: bool, maxsize: int, ttl_seconds: int):
+        self.enabled = enabled
+        self._cache = TTLCache(maxsize, ttl=ttl_seconds)
+        self.bypassed = 0
+
+    def is_cacheable(
+        self,
+        request: ChatRequest,
+        active_mod: str,
+        safety: dict,
+        history_len: int,
+        has_image: bool
+    ) -> bool:
+        """Kişiye özel istekler (öğrenci verisi, görsel, geçmiş, opt-out) önbelleğe girmez"""
+        cacheable = (
+            self.enabled
+            and request.use_cache
+            and not request.student_data
+            and not has_image
+            and history_len == 0
+            and active_mod in CACHEABLE_MODS
+            and safety.get('risk_level', 'safe') == 'safe'
+        )
+        if not cacheable:
+            self.bypassed += 1
+        return cacheable
+
+    def make_key(
+        self,
+        message: str,
+        active_mod: str,
+        context: Optional[StudentContext],
+        emotional_state: dict,
+        academic_ready: bool
+    ) -> str:
+        """Soruyu ve yanıtın seviyesini/tonunu belirleyen girdilerden anahtar üret"""
+        context = cache_context(context)
+        parts = [
+            normalize_question(message),
+            active_mod,
+            (context.level or "") if context else "",
+            (context.target_exam or "") if context else "",
+            str(context.grade or "") if context else "",
+            emotional_state.get('dominant_emotion', ''),
+            emotional_state.get('emotional_load', ''),
+            'ready' if academic_ready else 'not-ready',
+        ]
+        return hashlib.sha256("\x1f".join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    def set(self, key: str, text: str) -> None:
+        if text:
+            self._cache.set(key, text)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict:
+        """İsabet/ıska ve atlanan istek sayaçları"""
+        return {'enabled': self.enabled, **self._cache.stats(), 'bypassed': self.bypassed}
+
+
+response_cache = ResponseCache(
+    RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS
+)
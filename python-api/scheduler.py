@@ -0,0 +1,300 @@
+"""
+VİSİ AI - Kota Farkındalıklı İstek Zamanlayıcı
+Gemini RPM/TPM kotasını izler; kota dolunca isteği reddetmek yerine öncelik sırasıyla kuyrukta bekletir
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+
+from google.api_core import exceptions as google_exceptions
+
+from config import (
+    LLM_MAX_CONCURRENCY, LLM_RPM_LIMIT, LLM_TPM_LIMIT,
+    LLM_QUEUE_TIMEOUT_SECONDS, LLM_QUOTA_COOLDOWN_SECONDS
+)
+from resilience import status_code
+
+# Öncelik şeritleri (küçük sayı önce servis edilir)
+LANE_CRITICAL = 0   # safe-support ve kritik güvenlik
+LANE_SUPPORT = 1    # focus-anxiety
+LANE_STANDARD = 2   # academic ve diğer modlar
+LANE_NAMES = {LANE_CRITICAL: 'critical', LANE_SUPPORT: 'support', LANE_STANDARD: 'standard'}
+
+WINDOW_SECONDS = 60.0
+
+
+def lane_for(active_mod: str, safety_status: str = 'safe') -> int:
+    """Mod ve güvenlik durumundan öncelik şeridi"""
+    if active_mod == 'safe-support' or safety_status == 'critical':
+        return LANE_CRITICAL
+    if active_mod == 'focus-anxiety':
+        return LANE_SUPPORT
+    return LANE_STANDARD
+
+
+def is_quota_error(error: BaseException) -> bool:
+    """Kota aşımı kontrolü (429 Resource Exhausted) - tipe / durum koduna göre
+
+    Mesaj metnine bakılmaz: içinde "429" geçen sıradan bir hata kabulü durdurmasın.
+    """
+    if isinstance(error, google_exceptions.ResourceExhausted):
+        return True
+    # grpc.aio.AioRpcError: code() bir grpc.StatusCode döndürür
+    code = getattr(error, 'code', None)
+    if callable(code):
+        try:
+            return getattr(code(), 'name', None) == 'RESOURCE_EXHAUSTED'
+        except Exception:
+            return False
+    return status_code(error) == 429
+
+
+class QueueTimeoutError(Exception):
+    """İstek kota kuyruğunda izin verilen süreden uzun bekledi"""
+
+
+@dataclass(order=True)
+class _Waiter:
+    lane: int
+    seq: int
+    tokens: int = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+@dataclass
+class Ticket:
+    """Kabul edilen istek; bitince release ile iade edilir"""
+    lane: int
+    usage: List  # [zaman, token] - pencere kaydı, gerçek kullanımla güncellenir
+    input_tokens: int
+
+
+@dataclass
+class Admission:
+    """Bir isteğin kuyruktaki yeri; sağlayıcı 429 dönerse aynı sıra ve kalan süreyle yeniden girer"""
+    lane: int
+    tokens: int
+    seq: Optional[int] = None       # ilk girişte atanır (şerit içi sıra korunur)
+    deadline: Optional[float] = None  # ilk girişte atanır (None → sınırsız)
+    requeues: int = 0
+
+
+class QuotaScheduler:
+    """RPM/TPM kayan pencereleri + eşzamanlılık sınırı + öncelikli kuyruk
+
+    Kuyruğun başındaki (en yüksek öncelikli, en eski) istek kotaya sığana
+    kadar beklenir; alt şeritler onu geçemez. Sağlayıcı 429 dönerse
+    kabul bir süre durdurulur.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        rpm_limit: int = LLM_RPM_LIMIT,
+        tpm_limit: int = LLM_TPM_LIMIT,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT_SECONDS,
+        quota_cooldown: float = LLM_QUOTA_COOLDOWN_SECONDS
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.rpm_limit = rpm_limit  # 0 → sınırsız
+        self.tpm_limit = tpm_limit  # 0 → sınırsız
+        self.queue_timeout = queue_timeout
+        self.quota_cooldown = quota_cooldown
+
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._window: Deque[List] = deque()
+        self._window_tokens = 0
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+        self.admitted = {lane: 0 for lane in LANE_NAMES}
+        self.wait_total = {lane: 0.0 for lane in LANE_NAMES}
+        self.wait_max = {lane: 0.0 for lane in LANE_NAMES}
+        self.max_queue_depth = 0
+        self.throttled = 0
+        self.timeouts = 0
+        self.quota_errors = 0
+        self.requeued = 0
+
+    # ------------------------------------------------------------------
+    # Kayan pencere
+    # ------------------------------------------------------------------
+
+    def _expire(self, now: float) -> None:
+        while self._window and self._window[0][0] <= now - WINDOW_SECONDS:
+            _, tokens = self._window.popleft()
+            self._window_tokens -= tokens
+
+    def _quota_wait(self, tokens: int, now: float) -> float:
+        """İsteğin kotaya sığması için beklenecek süre (0 → hemen)"""
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.rpm_limit and len(self._window) >= self.rpm_limit:
+            return self._window[0][0] + WINDOW_SECONDS - now
+        if self.tpm_limit and self._window and self._window_tokens + tokens > self.tpm_limit:
+            # Yeterli token boşalana kadar en eski kayıtlar düşmeli
+            needed = self._window_tokens + tokens - self.tpm_limit
+            for ts, used in self._window:
+                needed -= used
+                if needed <= 0:
+                    return ts + WINDOW_SECONDS - now
+        return 0.0
+
+    # ------------------------------------------------------------------
+    # Dağıtım
+    # ------------------------------------------------------------------
+
+    def _dispatch(self) -> None:
+        """Kuyruğun başından, kota ve eşzamanlılık izin verdikçe kabul et"""
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        self._expire(now)
+
+        while self._queue and self._in_flight < self.max_concurrency:
+            head = self._queue[0]
+            if head.future.done():
+                # Zaman aşımı / iptal
+                heapq.heappop(self._queue)
+                continue
+
+            wait = self._quota_wait(head.tokens, now)
+            if wait > 0:
+                self.throttled += 1
+                self._schedule_wakeup(loop, wait)
+                return
+
+            heapq.heappop(self._queue)
+            usage = [now, head.tokens]
+            self._window.append(usage)
+            self._window_tokens += head.tokens
+            self._in_flight += 1
+
+            waited = now - head.enqueued_at
+            self.admitted[head.lane] += 1
+            self.wait_total[head.lane] += waited
+            self.wait_max[head.lane] = max(self.wait_max[head.lane], waited)
+            head.future.set_result(Ticket(lane=head.lane, usage=usage, input_tokens=head.tokens))
+
+    def _schedule_wakeup(self, loop: asyncio.AbstractEventLoop, delay: float) -> None:
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+        self._wakeup = loop.call_later(delay, self._on_wakeup)
+
+    def _on_wakeup(self) -> None:
+        self._wakeup = None
+        self._dispatch()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    async def acquire(self, lane: int, tokens: int, admission: Optional[Admission] = None) -> Ticket:
+        """Sıra gelene kadar bekle; kuyrukta fazla kalırsa QueueTimeoutError
+
+        admission verilirse yeniden girişte ilk girişin sırası ve son tarihi kullanılır.
+        """
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        if admission is None:
+            admission = Admission(lane, tokens)
+        if admission.seq is None:
+            admission.seq = next(self._seq)
+            admission.deadline = now + self.queue_timeout if self.queue_timeout > 0 else None
+        waiter = _Waiter(lane, admission.seq, max(0, tokens), now, loop.create_future())
+        heapq.heappush(self._queue, waiter)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+        self._dispatch()
+
+        try:
+            if admission.deadline is not None:
+                return await asyncio.wait_for(asyncio.shield(waiter.future), max(0.0, admission.deadline - now))
+            return await waiter.future
+        except asyncio.TimeoutError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Tam zaman aşımında kabul edildiyse yeri iade et
+                self.release(waiter.future.result())
+            else:
+                waiter.future.cancel()
+            self.timeouts += 1
+            raise QueueTimeoutError(
+                f"Gemini kotası dolu; istek {self.queue_timeout:g} sn kuyrukta bekledi"
+            )
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(waiter.future.result())
+            else:
+                waiter.future.cancel()
+            raise
+
+    def requeue(self, admission: Admission, error: BaseException) -> bool:
+        """Sağlayıcı 429'unda istek yeniden kuyruğa girsin mi? (son tarihi geçmediyse)
+
+        release kabulü soğuma süresince durdurduğu için bir sonraki acquire
+        soğuma bitene kadar, isteğin kendi şeridinde ve sırasında bekler.
+        """
+        if not is_quota_error(error):
+            return False
+        if admission.deadline is not None and time.monotonic() >= admission.deadline:
+            return False
+        admission.requeues += 1
+        self.requeued += 1
+        return True
+
+    def release(self, ticket: Ticket, output_tokens: Optional[int] = None, error: Optional[BaseException] = None) -> None:
+        """Çağrı bitti: yeri iade et, token kaydını gerçek kullanımla düzelt"""
+        self._in_flight -= 1
+        if output_tokens is not None:
+            now = time.monotonic()
+            self._expire(now)
+            actual = ticket.input_tokens + output_tokens
+            # Kayıt hâlâ penceredeyse toplam da düzeltilir
+            if ticket.usage[0] > now - WINDOW_SECONDS:
+                self._window_tokens += actual - ticket.usage[1]
+            ticket.usage[1] = actual
+        if error is not None and is_quota_error(error):
+            # Sağlayıcı kotası bizim sayacımızdan önce doldu; kabulü bir süre durdur
+            self.quota_errors += 1
+            self._paused_until = time.monotonic() + self.quota_cooldown
+        self._dispatch()
+
+    def stats(self) -> Dict:
+        """Kuyruk derinliği, bekleme süreleri ve kota kullanımı"""
+        self._expire(time.monotonic())
+        depth = {name: 0 for name in LANE_NAMES.values()}
+        for waiter in self._queue:
+            if not waiter.future.done():
+                depth[LANE_NAMES[waiter.lane]] += 1
+        return {
+            'rpm_limit': self.rpm_limit,
+            'tpm_limit': self.tpm_limit,
+            'requests_last_minute': len(self._window),
+            'tokens_last_minute': self._window_tokens,
+            'in_flight': self._in_flight,
+            'queue_depth': depth,
+            'max_queue_depth': self.max_queue_depth,
+            'paused': time.monotonic() < self._paused_until,
+            'throttled': self.throttled,
+            'timeouts': self.timeouts,
+            'quota_errors': self.quota_errors,
+            'requeued': self.requeued,
+            'lanes': {
+                name: {
+                    'admitted': self.admitted[lane],
+                    'avg_wait_ms': round(self.wait_total[lane] / self.admitted[lane] * 1000, 1)
+                    if self.admitted[lane] else 0.0,
+                    'max_wait_ms': round(self.wait_max[lane] * 1000, 1),
+                }
+                for lane, name in LANE_NAMES.items()
+            },
+        }
+
+
+llm_scheduler = QuotaScheduler()
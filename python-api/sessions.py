@@ -0,0 +1,218 @@
+"""
+VİSİ AI - Sohbet Oturumları
+İstemcinin her turda tüm geçmişi göndermesi yerine sunucu tarafı oturum deposu
+"""
+
+import asyncio
+import json
+import sqlite3
+import time
+import uuid
+import weakref
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from config import SESSION_TTL_SECONDS, SESSION_MAX_ENTRIES, SESSION_DB_PATH
+from models import ChatMessage, StudentContext, StudentProfile
+from ttl_cache import TTLCache
+
+# ============================================================================
+# OTURUM
+# ============================================================================
+
+@dataclass
+class ConversationSession:
+    """Tek bir öğrencinin devam eden sohbeti"""
+    session_id: str
+    student_context: Optional[StudentContext] = None
+    student_data: Optional[StudentProfile] = None
+    # Verilirse profil her turda profil deposundan okunur
+    student_id: Optional[str] = None
+    messages: List[ChatMessage] = field(default_factory=list)
+    # Gemini formatındaki geçmiş; her turda yeniden dönüştürülmez, sadece eklenir
+    gemini_history: List[Dict] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    def append(self, role: str, content: str) -> None:
+        """Mesajı hem ham hem Gemini formatında ekle"""
+        self.messages.append(ChatMessage(role=role, content=content))
+        self.gemini_history.append({
+            "role": "user" if role == "user" else "model",
+            "parts": [content]
+        })
+        self.updated_at = time.time()
+
+    def triage_history(self, last_n: int = 3) -> List[Dict]:
+        """Triyajın baktığı son mesajlar"""
+        return [{"content": m.content, "role": m.role} for m in self.messages[-last_n:]]
+
+    def to_dict(self) -> Dict:
+        return {
+            'session_id': self.session_id,
+            'student_context': self.student_context.model_dump() if self.student_context else None,
+            'student_data': self.student_data.model_dump() if self.student_data else None,
+            'student_id': self.student_id,
+            'messages': [m.model_dump() for m in self.messages],
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ConversationSession":
+        session = cls(
+            session_id=data['session_id'],
+            student_context=StudentContext(**data['student_context']) if data.get('student_context') else None,
+            student_data=StudentProfile(**data['student_data']) if data.get('student_data') else None,
+            student_id=data.get('student_id'),
+            created_at=data.get('created_at', time.time()),
+        )
+        for m in data.get('messages', []):
+            session.append(m['role'], m['content'])
+        session.updated_at = data.get('updated_at', session.updated_at)
+        return session
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+# ============================================================================
+# DEPOLAR
+# ============================================================================
+
+class InMemorySessionStore:
+    """LRU + TTL tahliyeli bellek içi oturum deposu"""
+
+    backend = 'memory'
+
+    def __init__(self, max_entries: int = SESSION_MAX_ENTRIES, ttl_seconds: int = SESSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._cache = TTLCache(max_entries, ttl=ttl_seconds)
+        # Oturum başına kilit; kullanan kalmayınca kendiliğinden silinir
+        self._session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def lock(self, session_id: str) -> asyncio.Lock:
+        """Oturumun oku → yanıtla → kaydet turunu sıraya sokan kilit"""
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._session_locks[session_id] = lock
+        return lock
+
+    async def create(
+        self,
+        student_context: Optional[StudentContext] = None,
+        student_data: Optional[StudentProfile] = None,
+        student_id: Optional[str] = None
+    ) -> ConversationSession:
+        session = ConversationSession(
+            session_id=new_session_id(),
+            student_context=student_context,
+            student_data=student_data,
+            student_id=student_id
+        )
+        await self.save(session)
+        return session
+
+    async def get(self, session_id: str) -> Optional[ConversationSession]:
+        return self._cache.get(session_id)
+
+    async def save(self, session: ConversationSession) -> None:
+        # Her kayıtta TTL yenilenir (kayan pencere)
+        self._cache.set(session.session_id, session)
+
+    async def delete(self, session_id: str) -> bool:
+        return self._cache.pop(session_id) is not None
+
+    def stats(self) -> Dict:
+        return {'backend': self.backend, **self._cache.stats()}
+
+
+class SQLiteSessionStore(InMemorySessionStore):
+    """Bellek içi sıcak katman + SQLite kalıcılığı (yeniden başlatmada oturumlar korunur)"""
+
+    backend = 'sqlite'
+
+    def __init__(
+        self,
+        db_path: str,
+        max_entries: int = SESSION_MAX_ENTRIES,
+        ttl_seconds: int = SESSION_TTL_SECONDS
+    ):
+        super().__init__(max_entries, ttl_seconds)
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = asyncio.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chat_sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated ON chat_sessions(updated_at)"
+        )
+        self._conn.commit()
+
+    def _write(self, session_id: str, data: str, updated_at: float) -> None:
+        self._conn.execute(
+            "INSERT INTO chat_sessions (session_id, data, updated_at) VALUES (?, ?, ?)"
+            " ON CONFLICT(session_id) DO UPDATE SET data=excluded.data, updated_at=excluded.updated_at",
+            (session_id, data, updated_at)
+        )
+        # Süresi dolmuş oturumları temizle
+        self._conn.execute(
+            "DELETE FROM chat_sessions WHERE updated_at < ?",
+            (time.time() - self.ttl_seconds,)
+        )
+        self._conn.commit()
+
+    def _read(self, session_id: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT data FROM chat_sessions WHERE session_id = ? AND updated_at >= ?",
+            (session_id, time.time() - self.ttl_seconds)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _remove(self, session_id: str) -> int:
+        cursor = self._conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+        self._conn.commit()
+        return cursor.rowcount
+
+    async def get(self, session_id: str) -> Optional[ConversationSession]:
+        session = self._cache.get(session_id)
+        if session is not None:
+            return session
+
+        async with self._lock:
+            data = await asyncio.to_thread(self._read, session_id)
+        if data is None:
+            return None
+
+        session = ConversationSession.from_dict(json.loads(data))
+        self._cache.set(session_id, session)
+        return session
+
+    async def save(self, session: ConversationSession) -> None:
+        await super().save(session)
+        data = json.dumps(session.to_dict(), ensure_ascii=False)
+        async with self._lock:
+            await asyncio.to_thread(self._write, session.session_id, data, session.updated_at)
+
+    async def delete(self, session_id: str) -> bool:
+        removed = await super().delete(session_id)
+        async with self._lock:
+            rows = await asyncio.to_thread(self._remove, session_id)
+        return removed or rows > 0
+
+
+def create_session_store():
+    """SESSION_DB_PATH verilmişse SQLite, yoksa bellek içi depo"""
+    if SESSION_DB_PATH:
+        return SQLiteSessionStore(SESSION_DB_PATH)
+    return InMemorySessionStore()
+
+
+session_store = create_session_store()
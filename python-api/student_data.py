@@ -3,94 +3,212 @@ VİSİ AI - Öğrenci Veri Analizi
 Performans analizi ve çalışma planı oluşturma
 """
 
+import hashlib
+from fractions import Fraction
 from typing import Optional, List, Dict
 from datetime import datetime, timedelta
+from config import STUDENT_PROMPT_CACHE_SIZE
 from models import StudentProfile, ExamResult, TopicPerformance, StudyStats
+from ttl_cache import TTLCache
+
+
+# ============================================================================
+# ARTIMLI PERFORMANS TOPLAMLARI
+# ============================================================================
+
+class _Series:
+    """Kronolojik değer serisi; kesin önek toplamları ve min/max/uçlar artımlı tutulur
+
+    Toplamlar Fraction ile kesin tutulur, ortalama okunurken bir kez float'a
+    çevrilir: float toplamın sırası değişince 0.1'e yuvarlanan ortalama
+    sınırda bir basamak oynayıp dersin öncelik kovasını değiştirebiliyordu.
+    """
+
+    __slots__ = ('_prefix', 'min', 'max', 'oldest', 'newest')
+
+    def __init__(self):
+        # _prefix[i] = ilk i değerin kesin toplamı (trend için yarı toplamlar O(1))
+        self._prefix: List[Fraction] = [Fraction(0)]
+        self.min = None
+        self.max = None
+        self.oldest = None
+        self.newest = None
+
+    def __len__(self) -> int:
+        return len(self._prefix) - 1
+
+    def append(self, value: float) -> None:
+        """Yeni (en güncel) değeri ekle"""
+        self._prefix.append(self._prefix[-1] + Fraction(value))
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if self.oldest is None:
+            self.oldest = value
+        self.newest = value
+
+    def _mean(self, start: int, end: int) -> float:
+        """[start, end) aralığının ortalaması (tek yuvarlama)"""
+        return float((self._prefix[end] - self._prefix[start]) / (end - start))
+
+    def mean(self) -> float:
+        return self._mean(0, len(self))
+
+    def trend(self) -> str:
+        """calculate_trend ile aynı: yeni yarı ile eski yarının ortalama farkı"""
+        n = len(self)
+        if n < 2:
+            return 'stable'
+        half = n // 2
+        diff = self._mean(n - half, n) - self._mean(0, n - half)
+        if diff > 2:
+            return 'improving'
+        elif diff < -2:
+            return 'declining'
+        return 'stable'
+
+
+class _SubjectTotals:
+    """Tek dersin tüm denemelerdeki toplamları"""
+
+    __slots__ = ('nets', 'success_rates', 'correct', 'wrong', 'empty', 'latest_seq', 'position')
+
+    def __init__(self):
+        self.nets = _Series()
+        self.success_rates = _Series()
+        self.correct = 0
+        self.wrong = 0
+        self.empty = 0
+        # Dersin geçtiği en yeni deneme ve o denemedeki sırası (çıktı sırası için)
+        self.latest_seq = -1
+        self.position = 0
+
+
+class PerformanceAggregates:
+    """Denemeler eklendikçe güncellenen ders/net toplamları
+
+    Analizde deneme/ders modelleri yeniden gezilmez; yalnızca ders başına
+    tutulan sayı dizileri toplanır.
+    Denemeler en eskiden en yeniye eklenmelidir (add_exam en yeni deneme içindir).
+    """
+
+    def __init__(self):
+        self.exam_count = 0
+        self.total_nets = _Series()
+        self.subjects: Dict[str, _SubjectTotals] = {}
+        self.newest_exam: Optional[ExamResult] = None
+
+    @classmethod
+    def from_exams(cls, exams: List[ExamResult]) -> "PerformanceAggregates":
+        """recent_exams (yeniden eskiye) listesinden baştan kur"""
+        aggregates = cls()
+        for exam in reversed(exams):
+            aggregates.add_exam(exam)
+        return aggregates
+
+    def add_exam(self, exam: ExamResult) -> None:
+        """En yeni denemeyi ekle - O(denemedeki ders sayısı)"""
+        seq = self.exam_count
+        self.exam_count += 1
+        self.newest_exam = exam
+        if exam.total_net:
+            self.total_nets.append(exam.total_net)
+
+        # Deneme içinde sondan başa: recent_exams sırasıyla okunduğunda
+        # aynı dersin ilk kaydı en yeni sayılır
+        results = exam.subject_results
+        for position in range(len(results) - 1, -1, -1):
+            subject = results[position]
+            totals = self.subjects.get(subject.subject)
+            if totals is None:
+                totals = self.subjects[subject.subject] = _SubjectTotals()
+            totals.nets.append(subject.net)
+            totals.success_rates.append(subject.success_rate)
+            totals.correct += subject.correct
+            totals.wrong += subject.wrong
+            totals.empty += subject.empty
+            totals.latest_seq = seq
+            totals.position = position
+
+    def matches(self, exams: List[ExamResult]) -> bool:
+        """Toplamlar bu deneme listesini mi yansıtıyor"""
+        return self.exam_count == len(exams) and (not exams or self.newest_exam is exams[0])
+
+    def analysis(self) -> Dict:
+        """analyze_student_performance çıktısı"""
+        analysis = {
+            'exam_summary': {},
+            'subject_analysis': [],
+            'weak_topics': [],
+            'strong_topics': [],
+            'study_recommendations': [],
+            'net_projection': {}
+        }
+
+        if not self.exam_count:
+            return analysis
+
+        nets = self.total_nets
+        if len(nets):
+            analysis['exam_summary'] = {
+                'exam_count': self.exam_count,
+                'average_net': round(nets.mean(), 1),
+                'max_net': nets.max,
+                'min_net': nets.min,
+                'trend': nets.trend()
+            }
+
+        # Dersler en yeni denemedeki ilk görünme sırasıyla
+        ordered = sorted(self.subjects.items(), key=lambda kv: (-kv[1].latest_seq, kv[1].position))
+        for subject, totals in ordered:
+            avg_net = round(totals.nets.mean(), 1)
+            avg_success = round(totals.success_rates.mean(), 1)
+
+            analysis['subject_analysis'].append({
+                'subject': subject,
+                'average_net': avg_net,
+                'average_success_rate': avg_success,
+                'total_correct': totals.correct,
+                'total_wrong': totals.wrong,
+                'total_empty': totals.empty,
+                'trend': totals.nets.trend(),
+                'priority': get_priority(avg_success)
+            })
+
+            # Güçlü/zayıf sınıflandırma
+            if avg_success >= 70:
+                analysis['strong_topics'].append(subject)
+            elif avg_success < 50:
+                analysis['weak_topics'].append(subject)
+
+        # Öncelik sıralaması
+        analysis['subject_analysis'].sort(key=lambda x: x['average_success_rate'])
+
+        # Net projeksiyonu
+        if len(nets) >= 2:
+            weekly_increase = (nets.newest - nets.oldest) / len(nets)
+            current_net = nets.newest
+            analysis['net_projection'] = {
+                'current': current_net,
+                'next_week': round(current_net + weekly_increase, 1),
+                'next_month': round(current_net + (weekly_increase * 4), 1),
+                'weekly_increase': round(weekly_increase, 1)
+            }
+
+        return analysis
+
+
+def get_aggregates(profile: StudentProfile) -> PerformanceAggregates:
+    """Profile bağlı toplamlar; yoksa ya da profil değiştiyse yeniden kurulur"""
+    aggregates = profile._aggregates
+    if aggregates is None or not aggregates.matches(profile.recent_exams):
+        aggregates = PerformanceAggregates.from_exams(profile.recent_exams)
+        profile._aggregates = aggregates
+    return aggregates
 
 
 def analyze_student_performance(profile: StudentProfile) -> Dict:
     """Öğrenci performansını analiz et"""
-    
-    analysis = {
-        'exam_summary': {},
-        'subject_analysis': [],
-        'weak_topics': [],
-        'strong_topics': [],
-        'study_recommendations': [],
-        'net_projection': {}
-    }
-    
-    if not profile.recent_exams:
-        return analysis
-    
-    # Sınav özeti
-    exams = profile.recent_exams
-    total_nets = [e.total_net for e in exams if e.total_net]
-    
-    if total_nets:
-        analysis['exam_summary'] = {
-            'exam_count': len(exams),
-            'average_net': round(sum(total_nets) / len(total_nets), 1),
-            'max_net': max(total_nets),
-            'min_net': min(total_nets),
-            'trend': calculate_trend(total_nets)
-        }
-    
-    # Ders bazlı analiz
-    subject_stats = {}
-    for exam in exams:
-        for subject in exam.subject_results:
-            if subject.subject not in subject_stats:
-                subject_stats[subject.subject] = {
-                    'nets': [],
-                    'success_rates': [],
-                    'correct': 0,
-                    'wrong': 0,
-                    'empty': 0
-                }
-            subject_stats[subject.subject]['nets'].append(subject.net)
-            subject_stats[subject.subject]['success_rates'].append(subject.success_rate)
-            subject_stats[subject.subject]['correct'] += subject.correct
-            subject_stats[subject.subject]['wrong'] += subject.wrong
-            subject_stats[subject.subject]['empty'] += subject.empty
-    
-    for subject, stats in subject_stats.items():
-        avg_net = round(sum(stats['nets']) / len(stats['nets']), 1) if stats['nets'] else 0
-        avg_success = round(sum(stats['success_rates']) / len(stats['success_rates']), 1) if stats['success_rates'] else 0
-        
-        subject_analysis = {
-            'subject': subject,
-            'average_net': avg_net,
-            'average_success_rate': avg_success,
-            'total_correct': stats['correct'],
-            'total_wrong': stats['wrong'],
-            'total_empty': stats['empty'],
-            'trend': calculate_trend(stats['nets']),
-            'priority': get_priority(avg_success)
-        }
-        analysis['subject_analysis'].append(subject_analysis)
-        
-        # Güçlü/zayıf sınıflandırma
-        if avg_success >= 70:
-            analysis['strong_topics'].append(subject)
-        elif avg_success < 50:
-            analysis['weak_topics'].append(subject)
-    
-    # Öncelik sıralaması
-    analysis['subject_analysis'].sort(key=lambda x: x['average_success_rate'])
-    
-    # Net projeksiyonu
-    if total_nets and len(total_nets) >= 2:
-        weekly_increase = (total_nets[0] - total_nets[-1]) / len(total_nets)
-        current_net = total_nets[0]
-        analysis['net_projection'] = {
-            'current': current_net,
-            'next_week': round(current_net + weekly_increase, 1),
-            'next_month': round(current_net + (weekly_increase * 4), 1),
-            'weekly_increase': round(weekly_increase, 1)
-        }
-    
-    return analysis
+    return get_aggregates(profile).analysis()
 
 
 def calculate_trend(values: List[float]) -> str:
@@ -120,8 +238,8 @@ def get_priority(success_rate: float) -> str:
     return 'low'
 
 
-def generate_weekly_program(profile: StudentProfile) -> Dict:
-    """Haftalık çalışma programı oluştur"""
+def generate_weekly_program(profile: StudentProfile, analysis: Optional[Dict] = None) -> Dict:
+    """Haftalık çalışma programı oluştur (analysis verilirse yeniden hesaplanmaz)"""
     
     # Enerji durumuna göre çalışma süresi
     base_duration = 45  # dakika
@@ -130,7 +248,8 @@ def generate_weekly_program(profile: StudentProfile) -> Dict:
     elif profile.current_energy == 'high':
         base_duration = 60
     
-    analysis = analyze_student_performance(profile)
+    if analysis is None:
+        analysis = analyze_student_performance(profile)
     weak_subjects = analysis.get('weak_topics', [])
     
     days = ['Pazartesi', 'Salı', 'Çarşamba', 'Perşembe', 'Cuma', 'Cumartesi', 'Pazar']
@@ -205,11 +324,38 @@ def generate_weekly_program(profile: StudentProfile) -> Dict:
     }
 
 
+# ============================================================================
+# ÖĞRENCİ PROMPT ÖNBELLEĞİ
+# ============================================================================
+
+# Profil içeriği hash'i → prompt
+_student_prompt_cache = TTLCache(STUDENT_PROMPT_CACHE_SIZE)
+
+
+def profile_fingerprint(profile: StudentProfile) -> str:
+    """Profil içeriğinin kararlı hash'i (aynı içerik → aynı anahtar)"""
+    return hashlib.sha256(profile.model_dump_json().encode('utf-8')).hexdigest()
+
+
 def generate_student_data_prompt(profile: StudentProfile) -> str:
+    """Öğrenci verilerinden detaylı prompt oluştur (profil değişmediyse önbellekten)"""
+    key = profile_fingerprint(profile)
+    prompt = _student_prompt_cache.get(key)
+    if prompt is None:
+        prompt = _render_student_data_prompt(profile, analyze_student_performance(profile))
+        _student_prompt_cache.set(key, prompt)
+    return prompt
+
+
+def get_student_prompt_cache_stats() -> Dict:
+    """Öğrenci prompt önbelleği isabet/ıska sayaçları"""
+    return _student_prompt_cache.stats()
+
+
+def _render_student_data_prompt(profile: StudentProfile, analysis: Dict) -> str:
     """Öğrenci verilerinden detaylı prompt oluştur"""
     
-    analysis = analyze_student_performance(profile)
-    program = generate_weekly_program(profile)
+    program = generate_weekly_program(profile, analysis)
     
     # Sınav özeti tablosu
     exam_table = "| Tarih | Sınav | Net | Trend |\n|-------|-------|-----|-------|\n"
@@ -0,0 +1,88 @@
+"""
+VİSİ AI - Test Ayarları
+python-api modüllerini içe aktarılabilir yapar; kalıcı veri geçici klasöre yazılır
+Bileşen fixture'ları testlerde paylaşılır
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# config içe aktarılmadan önce: testler kullanıcının veri klasörüne dokunmasın
+os.environ.setdefault("VISI_DATA_DIR", tempfile.mkdtemp(prefix="visi-ai-tests-"))
+
+
+class FakeRpcError(Exception):
+    """grpc.aio.AioRpcError gibi code() metodu olan hata"""
+
+    def __init__(self, code):
+        super().__init__(code.name)
+        self._code = code
+
+    def code(self):
+        return self._code
+
+
+@pytest.fixture
+def response_cache():
+    from response_cache import ResponseCache
+    return ResponseCache(True, 8, 60)
+
+
+@pytest.fixture
+def image_cache_factory():
+    from image_cache import ImageAnswerCache
+
+    def factory(threshold=6, maxsize=16, **options):
+        return ImageAnswerCache(True, maxsize, 60, threshold, **options)
+    return factory
+
+
+@pytest.fixture
+def history_manager_factory():
+    from history import HistoryManager
+
+    def factory():
+        return HistoryManager(token_budget=200, summary_max_tokens=10_000, line_chars=40, cache_size=8)
+    return factory
+
+
+@pytest.fixture
+def scheduler_factory():
+    from scheduler import QuotaScheduler
+
+    def factory(**overrides):
+        options = dict(max_concurrency=1, rpm_limit=0, tpm_limit=0, queue_timeout=5, quota_cooldown=30)
+        options.update(overrides)
+        return QuotaScheduler(**options)
+    return factory
+
+
+@pytest.fixture
+def resilience_factory():
+    from resilience import CircuitBreaker, Resilience
+
+    def factory(max_retries=2, threshold=10):
+        return Resilience(
+            call_timeout=0.05, max_retries=max_retries, retry_base=0.001, retry_max=0.002,
+            breaker=CircuitBreaker(failure_threshold=threshold, reset_timeout=60)
+        )
+    return factory
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "profiles.db")
+
+
+@pytest.fixture
+def profile_store(db_path):
+    from profiles import ProfileStore
+    store = ProfileStore(db_path)
+    yield store
+    store.close()
@@ -0,0 +1,90 @@
+"""
+VİSİ AI - Sohbet Akışı Testleri
+Gemini çağrısı taklit edilir; hazırlık, kota yanıtı ve oturum kaydı sınanır
+"""
+
+import asyncio
+
+import pytest
+
+import main
+from models import ChatRequest, SessionMessageRequest, StudentContext
+from scheduler import QueueTimeoutError
+
+ANXIOUS = "Sınav yüzünden çok stresliyim, hiçbir şey yapamıyorum"
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    """generate_reply yerine geçen sahte Gemini; davranışı testte atanır"""
+    calls = []
+
+    class FakeGemini:
+        reply = "yanıt"
+        error = None
+
+        async def generate(self, history, message_parts, system_instruction=None, lane=None):
+            calls.append({'history': history, 'message': message_parts, 'system': system_instruction})
+            await asyncio.sleep(0.01)
+            if self.error is not None:
+                raise self.error
+            return self.reply
+
+    fake = FakeGemini()
+    fake.calls = calls
+    monkeypatch.setattr(main, "GEMINI_API_KEY", "test")
+    monkeypatch.setattr(main, "generate_reply", fake.generate)
+    return fake
+
+
+def test_queue_timeout_returns_fallback_with_triage_meta(gemini):
+    gemini.error = QueueTimeoutError("kuyruk")
+    response = asyncio.run(main.run_chat(ChatRequest(message=ANXIOUS, use_cache=False)))
+    assert response.text == main.QUOTA_FALLBACK_TEXT
+    assert response.mod == 'focus-anxiety'
+    assert response.emotional_load == main.prepare_chat(ChatRequest(message=ANXIOUS)).response_meta()['emotional_load']
+
+
+def test_fallback_without_prepared_chat_is_valid():
+    response = main.quota_fallback_response(None)
+    assert response.mod == 'academic' and response.emotional_load == 'medium'
+
+
+def test_cacheable_request_keeps_personal_context_in_prompt():
+    context = StudentContext(name="Ayşe", level="Lise", target_exam="YKS", grade=11, current_energy='low')
+    prepared = main.prepare_chat(ChatRequest(message="Türev nedir?", student_context=context))
+    other = main.prepare_chat(ChatRequest(
+        message="Türev nedir?", student_context=context.model_copy(update={'name': "Mehmet", 'current_energy': 'high'})
+    ))
+    assert prepared.cache_key is not None and prepared.cache_key == other.cache_key
+    assert "Ayşe" in prepared.system_instruction and "Mehmet" in other.system_instruction
+
+
+def test_session_skips_fallback_turns(gemini):
+    async def scenario():
+        session = await main.session_store.create()
+        gemini.error = QueueTimeoutError("kuyruk")
+        failed = await main.post_session_message(session.session_id, SessionMessageRequest(message="türev nedir"))
+        gemini.error = None
+        ok = await main.post_session_message(session.session_id, SessionMessageRequest(message="türev nedir"))
+        return failed, ok, await main.session_store.get(session.session_id)
+
+    failed, ok, session = asyncio.run(scenario())
+    assert failed.fallback and failed.turn_count == 0
+    assert not ok.fallback and ok.turn_count == 1
+    assert [(m.role, m.content) for m in session.messages] == [('user', "türev nedir"), ('model', "yanıt")]
+
+
+def test_concurrent_session_posts_are_serialized(gemini):
+    async def scenario():
+        session = await main.session_store.create()
+        await asyncio.gather(*[
+            main.post_session_message(session.session_id, SessionMessageRequest(message=f"soru {i}"))
+            for i in range(3)
+        ])
+        return await main.session_store.get(session.session_id)
+
+    session = asyncio.run(scenario())
+    assert [m.role for m in session.messages] == ['user', 'model'] * 3
+    # Her tur bir öncekinin geçmişini görür
+    assert [len(call['history']) for call in gemini.calls] == [0, 2, 4]
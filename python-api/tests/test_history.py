@@ -0,0 +1,90 @@
+"""
+VİSİ AI - Geçmiş Yönetimi Testleri
+Kayan özet oturum içinde yeniden kullanılmalı, oturumlar ve anonim istekler arasında paylaşılmamalı
+"""
+
+from history import count_tokens, message_tokens
+
+
+def conversation(prefix, turns):
+    messages = []
+    for i in range(turns):
+        messages.append({'role': 'user', 'parts': [f"{prefix} soru {i}: " + "ayrıntı " * 20]})
+        messages.append({'role': 'model', 'parts': [f"{prefix} yanıt {i}: " + "açıklama " * 20]})
+    return messages
+
+
+def test_token_estimate():
+    assert count_tokens("") == 0
+    assert count_tokens("abcd") == 1 and count_tokens("abcde") == 2
+    assert message_tokens({'role': 'user', 'parts': ["abcd" * 3, b"image"]}) == 3
+
+
+def test_short_history_is_untouched(history_manager_factory):
+    manager = history_manager_factory()
+    history = conversation("kısa", 1)
+    window = manager.window(history, "s1")
+    assert window.history == history
+    assert window.summary == "" and window.folded_messages == 0
+
+
+def test_window_fits_budget_and_starts_with_user(history_manager_factory):
+    manager = history_manager_factory()
+    window = manager.window(conversation("a", 10), "s1")
+    assert window.folded_messages > 0
+    assert window.history[0]['parts'][0].startswith("[ÖNCEKİ KONUŞMA ÖZETİ]")
+    assert window.history[2]['role'] == 'user'
+    kept = window.history[2:]
+    assert sum(message_tokens(m) for m in kept) <= manager.token_budget
+    assert window.tokens_after < window.tokens_before
+
+
+def test_session_summary_is_reused_and_matches_rebuild(history_manager_factory):
+    manager = history_manager_factory()
+    history = conversation("a", 10)
+    first = manager.window(history, "s1")
+    assert manager._summaries.stats()['hits'] == 0
+
+    longer = history + conversation("a-devam", 2)
+    second = manager.window(longer, "s1")
+    assert manager._summaries.stats()['hits'] == 1
+    assert second.folded_messages > first.folded_messages
+    assert second.summary.startswith(first.summary)
+    assert second.summary == history_manager_factory().window(longer).summary
+
+
+def test_edited_history_rebuilds_summary(history_manager_factory):
+    manager = history_manager_factory()
+    manager.window(conversation("a", 10), "s1")
+    edited = conversation("b", 12)
+    window = manager.window(edited, "s1")
+    assert window.summary == history_manager_factory().window(edited).summary
+    assert "a soru" not in window.summary
+
+
+def test_sessions_do_not_share_summaries(history_manager_factory):
+    manager = history_manager_factory()
+    # Aynı açılış mesajı, farklı devam
+    first = conversation("ortak", 1) + conversation("x", 9)
+    second = conversation("ortak", 1) + conversation("y", 9)
+    manager.window(first, "s1")
+    window = manager.window(second, "s2")
+    assert "x soru" not in window.summary
+    assert window.summary == history_manager_factory().window(second).summary
+
+
+def test_anonymous_requests_bypass_summary_cache(history_manager_factory):
+    manager = history_manager_factory()
+    first = conversation("ortak", 1) + conversation("x", 9)
+    second = conversation("ortak", 1) + conversation("y", 9)
+    manager.window(first)
+    window = manager.window(second)
+    assert "x soru" not in window.summary
+    assert len(manager._summaries) == 0
+
+
+def test_forget_drops_session_state(history_manager_factory):
+    manager = history_manager_factory()
+    manager.window(conversation("a", 10), "s1")
+    manager.forget("s1")
+    assert len(manager._summaries) == 0
@@ -0,0 +1,147 @@
+"""
+VİSİ AI - Görsel Soru Önbelleği Testleri
+Kapsam ayrımı, eşik içi yakın eşleşme ve yazı yoğun görsellerde 16x16 hash
+"""
+
+import io
+import random
+
+import pytest
+
+from image_cache import HASH_BITS, TEXT_HASH_BITS, hamming
+from models import ChatMessage, ChatRequest, StudentContext, StudentProfile
+
+BASE = 0x0F0F_F0F0_1234_5678
+TEXT_BASE = random.Random(14).getrandbits(TEXT_HASH_BITS)
+
+
+def flip(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def test_scope_separates_question_level_and_lgs(image_cache_factory):
+    cache = image_cache_factory()
+    lise = StudentContext(level="Lise", target_exam="YKS")
+    scopes = {
+        cache.scope("Bu soruyu çöz", 'academic', lise),
+        cache.scope("2. soruyu çöz", 'academic', lise),
+        cache.scope("Bu soruyu çöz", 'academic', StudentContext(level="Lise", target_exam="YKS", grade=8)),
+        cache.scope("Bu soruyu çöz", 'academic', StudentContext(level="Lise", target_exam="TYT")),
+        cache.scope("Bu soruyu çöz", 'academic', None),
+        cache.scope("Bu soruyu çöz", 'coach', lise),
+    }
+    assert len(scopes) == 6
+    assert cache.scope("BU SORUYU ÇÖZ?", 'academic', lise) == cache.scope("bu soruyu çöz", 'academic', lise)
+
+
+def test_accepts_only_history_free_shared_requests(image_cache_factory):
+    cache = image_cache_factory()
+    cache.enabled = True  # Pillow olmadan da koşullar sınanabilsin
+    request = ChatRequest(message="çöz")
+    assert cache.accepts(request, 0)
+    assert not cache.accepts(request, 2)
+    assert not cache.accepts(ChatRequest(message="çöz", use_cache=False), 0)
+    profile = StudentProfile(student_id="s1", name="Ayşe", level="Lise")
+    assert not cache.accepts(ChatRequest(message="çöz", student_data=profile), 0)
+    with_history = ChatRequest(message="çöz", history=[ChatMessage(role='user', content="merhaba")])
+    assert not cache.accepts(with_history, len(with_history.history))
+
+
+def test_near_match_within_threshold_only_in_same_scope(image_cache_factory):
+    cache = image_cache_factory(threshold=6)
+    scope = cache.scope("çöz", 'academic', None)
+    other = cache.scope("açıkla", 'academic', None)
+    cache.set((HASH_BITS, BASE), scope, "çözüm")
+
+    assert cache.get((HASH_BITS, BASE), scope) == "çözüm"
+    near = flip(BASE, range(5))
+    assert hamming(near, BASE) == 5
+    assert cache.get((HASH_BITS, near), scope) == "çözüm"
+    assert cache.get((HASH_BITS, flip(BASE, range(7))), scope) is None
+    assert cache.get((HASH_BITS, BASE), other) is None
+    assert (cache.exact_hits, cache.near_hits) == (1, 1)
+
+
+def test_nearest_candidate_wins(image_cache_factory):
+    cache = image_cache_factory(threshold=10)
+    scope = cache.scope("çöz", 'academic', None)
+    far = flip(BASE, range(8))
+    cache.set((HASH_BITS, BASE), scope, "yakın")
+    cache.set((HASH_BITS, far), scope, "uzak")
+    assert cache.get((HASH_BITS, flip(BASE, [0, 1])), scope) == "yakın"
+    assert cache.get((HASH_BITS, flip(far, [20])), scope) == "uzak"
+
+
+def test_text_hashes_use_their_own_threshold_and_index(image_cache_factory):
+    cache = image_cache_factory(threshold=6, text_threshold=32)
+    scope = cache.scope("çöz", 'academic', None)
+    cache.set((TEXT_HASH_BITS, TEXT_BASE), scope, "sayfa çözümü")
+
+    assert cache.get((TEXT_HASH_BITS, flip(TEXT_BASE, range(0, 256, 8))), scope) == "sayfa çözümü"
+    assert cache.get((TEXT_HASH_BITS, flip(TEXT_BASE, range(0, 99, 3))), scope) is None
+    # Aynı sayı değeri 64 bitlik hash olarak gelse de 256 bitlik kayıtla karşılaştırılmaz
+    assert cache.get((HASH_BITS, TEXT_BASE & (2 ** HASH_BITS - 1)), scope) is None
+    assert set(cache._index) == {(scope, TEXT_HASH_BITS)}
+
+
+def test_eviction_cleans_index(image_cache_factory):
+    cache = image_cache_factory(maxsize=2)
+    scope = cache.scope("çöz", 'academic', None)
+    for value, text in [(1, "bir"), (2, "iki"), (3, "üç")]:
+        cache.set((HASH_BITS, value), scope, text)
+    assert cache._index[(scope, HASH_BITS)] == {2, 3}
+
+
+# ============================================================================
+# PARMAK İZİ (Pillow gerekir)
+# ============================================================================
+
+def _encode(image, format='PNG', **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **options)
+    return buffer.getvalue()
+
+
+def _page(seed):
+    from PIL import Image, ImageDraw, ImageFont
+    rng = random.Random(seed)
+    words = ["Soru", "x^2", "+", "3x", "=", "ise", "kaçtır?", "A)", "B)", "türev", "integral", "göre"]
+    page = Image.new('L', (800, 1000), 255)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=22)
+    for row in range(20):
+        draw.text((30, 30 + row * 45), " ".join(rng.choice(words) for _ in range(10)), fill=0, font=font)
+    return page
+
+
+def test_fingerprint_kind_follows_text_density(image_cache_factory):
+    pytest.importorskip("PIL")
+    from PIL import Image, ImageDraw
+
+    cache = image_cache_factory()
+    shape = Image.new('L', (400, 300), 255)
+    ImageDraw.Draw(shape).ellipse((100, 50, 300, 250), fill=0)
+    bits, _ = cache.fingerprint(_encode(shape))
+    assert bits == HASH_BITS
+
+    bits, _ = cache.fingerprint(_encode(_page(1)))
+    assert bits == TEXT_HASH_BITS
+    assert cache.text_dense == 1
+
+
+def test_rephotographed_page_hits_other_page_misses(image_cache_factory):
+    pytest.importorskip("PIL")
+    from PIL import ImageEnhance
+
+    cache = image_cache_factory()
+    scope = cache.scope("3. soruyu çöz", 'academic', None)
+    page = _page(1)
+    cache.set(cache.fingerprint(_encode(page)), scope, "çözüm")
+
+    # Farklı kadraj, ışık ve JPEG sıkıştırmasıyla yeniden çekilmiş aynı sayfa
+    width, height = page.size
+    rephoto = ImageEnhance.Brightness(page.crop((12, 20, width - 15, height - 8))).enhance(0.85)
+    assert cache.get(cache.fingerprint(_encode(rephoto, 'JPEG', quality=60)), scope) == "çözüm"
+    assert cache.get(cache.fingerprint(_encode(_page(2))), scope) is None
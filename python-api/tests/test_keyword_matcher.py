@@ -0,0 +1,58 @@
+"""
+VİSİ AI - Anahtar Kelime Eşleştirici Testleri
+Aho-Corasick taraması eski `k in text` alt dize sayımıyla aynı sonucu vermeli
+"""
+
+import random
+
+from keyword_matcher import KeywordMatcher
+from keywords import KEYWORD_CATEGORIES, scan_keywords, turkish_lower
+
+
+def substring_count(words, text):
+    """Eski mantık: listedeki her kelime metinde geçiyorsa bir sayılır"""
+    return sum(1 for k in words if k in text)
+
+
+def substring_terms(words, text):
+    return [k for k in dict.fromkeys(words) if k in text]
+
+
+def test_counts_match_substring_logic_on_keyword_mixes():
+    rng = random.Random(8)
+    vocabulary = [w for words in KEYWORD_CATEGORIES.values() for w in words]
+    fillers = ["bugün", "ders", "çalıştım", "ama", "ve", "çok", "bir", "şey", "."]
+    for _ in range(300):
+        parts = rng.sample(vocabulary, rng.randint(0, 6)) + rng.sample(fillers, rng.randint(0, 5))
+        rng.shuffle(parts)
+        text = turkish_lower(" ".join(parts))
+
+        hits = scan_keywords(text)
+        for category, words in KEYWORD_CATEGORIES.items():
+            assert hits.count(category) == substring_count(words, text), (category, text)
+            assert hits.terms(category) == substring_terms(words, text), (category, text)
+
+
+def test_overlapping_and_nested_terms():
+    matcher = KeywordMatcher({'a': ['he', 'she', 'his', 'hers'], 'b': ['ş', 'şşş']})
+    text = "ushers şşş"
+    hits = matcher.scan(text)
+    assert hits.count('a') == substring_count(['he', 'she', 'his', 'hers'], text) == 3
+    assert hits.terms('a') == ['he', 'she', 'hers']
+    assert hits.count('b') == 2
+    assert hits.first('b') == 'ş'
+
+
+def test_duplicate_words_count_like_the_old_loop():
+    """Listede iki kez geçen kelime eski sayımda iki kez sayılıyordu"""
+    words = ['sınav', 'stres', 'sınav']
+    hits = KeywordMatcher({'x': words}).scan("sınav stresi")
+    assert hits.count('x') == substring_count(words, "sınav stresi") == 3
+    assert hits.terms('x') == ['sınav', 'stres']
+
+
+def test_no_match():
+    hits = KeywordMatcher({'x': ['kaygı']}).scan("merhaba")
+    assert hits.count('x') == 0
+    assert hits.terms('x') == []
+    assert hits.first('x') is None
@@ -0,0 +1,174 @@
+"""
+VİSİ AI - Profil Deposu Testleri
+Tek satırlık sınav/konu güncellemeleri, önbellek-veritabanı tutarlılığı ve kayıt sayacı
+"""
+
+import asyncio
+import sqlite3
+
+import pytest
+from pydantic import ValidationError
+
+from models import (
+    ExamResult, StudentProfile, StudentProfileUpdate, SubjectResult, TopicPerformance
+)
+from profiles import ProfileStore
+from student_data import analyze_student_performance
+
+
+def exam(exam_id, date, net):
+    return ExamResult(
+        exam_id=exam_id, exam_type="TYT", date=date, total_net=net,
+        subject_results=[
+            SubjectResult(subject="Matematik", net=net / 2, success_rate=net),
+            SubjectResult(subject="Türkçe", net=net / 2, success_rate=net / 2),
+        ]
+    )
+
+
+def topic(subject, name, rate):
+    return TopicPerformance(subject=subject, topic=name, success_rate=rate)
+
+
+def profile(student_id="s1", exams=()):
+    return StudentProfile(student_id=student_id, name="Ayşe", level="Lise", recent_exams=list(exams))
+
+
+def fresh_analysis(db_path, student_id):
+    """Önbelleksiz, veritabanından baştan kurulan analiz"""
+    store = ProfileStore(db_path)
+    try:
+        loaded = asyncio.run(store.get(student_id))
+        return loaded, analyze_student_performance(loaded)
+    finally:
+        store.close()
+
+
+def test_add_exam_keeps_order_and_matches_database(profile_store, db_path):
+    async def scenario():
+        await profile_store.put(profile(exams=[exam("e1", "2024-01-10", 40), exam("e2", "2024-02-10", 50)]))
+        cached = await profile_store.get("s1")
+        analyze_student_performance(cached)  # toplamlar oluşsun
+        await profile_store.add_exam("s1", exam("e3", "2024-03-10", 60))  # en yeni: artımlı
+        await profile_store.add_exam("s1", exam("e0", "2023-12-10", 30))  # geçmişe dönük: yeniden kurulur
+        await profile_store.add_exam("s1", exam("e2", "2024-02-10", 55))  # düzeltme
+        return await profile_store.get("s1")
+
+    cached = asyncio.run(scenario())
+    assert [e.exam_id for e in cached.recent_exams] == ["e3", "e2", "e1", "e0"]
+    assert cached.recent_exams[1].total_net == 55
+
+    loaded, analysis = fresh_analysis(db_path, "s1")
+    assert loaded.recent_exams == cached.recent_exams
+    assert analyze_student_performance(cached) == analysis
+    assert profile_store.exam_writes == 3
+
+
+def test_incremental_aggregates_match_rebuild(profile_store, db_path):
+    async def scenario():
+        await profile_store.put(profile(exams=[exam("e1", "2024-01-10", 40)]))
+        cached = await profile_store.get("s1")
+        analyze_student_performance(cached)
+        for month in range(2, 10):
+            await profile_store.add_exam("s1", exam(f"e{month}", f"2024-{month:02d}-10", 40 + month * 3.3))
+        return cached
+
+    cached = asyncio.run(scenario())
+    assert cached._aggregates is not None
+    _, analysis = fresh_analysis(db_path, "s1")
+    assert analyze_student_performance(cached) == analysis
+
+
+def test_upsert_topic(profile_store, db_path):
+    async def scenario():
+        await profile_store.put(profile())
+        await profile_store.upsert_topic("s1", topic("Matematik", "Türev", 40))
+        await profile_store.upsert_topic("s1", topic("Fizik", "Kuvvet", 70))
+        await profile_store.upsert_topic("s1", topic("Matematik", "Türev", 65))
+        return await profile_store.get("s1")
+
+    cached = asyncio.run(scenario())
+    assert [(t.topic, t.success_rate) for t in cached.topic_performance] == [("Türev", 65), ("Kuvvet", 70)]
+    loaded, _ = fresh_analysis(db_path, "s1")
+    assert sorted(loaded.topic_performance, key=lambda t: t.topic) == sorted(
+        cached.topic_performance, key=lambda t: t.topic
+    )
+
+
+def test_failed_write_leaves_cache_untouched(profile_store, monkeypatch):
+    def fail(*_args):
+        raise sqlite3.OperationalError("database is locked")
+
+    async def scenario():
+        await profile_store.put(profile(exams=[exam("e1", "2024-01-10", 40)]))
+        cached = await profile_store.get("s1")
+        analyze_student_performance(cached)
+        aggregates = cached._aggregates
+        monkeypatch.setattr(profile_store, "_write_exam", fail)
+        monkeypatch.setattr(profile_store, "_write_topic", fail)
+        with pytest.raises(sqlite3.OperationalError):
+            await profile_store.add_exam("s1", exam("e2", "2024-02-10", 50))
+        with pytest.raises(sqlite3.OperationalError):
+            await profile_store.upsert_topic("s1", topic("Fizik", "Kuvvet", 70))
+        return cached, aggregates
+
+    cached, aggregates = asyncio.run(scenario())
+    assert [e.exam_id for e in cached.recent_exams] == ["e1"]
+    assert cached.topic_performance == []
+    assert cached._aggregates is aggregates
+    assert profile_store.exam_writes == 0 and profile_store.topic_writes == 0
+
+
+def test_profile_counter_tracks_puts_and_deletes(profile_store, db_path):
+    async def scenario():
+        await profile_store.put(profile("s1"))
+        await profile_store.put(profile("s2"))
+        await profile_store.put(profile("s1"))  # güncelleme sayılmaz
+        assert profile_store.stats()['profiles'] == 2
+        assert await profile_store.delete("s1") is True
+        assert await profile_store.delete("yok") is False
+
+    asyncio.run(scenario())
+    assert profile_store.stats()['profiles'] == 1
+
+    reopened = ProfileStore(db_path)
+    assert reopened.stats()['profiles'] == 1
+    reopened.close()
+
+
+def test_missing_student(profile_store):
+    async def scenario():
+        assert await profile_store.get("yok") is None
+        assert await profile_store.add_exam("yok", exam("e1", "2024-01-10", 40)) is None
+        assert await profile_store.upsert_topic("yok", topic("M", "T", 1)) is None
+        assert await profile_store.update_fields("yok", {'name': "X"}) is None
+
+    asyncio.run(scenario())
+
+
+def test_update_rejects_null_required_fields():
+    assert StudentProfileUpdate(current_energy=None).model_dump(exclude_unset=True) == {'current_energy': None}
+    for field in ('name', 'level'):
+        with pytest.raises(ValidationError):
+            StudentProfileUpdate(**{field: None})
+
+
+def test_concurrent_field_update_and_exam_keep_both(profile_store):
+    async def scenario():
+        await profile_store.put(profile(exams=[exam("e1", "2024-01-10", 40)]))
+        analyze_student_performance(await profile_store.get("s1"))
+        await asyncio.gather(
+            profile_store.update_fields("s1", {'name': "Ayşe Y.", 'grade': 12}),
+            profile_store.add_exam("s1", exam("e2", "2024-02-10", 50)),
+            profile_store.upsert_topic("s1", topic("Fizik", "Kuvvet", 70)),
+            profile_store.update_fields("s1", {'target_exam': "YKS"}),
+        )
+        return await profile_store.get("s1")
+
+    cached = asyncio.run(scenario())
+    assert (cached.name, cached.grade, cached.target_exam) == ("Ayşe Y.", 12, "YKS")
+    assert [e.exam_id for e in cached.recent_exams] == ["e2", "e1"]
+    assert [t.topic for t in cached.topic_performance] == ["Kuvvet"]
+    assert cached._aggregates is None or cached._aggregates.matches(cached.recent_exams)
+    rebuilt = StudentProfile(**cached.model_dump())
+    assert analyze_student_performance(cached) == analyze_student_performance(rebuilt)
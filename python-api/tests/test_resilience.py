@@ -0,0 +1,168 @@
+"""
+VİSİ AI - Dayanıklılık Katmanı Testleri
+Yeniden deneme sınıflandırması, devre kesici geçişleri ve yeniden deneme döngüsü
+"""
+
+import asyncio
+import time
+
+import grpc
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from conftest import FakeRpcError
+from resilience import (
+    STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, CircuitBreaker, CircuitOpenError,
+    LLMTimeoutError, is_retryable
+)
+
+
+@pytest.mark.parametrize("error", [
+    LLMTimeoutError("zaman aşımı"),
+    asyncio.TimeoutError(),
+    ConnectionResetError(),
+    google_exceptions.InternalServerError("iç hata"),
+    google_exceptions.BadGateway("ağ geçidi"),
+    google_exceptions.ServiceUnavailable("meşgul"),
+    google_exceptions.GatewayTimeout("geç"),
+    google_exceptions.DeadlineExceeded("süre"),
+    FakeRpcError(grpc.StatusCode.UNAVAILABLE),
+    FakeRpcError(grpc.StatusCode.DEADLINE_EXCEEDED),
+])
+def test_transient_errors_are_retryable(error):
+    assert is_retryable(error)
+
+
+@pytest.mark.parametrize("error", [
+    google_exceptions.ResourceExhausted("429 kota"),
+    google_exceptions.InvalidArgument("geçersiz"),
+    google_exceptions.PermissionDenied("yetki"),
+    google_exceptions.MethodNotImplemented("501"),
+    FakeRpcError(grpc.StatusCode.INVALID_ARGUMENT),
+    # Mesajdaki sayılar durum kodu sayılmaz
+    ValueError("Yanıt 500 karakteri geçti"),
+    Exception("503 Service Unavailable"),
+])
+def test_permanent_errors_are_not_retryable(error):
+    assert not is_retryable(error)
+
+
+def test_breaker_opens_after_threshold_and_short_circuits():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    with pytest.raises(CircuitOpenError) as info:
+        breaker.before_call()
+    assert 0 < info.value.retry_after <= 60
+    assert breaker.stats()['opened'] == 1
+    assert breaker.stats()['short_circuited'] == 1
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+
+
+def test_half_open_allows_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.02)
+    breaker.record_failure()
+    time.sleep(0.03)
+
+    breaker.before_call()
+    assert breaker.state == STATE_HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+    breaker.before_call()
+    breaker.before_call()
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=0.02)
+    for _ in range(5):
+        breaker.record_failure()
+    time.sleep(0.03)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert breaker.stats()['opened'] == 2
+
+
+def test_released_probe_lets_next_call_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.02)
+    breaker.record_failure()
+    time.sleep(0.03)
+    breaker.before_call()
+    breaker.release_probe()
+    assert breaker.state == STATE_HALF_OPEN
+    breaker.before_call()
+
+
+def test_zero_threshold_disables_breaker():
+    breaker = CircuitBreaker(failure_threshold=0, reset_timeout=60)
+    for _ in range(50):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+
+
+def test_call_retries_transient_errors_then_succeeds(resilience_factory):
+    resilience = resilience_factory()
+    attempts = []
+
+    async def attempt():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise google_exceptions.ServiceUnavailable("meşgul")
+        return "tamam"
+
+    assert asyncio.run(resilience.call(attempt)) == "tamam"
+    stats = resilience.stats()
+    assert (stats['calls'], stats['attempts'], stats['retries'], stats['failures']) == (1, 3, 2, 0)
+    assert stats['circuit']['consecutive_failures'] == 0
+
+
+def test_call_gives_up_after_max_retries(resilience_factory):
+    resilience = resilience_factory(max_retries=1)
+
+    async def attempt():
+        raise google_exceptions.InternalServerError("iç hata")
+
+    with pytest.raises(google_exceptions.InternalServerError):
+        asyncio.run(resilience.call(attempt))
+    assert resilience.attempts == 2 and resilience.failures == 1
+
+
+def test_call_does_not_retry_or_trip_on_client_errors(resilience_factory):
+    resilience = resilience_factory(threshold=1)
+
+    async def attempt():
+        raise google_exceptions.ResourceExhausted("429 kota")
+
+    with pytest.raises(google_exceptions.ResourceExhausted):
+        asyncio.run(resilience.call(attempt))
+    assert resilience.attempts == 1
+    assert resilience.breaker.state == STATE_CLOSED
+
+
+def test_timed_raises_llm_timeout(resilience_factory):
+    resilience = resilience_factory()
+
+    async def attempt():
+        return await resilience.timed(asyncio.sleep(1))
+
+    with pytest.raises(LLMTimeoutError):
+        asyncio.run(resilience.call(attempt))
+    assert resilience.timeouts == 3
+    assert resilience.attempts == 3
@@ -0,0 +1,55 @@
+"""
+VİSİ AI - Yanıt Önbelleği Testleri
+Anahtar, prompt'u değiştiren her alanla ayrışmalı; kişisel alanlarla ayrışmamalı
+"""
+
+import pytest
+
+from models import StudentContext
+from response_cache import normalize_question
+
+CALM = {'dominant_emotion': 'neutral', 'emotional_load': 'low'}
+
+
+@pytest.fixture
+def key(response_cache):
+    """Varsayılanları doldurulmuş make_key"""
+    def build(message="Türev nedir?", mod='academic', context=None, emotional=CALM, ready=True):
+        return response_cache.make_key(message, mod, context, emotional, ready)
+    return build
+
+
+def test_normalize_question():
+    assert normalize_question("  TÜREV   Nedir?? ") == normalize_question("türev nedir")
+    assert normalize_question("İntegral nedir?") == "integral nedir"
+
+
+def test_key_ignores_personal_fields(key):
+    a = StudentContext(name="Ayşe", level="Lise", target_exam="YKS", grade=11, goals=["tıp"])
+    b = StudentContext(name="Mehmet", level="Lise", target_exam="YKS", grade=11)
+    assert key(context=a) == key(context=b)
+    assert key("türev NEDİR") == key("Türev nedir?")
+
+
+def test_key_scoped_by_prompt_inputs(key):
+    lise = StudentContext(level="Lise", target_exam="YKS", grade=11)
+    keys = {
+        key(context=lise),
+        key(context=StudentContext(level="Lise", target_exam="YKS", grade=8)),
+        key(context=StudentContext(level="Ortaokul", target_exam="YKS", grade=11)),
+        key(context=StudentContext(level="Lise", target_exam="TYT", grade=11)),
+        key(context=None),
+        key("İntegral nedir?", context=lise),
+        key(mod='coach', context=lise),
+        key(context=lise, emotional={'dominant_emotion': 'anxiety', 'emotional_load': 'high'}),
+        key(context=lise, ready=False),
+    }
+    assert len(keys) == 9
+
+
+def test_get_set_roundtrip(response_cache, key):
+    assert response_cache.get(key()) is None
+    response_cache.set(key(), "yanıt")
+    response_cache.set(key("boş"), "")
+    assert response_cache.get(key()) == "yanıt"
+    assert response_cache.get(key("boş")) is None
@@ -0,0 +1,191 @@
+"""
+VİSİ AI - Kota Zamanlayıcısı Testleri
+Şerit önceliği, şerit içi sıra, kuyruk zaman aşımı ve kota kısıtları
+"""
+
+import asyncio
+import time
+
+import grpc
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from conftest import FakeRpcError
+from scheduler import (
+    LANE_CRITICAL, LANE_STANDARD, LANE_SUPPORT, Admission, QueueTimeoutError, is_quota_error, lane_for
+)
+
+
+async def admit_in_order(scheduler, requests):
+    """İlk yeri tut, istekleri sıraya sok, sonra yerleri tek tek boşalt"""
+    order = []
+    holder = await scheduler.acquire(LANE_STANDARD, 1)
+
+    async def worker(name, lane):
+        ticket = await scheduler.acquire(lane, 1)
+        order.append(name)
+        await asyncio.sleep(0)
+        scheduler.release(ticket)
+
+    tasks = []
+    for name, lane in requests:
+        tasks.append(asyncio.create_task(worker(name, lane)))
+        await asyncio.sleep(0)
+    scheduler.release(holder)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_lane_for():
+    assert lane_for('safe-support') == LANE_CRITICAL
+    assert lane_for('academic', 'critical') == LANE_CRITICAL
+    assert lane_for('focus-anxiety') == LANE_SUPPORT
+    assert lane_for('academic') == LANE_STANDARD
+
+
+def test_higher_lanes_admitted_first_fifo_within_lane(scheduler_factory):
+    scheduler = scheduler_factory()
+    order = asyncio.run(admit_in_order(scheduler, [
+        ('std-1', LANE_STANDARD),
+        ('sup-1', LANE_SUPPORT),
+        ('crit-1', LANE_CRITICAL),
+        ('std-2', LANE_STANDARD),
+        ('crit-2', LANE_CRITICAL),
+    ]))
+    assert order == ['crit-1', 'crit-2', 'sup-1', 'std-1', 'std-2']
+    assert scheduler.stats()['in_flight'] == 0
+
+
+def test_queue_timeout(scheduler_factory):
+    async def scenario():
+        scheduler = scheduler_factory(queue_timeout=0.05)
+        holder = await scheduler.acquire(LANE_STANDARD, 1)
+        with pytest.raises(QueueTimeoutError):
+            await scheduler.acquire(LANE_CRITICAL, 1)
+        scheduler.release(holder)
+        # Zaman aşımına uğrayan bekleyen yer tutmaz
+        ticket = await scheduler.acquire(LANE_STANDARD, 1)
+        scheduler.release(ticket)
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats['timeouts'] == 1
+    assert stats['in_flight'] == 0
+    assert stats['queue_depth'] == {'critical': 0, 'support': 0, 'standard': 0}
+
+
+def test_rpm_limit_holds_next_request(scheduler_factory):
+    async def scenario():
+        scheduler = scheduler_factory(max_concurrency=4, rpm_limit=1, queue_timeout=0.05)
+        ticket = await scheduler.acquire(LANE_CRITICAL, 1)
+        scheduler.release(ticket)
+        with pytest.raises(QueueTimeoutError):
+            await scheduler.acquire(LANE_CRITICAL, 1)
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.throttled >= 1
+    assert scheduler.stats()['requests_last_minute'] == 1
+
+
+def test_tpm_accounts_actual_usage(scheduler_factory):
+    async def scenario():
+        scheduler = scheduler_factory(tpm_limit=100, queue_timeout=0.05)
+        ticket = await scheduler.acquire(LANE_STANDARD, 40)
+        scheduler.release(ticket, output_tokens=50)
+        assert scheduler.stats()['tokens_last_minute'] == 90
+        with pytest.raises(QueueTimeoutError):
+            await scheduler.acquire(LANE_STANDARD, 20)
+        ticket = await scheduler.acquire(LANE_STANDARD, 10)
+        scheduler.release(ticket)
+
+    asyncio.run(scenario())
+
+
+def test_quota_error_pauses_admission(scheduler_factory):
+    async def scenario():
+        scheduler = scheduler_factory(queue_timeout=0.05)
+        ticket = await scheduler.acquire(LANE_STANDARD, 1)
+        scheduler.release(ticket, error=google_exceptions.ResourceExhausted("kota"))
+        with pytest.raises(QueueTimeoutError):
+            await scheduler.acquire(LANE_CRITICAL, 1)
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats['quota_errors'] == 1
+    assert stats['paused'] is True
+
+
+@pytest.mark.parametrize("error, expected", [
+    (google_exceptions.ResourceExhausted("kota"), True),
+    (google_exceptions.TooManyRequests("çok istek"), True),
+    (FakeRpcError(grpc.StatusCode.RESOURCE_EXHAUSTED), True),
+    (FakeRpcError(grpc.StatusCode.UNAVAILABLE), False),
+    # Mesajdaki sayılar / kelimeler kota hatası sayılmaz
+    (ValueError("Soru 429. sayfada"), False),
+    (Exception("Quota: günde 5 deneme"), False),
+    (google_exceptions.InvalidArgument("429 karakter sınırı"), False),
+])
+def test_is_quota_error_by_type(error, expected):
+    assert is_quota_error(error) is expected
+
+
+def test_message_with_429_does_not_pause_admission(scheduler_factory):
+    async def scenario():
+        scheduler = scheduler_factory(queue_timeout=0.05)
+        ticket = await scheduler.acquire(LANE_STANDARD, 1)
+        scheduler.release(ticket, error=ValueError("Yanıt 429 token'ı geçti"))
+        ticket = await scheduler.acquire(LANE_CRITICAL, 1)
+        scheduler.release(ticket)
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats['quota_errors'] == 0 and stats['paused'] is False
+
+
+def test_requeued_request_keeps_its_place_after_cooldown(scheduler_factory):
+    async def scenario():
+        scheduler = scheduler_factory(queue_timeout=2, quota_cooldown=0.05)
+        admission = Admission(LANE_STANDARD, 1)
+        ticket = await scheduler.acquire(LANE_STANDARD, 1, admission)
+
+        # Sonra gelen aynı şeritteki istek, kota hatası alanın önüne geçmemeli
+        later = asyncio.create_task(scheduler.acquire(LANE_STANDARD, 1))
+        await asyncio.sleep(0)
+        error = google_exceptions.ResourceExhausted("kota")
+        scheduler.release(ticket, error=error)
+        assert scheduler.requeue(admission, error)
+
+        started = time.monotonic()
+        retried = await scheduler.acquire(LANE_STANDARD, 1, admission)
+        waited = time.monotonic() - started
+        assert not later.done()
+        scheduler.release(retried)
+        scheduler.release(await later)
+        return scheduler, waited
+
+    scheduler, waited = asyncio.run(scenario())
+    assert waited >= 0.04
+    stats = scheduler.stats()
+    assert (stats['requeued'], stats['quota_errors'], stats['in_flight']) == (1, 1, 0)
+
+
+def test_requeue_respects_remaining_deadline(scheduler_factory):
+    async def scenario():
+        scheduler = scheduler_factory(queue_timeout=0.1, quota_cooldown=5)
+        admission = Admission(LANE_CRITICAL, 1)
+        ticket = await scheduler.acquire(LANE_CRITICAL, 1, admission)
+        error = google_exceptions.ResourceExhausted("kota")
+        scheduler.release(ticket, error=error)
+        assert not scheduler.requeue(admission, ValueError("geçersiz istek"))
+        await asyncio.sleep(0.06)
+        assert scheduler.requeue(admission, error)
+
+        started = time.monotonic()
+        with pytest.raises(QueueTimeoutError):
+            await scheduler.acquire(LANE_CRITICAL, 1, admission)
+        # Süre ilk girişten sayılır; yeniden girişte baştan başlamaz
+        assert time.monotonic() - started < 0.08
+        assert not scheduler.requeue(admission, error)
+
+    asyncio.run(scenario())
@@ -0,0 +1,68 @@
+"""
+VİSİ AI - Performans Toplamları Testleri
+Artımlı toplamlar baştan kurulanla aynı sonucu vermeli; ortalama tek yuvarlamayla hesaplanmalı
+"""
+
+import random
+from fractions import Fraction
+
+from models import ExamResult, StudentProfile, SubjectResult
+from student_data import PerformanceAggregates, _Series, analyze_student_performance, calculate_trend
+
+SUBJECTS = ["Matematik", "Türkçe", "Fen", "Sosyal"]
+
+
+def random_exam(rng, index):
+    return ExamResult(
+        exam_id=f"e{index}", exam_type="TYT", date=f"2024-{index:04d}",
+        total_net=round(rng.uniform(10, 110), 2),
+        subject_results=[
+            SubjectResult(
+                subject=subject, correct=rng.randint(0, 40), wrong=rng.randint(0, 10),
+                net=round(rng.uniform(-2, 40) * 4) / 4, success_rate=round(rng.uniform(0, 100), 1)
+            )
+            for subject in rng.sample(SUBJECTS, rng.randint(1, len(SUBJECTS)))
+        ]
+    )
+
+
+def test_series_mean_rounds_once():
+    series = _Series()
+    values = [0.1] * 7 + [46.05, 33.35]
+    for value in values:
+        series.append(value)
+    assert series.mean() == float(sum(map(Fraction, values)) / len(values))
+    assert (series.min, series.max, series.oldest, series.newest) == (0.1, 46.05, 0.1, 33.35)
+
+
+def test_series_trend_matches_calculate_trend():
+    rng = random.Random(16)
+    for _ in range(200):
+        values = [rng.uniform(0, 100) for _ in range(rng.randint(0, 12))]
+        series = _Series()
+        for value in values:
+            series.append(value)
+        # calculate_trend yeniden eskiye sıralı liste alır
+        assert series.trend() == calculate_trend(values[::-1])
+
+
+def test_incremental_aggregates_match_rebuild():
+    rng = random.Random(7)
+    exams = [random_exam(rng, i) for i in range(40)]
+    aggregates = PerformanceAggregates()
+    for count, exam in enumerate(exams, 1):
+        aggregates.add_exam(exam)
+        newest_first = exams[:count][::-1]
+        assert aggregates.analysis() == PerformanceAggregates.from_exams(newest_first).analysis()
+
+
+def test_analysis_reuses_profile_aggregates():
+    rng = random.Random(3)
+    profile = StudentProfile(
+        student_id="s1", name="Ayşe", level="Lise",
+        recent_exams=[random_exam(rng, i) for i in range(10)][::-1]
+    )
+    first = analyze_student_performance(profile)
+    aggregates = profile._aggregates
+    assert analyze_student_performance(profile) == first
+    assert profile._aggregates is aggregates
@@ -0,0 +1,184 @@
+"""
+VİSİ AI - İstek İzleri
+Her chat isteğine iz kimliği ve aşama süreleri; Server-Timing başlığı ve örneklenmiş JSONL kaydı
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence
+
+from config import (
+    TRACE_PATHS, TRACE_LOG_PATH, TRACE_LOG_MAX_BYTES, TRACE_LOG_BACKUPS,
+    TRACE_SAMPLE_RATE, TRACE_SLOW_MS
+)
+from metrics import RequestTimer, bind_timer, unbind_timer
+
+TRACE_HEADER = "x-trace-id"
+# Dışarıdan gelen kimlik yalnızca güvenli karakterlerle kabul edilir (log/başlık enjeksiyonu yok)
+_TRACE_ID_RE = re.compile(r"^[A-Za-z0-9\-]{8,64}$")
+# Server-Timing metrik adı token olmalı
+_TOKEN_RE = re.compile(r"[^A-Za-z0-9_\-.]")
+
+
+def server_timing(timer: RequestTimer, total: float) -> str:
+    """Aşamaları Server-Timing başlık değerine çevir (ms)"""
+    entries = [f"{_TOKEN_RE.sub('_', name)};dur={duration * 1000:.2f}" for name, _, duration in timer.spans]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class TraceLog:
+    """Örneklenmiş izleri JSON satırı olarak dönen dosyaya yazar
+
+    Yazma ayrı bir iş parçacığında yapılır (QueueListener); istek yolu
+    yalnızca kuyruğa ekler.
+    """
+
+    def __init__(
+        self,
+        path: str = TRACE_LOG_PATH,
+        max_bytes: int = TRACE_LOG_MAX_BYTES,
+        backups: int = TRACE_LOG_BACKUPS,
+        sample_rate: float = TRACE_SAMPLE_RATE,
+        slow_ms: int = TRACE_SLOW_MS
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.written = 0
+        self.sampled_out = 0
+        self._logger: Optional[logging.Logger] = None
+        self._listener: Optional[logging.handlers.QueueListener] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def start(self) -> None:
+        if not self.enabled or self._listener is not None:
+            return
+        try:
+            handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8"
+            )
+        except OSError as e:
+            print(f"İz dosyası açılamadı ({self.path}): {e}")
+            self.path = ""
+            return
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(records, handler)
+        self._listener.start()
+
+        self._logger = logging.getLogger("visi.trace")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.handlers = [logging.handlers.QueueHandler(records)]
+
+    def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+            self._logger = None
+
+    def should_write(self, duration_ms: float, status: int) -> bool:
+        """Yavaş / sunucu hatalı istekler her zaman, diğerleri örnekleme oranıyla"""
+        if status >= 500 or (self.slow_ms and duration_ms >= self.slow_ms):
+            return True
+        return random.random() < self.sample_rate
+
+    def write(self, record: Dict) -> None:
+        if self._logger is None:
+            return
+        self._logger.info(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        self.written += 1
+
+    def stats(self) -> Dict:
+        return {
+            'path': self.path or None,
+            'sample_rate': self.sample_rate,
+            'slow_ms': self.slow_ms,
+            'written': self.written,
+            'sampled_out': self.sampled_out,
+        }
+
+
+trace_log = TraceLog()
+
+
+class TraceMiddleware:
+    """İz kimliği ata, yanıta X-Trace-Id + Server-Timing ekle, seçilen izleri kaydet
+
+    Stream yanıtlarda başlık gövdeden önce gider; Server-Timing o ana kadarki
+    aşamaları (triyaj, prompt) içerir, diske yazılan iz ise LLM dahil tamdır.
+    """
+
+    def __init__(self, app, paths: Sequence[str] = TRACE_PATHS, log: TraceLog = trace_log):
+        self.app = app
+        self.paths = tuple(paths)
+        self.log = log
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        timer, token = bind_timer()
+        timer.trace_id = self._incoming_trace_id(scope) or uuid.uuid4().hex
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers: List = list(message.get("headers", []))
+                headers.append((TRACE_HEADER.encode(), timer.trace_id.encode()))
+                timing = server_timing(timer, time.perf_counter() - timer.started)
+                headers.append((b"server-timing", timing.encode("latin-1", "replace")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            unbind_timer(token)
+            self._finish(scope, timer, status)
+
+    @staticmethod
+    def _incoming_trace_id(scope) -> Optional[str]:
+        for name, value in scope.get("headers", []):
+            if name == TRACE_HEADER.encode():
+                candidate = value.decode("latin-1")
+                if _TRACE_ID_RE.match(candidate):
+                    return candidate
+        return None
+
+    def _finish(self, scope, timer: RequestTimer, status: int) -> None:
+        if not self.log.enabled:
+            return
+        duration_ms = (time.perf_counter() - timer.started) * 1000
+        if not self.log.should_write(duration_ms, status):
+            self.log.sampled_out += 1
+            return
+        self.log.write({
+            'trace_id': timer.trace_id,
+            'ts': round(time.time(), 3),
+            'method': scope.get("method"),
+            'path': scope.get("path"),
+            'handler': getattr(scope.get("endpoint"), "__name__", None),
+            'status': status,
+            'mod': timer.mod,
+            'duration_ms': round(duration_ms, 2),
+            'spans': [
+                {'name': name, 'start_ms': round(start * 1000, 2), 'duration_ms': round(duration * 1000, 2)}
+                for name, start, duration in timer.spans
+            ],
+        })
@@ -0,0 +1,125 @@
+"""
+VİSİ AI - TTL + LRU Önbellek
+Süre ve boyut sınırlı, sayaçlı basit bellek içi önbellek
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """Boyut (LRU) ve süre (TTL) sınırlı önbellek.
+
+    ttl=None ise kayıtlar yalnızca LRU ile düşer. on_evict verilirse süre
+    dolan, taşan veya silinen her kayıt için (key, value) ile çağrılır.
+    Tek event loop içinde kullanım içindir; thread-safe değildir.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: Optional[float] = None,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None
+    ):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, count=False) is not None
+
+    def _expired(self, expires_at: Optional[float]) -> bool:
+        return expires_at is not None and expires_at <= time.monotonic()
+
+    def _drop(self, key: Hashable) -> None:
+        _, value = self._data.pop(key)
+        if self.on_evict:
+            self.on_evict(key, value)
+
+    def get(self, key: Hashable, default: Any = None, count: bool = True) -> Any:
+        """Kaydı döndür (süresi dolmuşsa siler), isabette LRU sırasını yenile"""
+        item = self._data.get(key)
+        if item is None:
+            if count:
+                self.misses += 1
+            return default
+
+        expires_at, value = item
+        if self._expired(expires_at):
+            self.expirations += 1
+            self._drop(key)
+            if count:
+                self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        if count:
+            self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Kayıt ekle/güncelle, gerekirse en eski kaydı at"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        if key in self._data:
+            old_value = self._data[key][1]
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            if self.on_evict and old_value is not value:
+                self.on_evict(key, old_value)
+            return
+
+        self._data[key] = (expires_at, value)
+        while len(self._data) > self.maxsize:
+            oldest = next(iter(self._data))
+            self.evictions += 1
+            self._drop(oldest)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Kaydı sil ve döndür"""
+        if key not in self._data:
+            return default
+        value = self._data[key][1]
+        self._drop(key)
+        return value
+
+    def purge_expired(self) -> int:
+        """Süresi dolan tüm kayıtları temizle"""
+        expired = [k for k, (expires_at, _) in self._data.items() if self._expired(expires_at)]
+        for key in expired:
+            self.expirations += 1
+            self._drop(key)
+        return len(expired)
+
+    def clear(self) -> None:
+        """Tüm kayıtları sil"""
+        for key in list(self._data):
+            self._drop(key)
+
+    def values(self):
+        """Süresi dolmamış değerler (LRU sırasını değiştirmez)"""
+        return [v for expires_at, v in self._data.values() if not self._expired(expires_at)]
+
+    def stats(self) -> Dict:
+        """İsabet/ıska ve tahliye sayaçları"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
@@ -0,0 +1,210 @@
+"""
+VİSİ AI - Toplu Haftalık Program Üretimi
+Tüm öğrencilerin haftalık programını süreç havuzunda üretip diske / profil deposuna akıtır
+
+Kullanım:
+    python weekly_programs.py --output programs.jsonl
+    python weekly_programs.py --to-store --workers 8
+    python weekly_programs.py --input profiles.jsonl --output programs.jsonl
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import PROFILE_DB_PATH, WEEKLY_PROGRAM_CHUNK_SIZE, WEEKLY_PROGRAM_WORKERS
+from models import StudentProfile
+from profiles import ProfileStore, iter_student_ids, read_profile
+from student_data import generate_weekly_program
+
+# (öğrenci id, program JSON) satırları ve hata sayısı
+ChunkResult = Tuple[List[Tuple[str, str]], int]
+
+# İşçi süreç başına salt okunur bağlantı
+_worker_conn: Optional[sqlite3.Connection] = None
+
+
+def _init_worker(db_path: Optional[str]) -> None:
+    global _worker_conn
+    if db_path:
+        _worker_conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+
+def _program_rows(profiles: Iterable[StudentProfile]) -> ChunkResult:
+    rows = []
+    failed = 0
+    for profile in profiles:
+        try:
+            program = generate_weekly_program(profile)
+        except Exception as e:
+            print(f"Program hatası ({profile.student_id}): {e}", file=sys.stderr)
+            failed += 1
+            continue
+        rows.append((profile.student_id, json.dumps(program, ensure_ascii=False)))
+    return rows, failed
+
+
+def _chunk_from_store(student_ids: List[str]) -> ChunkResult:
+    """İşçide: id listesindeki profilleri veritabanından oku ve programla"""
+    profiles = (read_profile(_worker_conn, sid) for sid in student_ids)
+    return _program_rows(p for p in profiles if p is not None)
+
+
+def _chunk_from_lines(lines: List[str]) -> ChunkResult:
+    """İşçide: JSON satırlarını profile çevir ve programla"""
+    profiles = []
+    failed = 0
+    for line in lines:
+        try:
+            profiles.append(StudentProfile.model_validate_json(line))
+        except ValueError as e:
+            print(f"Geçersiz profil satırı: {e}", file=sys.stderr)
+            failed += 1
+    rows, program_failed = _program_rows(profiles)
+    return rows, failed + program_failed
+
+
+def _store_chunks(db_path: str, chunk_size: int) -> Iterator[List[str]]:
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        yield from iter_student_ids(conn, chunk_size)
+    finally:
+        conn.close()
+
+
+def _file_chunks(path: str, chunk_size: int) -> Iterator[List[str]]:
+    chunk = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                chunk.append(line)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+    if chunk:
+        yield chunk
+
+
+def current_week_start() -> str:
+    """Bu haftanın pazartesi tarihi (ISO)"""
+    today = date.today()
+    return (today - timedelta(days=today.weekday())).isoformat()
+
+
+def run_bulk(
+    chunks: Iterable[list],
+    worker_fn: Callable[[list], ChunkResult],
+    sink: Callable[[List[Tuple[str, str]]], None],
+    workers: int,
+    db_path: Optional[str] = None,
+    progress: bool = True
+) -> Dict:
+    """Parçaları süreç havuzuna dağıt, biten parçayı hemen sink'e yaz
+
+    Aynı anda en fazla 2 x workers parça kuyrukta bekler; bellek öğrenci
+    sayısından bağımsız kalır.
+    """
+    started = time.perf_counter()
+    totals = {'students': 0, 'failed': 0, 'chunks': 0}
+
+    def consume(result: ChunkResult) -> None:
+        rows, failed = result
+        sink(rows)
+        totals['students'] += len(rows)
+        totals['failed'] += failed
+        totals['chunks'] += 1
+        if progress and totals['chunks'] % 10 == 0:
+            elapsed = time.perf_counter() - started
+            print(f"{totals['students']} öğrenci, {totals['students'] / elapsed:.0f}/sn", file=sys.stderr)
+
+    if workers <= 1:
+        _init_worker(db_path)
+        for chunk in chunks:
+            consume(worker_fn(chunk))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(db_path,)
+        ) as pool:
+            pending = set()
+            for chunk in chunks:
+                pending.add(pool.submit(worker_fn, chunk))
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        consume(future.result())
+            for future in pending:
+                consume(future.result())
+
+    elapsed = time.perf_counter() - started
+    return {
+        **totals,
+        'workers': max(1, workers),
+        'elapsed_seconds': round(elapsed, 2),
+        'students_per_second': round(totals['students'] / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def _jsonl_sink(out, week_start: str) -> Callable[[List[Tuple[str, str]]], None]:
+    prefix_week = json.dumps(week_start)
+
+    def write(rows: List[Tuple[str, str]]) -> None:
+        # Program JSON'u yeniden ayrıştırılmadan satıra gömülür
+        out.writelines(
+            f'{{"student_id": {json.dumps(sid, ensure_ascii=False)}, "week_start": {prefix_week}, "program": {data}}}\n'
+            for sid, data in rows
+        )
+    return write
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Tüm öğrenciler için haftalık program üret")
+    parser.add_argument("--db", default=PROFILE_DB_PATH, help="Profil veritabanı (varsayılan: PROFILE_DB_PATH)")
+    parser.add_argument("--input", help="Veritabanı yerine JSONL profil dosyası (satır başına bir StudentProfile)")
+    parser.add_argument("--output", help="Programların yazılacağı JSONL dosyası")
+    parser.add_argument("--to-store", action="store_true", help="Programları profil veritabanına yaz")
+    parser.add_argument("--workers", type=int, default=WEEKLY_PROGRAM_WORKERS or os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=WEEKLY_PROGRAM_CHUNK_SIZE)
+    parser.add_argument("--week-start", default=current_week_start(), help="Haftanın pazartesi tarihi (ISO)")
+    args = parser.parse_args(argv)
+
+    if not args.output and not args.to_store:
+        parser.error("--output veya --to-store gerekli")
+
+    chunk_size = max(1, args.chunk_size)
+    if args.input:
+        chunks, worker_fn, db_path = _file_chunks(args.input, chunk_size), _chunk_from_lines, None
+    else:
+        chunks, worker_fn, db_path = _store_chunks(args.db, chunk_size), _chunk_from_store, args.db
+
+    sinks = []
+    out = open(args.output, 'w', encoding='utf-8') if args.output else None
+    if out:
+        sinks.append(_jsonl_sink(out, args.week_start))
+    store = ProfileStore(args.db) if args.to_store else None
+    if store:
+        sinks.append(lambda rows: store.write_weekly_programs(args.week_start, rows))
+
+    def sink(rows: List[Tuple[str, str]]) -> None:
+        for write in sinks:
+            write(rows)
+
+    try:
+        report = run_bulk(chunks, worker_fn, sink, args.workers, db_path)
+    finally:
+        if out:
+            out.close()
+        if store:
+            store.close()
+
+    print(json.dumps(report, ensure_ascii=False))
+    return 0 if not report['failed'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())